@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api_project import authentication
+
+
+@receiver([post_save, post_delete], sender=Token)
+def forget_cached_token(sender, instance, created=False, **kwargs):
+    # A new key cannot be cached yet
+    if not created:
+        authentication.forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_cached_user_tokens(sender, instance, created, **kwargs):
+    # Deactivation, or any other change to the user cached with the token;
+    # deleting the user deletes its tokens
+    if not created:
+        authentication.forget_user(instance.pk)
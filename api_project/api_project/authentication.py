@@ -0,0 +1,158 @@
+"""
+Token authentication with the token lookup cached.
+
+DRF's TokenAuthentication reads the Token and its user from the database on
+every request. CachedTokenAuthentication keeps tokens it has resolved in a
+bounded in-process LRU (TOKEN_AUTH_LOCAL_CACHE_SIZE entries, each trusted
+for TOKEN_AUTH_LOCAL_CACHE_TTL seconds) in front of the Django cache
+(TOKEN_AUTH_CACHE_TTL seconds), so a warm request authenticates without a
+query. Cache keys are hashes of the token, never the token itself; the cached
+value is the Token and user row, so the cache must be as private as the
+database. Setting a TTL (or the LRU size) to 0 turns that level off.
+
+Saving or deleting a Token, and saving or deleting a user (deactivation
+included), forget the affected tokens through the signal receivers
+registered by the app: the entry is replaced by a short-lived marker, so a
+request that read the token just before the change cannot put it back.
+Other processes' LRUs cannot be reached, so a revoked token may keep working
+there for up to TOKEN_AUTH_LOCAL_CACHE_TTL seconds. Changes made with
+``QuerySet.update()`` send no signal and are only seen once entries expire.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+CACHE_KEY_PREFIX = 'token-auth:'
+REVOKED = b'revoked'
+# Long enough to outlive a request that read a token just before it changed
+REVOKED_SECONDS = 60
+
+
+def get_cache_ttl():
+    return getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 300)
+
+
+def get_local_cache_size():
+    return getattr(settings, 'TOKEN_AUTH_LOCAL_CACHE_SIZE', 10000)
+
+
+def get_local_cache_ttl():
+    return getattr(settings, 'TOKEN_AUTH_LOCAL_CACHE_TTL', 10)
+
+
+def get_cache_key(key):
+    return CACHE_KEY_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+
+class LocalCache:
+    """A thread-safe LRU whose entries expire a fixed time after being stored."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, max_size):
+        if ttl <= 0 or max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LocalCache()
+
+
+def forget_tokens(keys):
+    """Drop ``keys`` from both cache levels and keep them out for REVOKED_SECONDS."""
+    cache_keys = [get_cache_key(key) for key in keys]
+    if cache_keys:
+        local_cache.delete_many(cache_keys)
+        cache.set_many(dict.fromkeys(cache_keys, REVOKED), REVOKED_SECONDS)
+
+
+def forget_user(user_id):
+    forget_tokens(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache_key = get_cache_key(key)
+        payload = local_cache.get(cache_key)
+        if payload is None:
+            payload = cache.get(cache_key)
+            if payload is None or payload == REVOKED:
+                user, token = super().authenticate_credentials(key)
+                if payload is None:
+                    # add(): a marker written since the read above wins
+                    payload = pickle.dumps(token)
+                    if cache.add(cache_key, payload, get_cache_ttl()):
+                        self.store_locally(cache_key, payload)
+                return user, token
+            self.store_locally(cache_key, payload)
+        return self.load(payload)
+
+    async def aauthenticate_credentials(self, key):
+        """authenticate_credentials() for async views, reading through the async cache and ORM APIs."""
+        cache_key = get_cache_key(key)
+        payload = local_cache.get(cache_key)
+        if payload is None:
+            payload = await cache.aget(cache_key)
+            if payload is None or payload == REVOKED:
+                model = self.get_model()
+                try:
+                    token = await model.objects.select_related('user').aget(key=key)
+                except model.DoesNotExist:
+                    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+                if not token.user.is_active:
+                    raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+                if payload is None:
+                    payload = pickle.dumps(token)
+                    if await cache.aadd(cache_key, payload, get_cache_ttl()):
+                        self.store_locally(cache_key, payload)
+                return token.user, token
+            self.store_locally(cache_key, payload)
+        return self.load(payload)
+
+    def store_locally(self, cache_key, payload):
+        local_cache.set(cache_key, payload, get_local_cache_ttl(), get_local_cache_size())
+
+    def load(self, payload):
+        # A fresh copy per request: views and signals may change request.user
+        token = pickle.loads(payload)
+        return token.user, token
@@ -0,0 +1,64 @@
+"""
+Fast JSON rendering and parsing for DRF.
+
+Uses orjson when it is installed; otherwise, or for anything orjson refuses
+(such as integers wider than 64 bits), falls back to DRF's stdlib-based
+JSONRenderer and JSONParser. Datetimes are encoded natively (UTC as ``Z``,
+like DRF); Decimals and every other type DRF's encoder knows go through it.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _orjson_dumps(data, indent=False):
+    option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, default=_encoder.default, option=option)
+
+
+def dumps(data, indent=False):
+    """Encode ``data`` to UTF-8 JSON bytes, with orjson when available."""
+    if orjson is not None:
+        try:
+            return _orjson_dumps(data, indent)
+        except TypeError:
+            pass
+    return _encoder.encode(data).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        try:
+            return _orjson_dumps(data, indent)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class FastJSONParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -30,13 +30,30 @@ ALLOWED_HOSTS = []
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api_project.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api_project.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api_project.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Resolved tokens are kept TOKEN_AUTH_CACHE_TTL seconds in the Django cache and
+# TOKEN_AUTH_LOCAL_CACHE_TTL seconds in a per-process LRU of
+# TOKEN_AUTH_LOCAL_CACHE_SIZE entries (api_project.authentication); 0 disables a level.
+# The LRU TTL bounds how long a revoked token keeps working in other processes.
+TOKEN_AUTH_CACHE_TTL = 300
+TOKEN_AUTH_LOCAL_CACHE_SIZE = 10000
+TOKEN_AUTH_LOCAL_CACHE_TTL = 10
+
 
 # Application definition
 
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from blog import pictures
+
+
+class Command(BaseCommand):
+    help = ("Write the thumbnail and medium variants of profile pictures that have none yet: "
+            "existing uploads, and uploads whose background processing was lost.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Process at most this many profiles.")
+
+    def handle(self, *args, **options):
+        profile_ids = list(pictures.pending().order_by("pk").values_list("pk", flat=True)[:options["limit"]])
+        processed = failed = 0
+        for profile_id in profile_ids:
+            try:
+                processed += pictures.process(profile_id)
+            except (OSError, ValueError) as exc:
+                # An unreadable or missing file; the others still get processed
+                failed += 1
+                self.stderr.write(f"Profile {profile_id}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} profile pictures ({failed} failed)."))
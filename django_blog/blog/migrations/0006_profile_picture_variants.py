@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_tag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='profile_picture_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='profile_pics/thumbnail/'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profile_picture_medium',
+            field=models.ImageField(blank=True, editable=False, upload_to='profile_pics/medium/'),
+        ),
+    ]
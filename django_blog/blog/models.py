@@ -38,6 +38,9 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True)
+    # Pre-sized, metadata-free copies of profile_picture (blog.pictures)
+    profile_picture_thumbnail = models.ImageField(upload_to='profile_pics/thumbnail/', blank=True, editable=False)
+    profile_picture_medium = models.ImageField(upload_to='profile_pics/medium/', blank=True, editable=False)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
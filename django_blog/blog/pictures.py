@@ -0,0 +1,30 @@
+"""
+Thumbnail and medium variants of Profile.profile_picture.
+
+A new upload clears the variants and queues them (blog.signals); until they
+are written, pages show the original. See django_blog.images for the
+pipeline itself.
+"""
+from django.db.models import Q
+
+from django_blog import images
+
+from .models import Profile
+
+FIELD = 'profile_picture'
+VARIANT_FIELDS = {
+    'thumbnail': 'profile_picture_thumbnail',
+    'medium': 'profile_picture_medium',
+}
+
+
+def process(profile_id):
+    return images.process(Profile.objects, profile_id, FIELD, VARIANT_FIELDS)
+
+
+def pending():
+    """Profiles whose picture has no variants yet."""
+    missing = Q()
+    for name in VARIANT_FIELDS.values():
+        missing |= Q(**{name: ''})
+    return Profile.objects.exclude(profile_picture='').filter(missing)
@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django_blog import images
+from . import pictures
 from .models import Profile
 
 @receiver(post_save, sender=User)
@@ -11,3 +13,19 @@ def create_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+@receiver(pre_save, sender=Profile)
+def reset_picture_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and pictures.FIELD not in update_fields:
+        return
+    picture = instance.profile_picture
+    if not picture or not picture._committed:
+        # Removed, or a new upload whose variants are still to be made
+        for name in pictures.VARIANT_FIELDS.values():
+            setattr(instance, name, '')
+        instance._picture_uploaded = bool(picture)
+
+@receiver(post_save, sender=Profile)
+def queue_picture_variants(sender, instance, **kwargs):
+    if instance.__dict__.pop('_picture_uploaded', False):
+        images.schedule(pictures.process, instance.pk)
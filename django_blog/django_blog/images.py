@@ -0,0 +1,125 @@
+"""
+Pre-sized, metadata-free variants of uploaded images.
+
+Uploads are kept as they come, often multi-megabyte photos, while lists show
+them at avatar size. ``process()`` decodes an upload once, applies its EXIF
+orientation and writes each variant of IMAGE_VARIANTS (a square thumbnail
+and a bounded medium size by default) as a new JPEG. Encoding from pixels
+alone drops EXIF, GPS and ICC metadata. Variant files are named after a hash
+of their content, so a URL never changes what it serves and can be cached
+forever; a new upload gets new names.
+
+Processing runs off the request: ``schedule()`` hands it to a small thread
+pool (IMAGE_PROCESSING_WORKERS) once the upload's transaction commits. Work
+lost to a restart is picked up by the apps' ``process_profile_pictures``
+command, which processes every upload still missing its variants.
+"""
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+# name: (width, height, crop to fill the box rather than fit inside it)
+VARIANTS = {
+    'thumbnail': (96, 96, True),
+    'medium': (480, 480, False),
+}
+
+
+def get_variants():
+    return getattr(settings, 'IMAGE_VARIANTS', VARIANTS)
+
+
+def get_quality():
+    return getattr(settings, 'IMAGE_VARIANT_QUALITY', 85)
+
+
+def get_workers():
+    return getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+
+
+def _flatten(image):
+    """RGB pixels only; transparent areas become white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(file):
+    """{variant name: JPEG bytes} for the image in ``file``."""
+    with Image.open(file) as original:
+        image = _flatten(ImageOps.exif_transpose(original))
+    rendered = {}
+    for name, (width, height, crop) in get_variants().items():
+        if crop:
+            variant = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            variant = image.copy()
+            variant.thumbnail((width, height), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        # No exif/icc_profile arguments: the variant carries pixels only
+        variant.save(out, 'JPEG', quality=get_quality(), optimize=True, progressive=True)
+        rendered[name] = out.getvalue()
+    return rendered
+
+
+def store(data, directory):
+    """Save ``data`` under a name derived from its content; returns the storage name."""
+    name = f'{directory.rstrip("/")}/{hashlib.sha256(data).hexdigest()[:32]}.jpg'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def process(queryset, pk, field, variant_fields):
+    """
+    Render and store the variants of the image in ``field`` of row ``pk``,
+    and record them in ``variant_fields`` ({variant: model field}). Returns
+    False when there is nothing to do or the image changed meanwhile.
+    """
+    row = queryset.filter(pk=pk).only('pk', field).first()
+    source = getattr(row, field, None)
+    if not source:
+        return False
+    with source.open('rb'):
+        rendered = render_variants(source)
+    names = {}
+    for variant, data in rendered.items():
+        model_field = queryset.model._meta.get_field(variant_fields[variant])
+        names[model_field.name] = store(data, model_field.upload_to)
+    # Only if the upload we read is still the current one
+    return bool(queryset.filter(pk=pk, **{field: source.name}).update(**names))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(fn, args):
+    try:
+        fn(*args)
+    finally:
+        # Connections are per thread; don't leak the worker's one
+        connections.close_all()
+
+
+def schedule(fn, *args):
+    """Run ``fn(*args)`` in the image pool once the current transaction commits."""
+
+    def submit():
+        global _executor
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=get_workers(), thread_name_prefix='images')
+        _executor.submit(_run, fn, args)
+
+    transaction.on_commit(submit)
@@ -129,6 +129,17 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Media files (User uploaded content)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Profile pictures get a thumbnail and a medium variant (django_blog.images),
+# written by IMAGE_PROCESSING_WORKERS background threads after the upload.
+# Variants have content-hashed names under MEDIA_ROOT/profile_pics/thumbnail/ and
+# profile_pics/medium/: serve them with "Cache-Control: public, max-age=31536000, immutable".
+IMAGE_PROCESSING_WORKERS = 2
+IMAGE_VARIANT_QUALITY = 85
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
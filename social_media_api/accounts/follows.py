@@ -0,0 +1,142 @@
+"""
+Follow graph reads and counters.
+
+The graph is ``CustomUser.followers``. In its through table a row's
+``from_customuser`` is the followed user and ``to_customuser`` the follower.
+Follower and following lists read that table directly as values, newest
+follow first, with keyset pagination on the through-table id, so a page
+costs one indexed range read however many followers an account has
+((from_customuser, id) for followers, added by migration 0005; for
+following, the to_customuser index, which InnoDB keys by the id as well).
+
+Follower and following counts are denormalized onto CustomUser and kept in
+step with the through table by accounts.signals;
+``manage.py reconcile_follow_counts`` recomputes them.
+"""
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models import Exists, F, OuterRef, Q, Value
+from django.db.models.signals import m2m_changed
+from django.db.models.functions import Greatest
+
+from social_media_api.pagination import KeysetPagination
+
+FOLLOWERS = "followers"
+FOLLOWING = "following"
+
+# (column holding the listed user's id, column holding the other side)
+_COLUMNS = {
+    FOLLOWERS: ("from_customuser", "to_customuser"),
+    FOLLOWING: ("to_customuser", "from_customuser"),
+}
+
+
+def follows():
+    return get_user_model().followers.through.objects
+
+
+def follow_rows(user_id, relation):
+    """
+    The users on one side of ``user_id``'s follows as ``{"id", "username"}``
+    rows, plus the through-table id under ``follow_id`` for pagination.
+    """
+    own, other = _COLUMNS[relation]
+    return (
+        follows().filter(**{f"{own}_id": user_id})
+        .values(follow_id=F("id"), user_id=F(f"{other}_id"), username=F(f"{other}__username"))
+    )
+
+
+COUNT_FIELDS = ("followers_count", "following_count")
+
+
+def follow_counts(user):
+    """``{"followers_count", "following_count"}``, read from the user's counter columns."""
+    return {field: getattr(user, field) for field in COUNT_FIELDS}
+
+
+def shifted(field, delta):
+    if delta >= 0:
+        return F(field) + delta
+    # GREATEST first so an unsigned column never holds a negative intermediate
+    return Greatest(F(field), Value(-delta)) + delta
+
+
+def shift_counts(user_id, field, other_ids, other_field, delta):
+    """
+    ``user_id`` gained (or lost, for a negative ``delta``) one follow per
+    user in ``other_ids``: move its ``field`` by that many and the others'
+    ``other_field`` by ``delta`` each.
+    """
+    User = get_user_model()
+    User.objects.filter(pk=user_id).update(**{field: shifted(field, delta * len(other_ids))})
+    User.objects.filter(pk__in=other_ids).update(**{other_field: shifted(other_field, delta)})
+
+
+class FollowPagination(KeysetPagination):
+    """Newest follow first, keyed on the through-table id."""
+    ordering = ("-follow_id",)
+
+    def get_ordering(self, view):
+        return self.ordering
+
+
+def render_rows(rows):
+    """Page rows as served: the listed users without the through-table id."""
+    return [{"id": row["user_id"], "username": row["username"]} for row in rows]
+
+
+def follow_many(user, ids):
+    """
+    Make ``user`` follow every existing user in ``ids``: one query checks the
+    ids and the follows that already exist, one multi-row INSERT adds the rest.
+
+    Returns (followed, already_following, invalid) id lists; ``invalid``
+    holds unknown ids and the user's own.
+    """
+    User = get_user_model()
+    through = User.followers.through
+    candidates = dict(
+        User.objects.filter(pk__in=ids).exclude(pk=user.pk)
+        .annotate(followed=Exists(follows().filter(to_customuser_id=user.pk, from_customuser_id=OuterRef("pk"))))
+        .values_list("pk", "followed")
+    )
+    found = set(candidates)
+    existing = {pk for pk, followed in candidates.items() if followed}
+    new = [pk for pk in ids if pk in found and pk not in existing]
+    with transaction.atomic():
+        # Conflicts are follows written concurrently since the check above
+        through.objects.bulk_create(
+            [through(from_customuser_id=pk, to_customuser_id=user.pk) for pk in new], ignore_conflicts=True
+        )
+        if new:
+            # What user.following.add() would send, so the counters follow
+            m2m_changed.send(sender=through, instance=user, action="post_add", reverse=True,
+                             model=User, pk_set=set(new), using=router.db_for_write(through))
+    return new, [pk for pk in ids if pk in existing], [pk for pk in ids if pk not in found]
+
+
+def unfollow_many(user, ids):
+    """Stop ``user`` following ``ids``. Returns (unfollowed, not_following) id lists."""
+    following = set(
+        follows().filter(to_customuser_id=user.pk, from_customuser_id__in=ids)
+        .values_list("from_customuser_id", flat=True)
+    )
+    with transaction.atomic():
+        user.following.remove(*following)
+    return [pk for pk in ids if pk in following], [pk for pk in ids if pk not in following]
+
+
+def relationships(user, ids):
+    """``{id: {"following", "followed_by"}}`` between ``user`` and each of ``ids``, in one query."""
+    status = {pk: {"following": False, "followed_by": False} for pk in ids}
+    rows = follows().filter(
+        Q(to_customuser_id=user.pk, from_customuser_id__in=ids)
+        | Q(from_customuser_id=user.pk, to_customuser_id__in=ids)
+    ).values_list("from_customuser_id", "to_customuser_id")
+    for followed_id, follower_id in rows:
+        if follower_id == user.pk:
+            status[followed_id]["following"] = True
+        if followed_id == user.pk:
+            status[follower_id]["followed_by"] = True
+    return status
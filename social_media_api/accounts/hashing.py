@@ -0,0 +1,130 @@
+"""
+Password hashing off the request worker.
+
+PBKDF2 is slow on purpose: tens of milliseconds of CPU per hash. Done inline,
+as LoginView and RegisterView do through authenticate() and create_user(),
+a burst of logins holds every worker and starves the other endpoints. The
+async login and register views hash in a bounded thread pool instead
+(PASSWORD_HASHING_WORKERS threads; hashlib releases the GIL while it
+hashes), so the event loop keeps serving other requests meanwhile. At most
+PASSWORD_HASHING_MAX_PENDING hashes may be running or waiting; past that,
+requests are rejected at once with 503 and Retry-After instead of queueing
+behind a backlog they would time out in.
+
+A password stored with outdated hasher parameters (after PASSWORD_HASHERS
+or Django raises the iteration count) is rehashed after a successful async
+login, in the background and only when the pool has room; the next login
+tries again otherwise. The new hash is written only if the stored one is
+unchanged, so a password changed meanwhile wins.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+def get_workers():
+    return getattr(settings, 'PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)
+
+
+def get_max_pending():
+    return getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', 4 * get_workers())
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, try again shortly.'
+    default_code = 'hashing_unavailable'
+    wait = 1  # Retry-After, seconds
+
+
+class HashingPool:
+    """A thread pool that refuses work once ``max_pending`` jobs are running or queued."""
+
+    def __init__(self, workers, max_pending):
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HashingUnavailable()
+            self.pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(get_workers(), get_max_pending())
+        return _pool
+
+
+async def ahash_password(raw_password):
+    return await get_pool().run(make_password, raw_password)
+
+
+async def aauthenticate(username, password):
+    """
+    authenticate() for ModelBackend credentials, hashing in the pool. Returns
+    the active user, or None. Raises HashingUnavailable when the pool is full.
+    """
+    User = get_user_model()
+    try:
+        user = await User._default_manager.aget_by_natural_key(username)
+    except User.DoesNotExist:
+        # Hash anyway, so unknown usernames take as long as wrong passwords
+        await ahash_password(password)
+        return None
+    is_correct, must_update = await get_pool().run(verify_password, password, user.password)
+    if not is_correct or not user.is_active:
+        return None
+    if must_update:
+        schedule_rehash(user, password)
+    return user
+
+
+_rehashes = set()
+
+
+def schedule_rehash(user, raw_password):
+    """Rehash ``user``'s password after the response; skipped while the pool is busy."""
+    task = asyncio.get_running_loop().create_task(arehash(user.pk, user.password, raw_password))
+    _rehashes.add(task)
+    task.add_done_callback(_rehashes.discard)
+
+
+async def arehash(user_id, encoded, raw_password):
+    """Store a fresh hash of ``raw_password`` unless the stored hash is no longer ``encoded``."""
+    try:
+        new = await ahash_password(raw_password)
+    except HashingUnavailable:
+        return False
+    updated = await get_user_model()._default_manager.filter(pk=user_id, password=encoded).aupdate(password=new)
+    return bool(updated)
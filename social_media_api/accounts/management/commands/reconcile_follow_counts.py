@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from accounts import follows
+
+
+class Command(BaseCommand):
+    help = "Recompute CustomUser.followers_count and following_count from the follow table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Users recomputed per batch.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            users = list(
+                User.objects.filter(pk__gt=last_id).order_by("pk")
+                .only("pk", *follows.COUNT_FIELDS)[:options["chunk_size"]]
+            )
+            if not users:
+                break
+            ids = [user.pk for user in users]
+            followers = dict(
+                follows.follows().filter(from_customuser_id__in=ids).values("from_customuser_id")
+                .annotate(total=Count("id")).values_list("from_customuser_id", "total")
+            )
+            following = dict(
+                follows.follows().filter(to_customuser_id__in=ids).values("to_customuser_id")
+                .annotate(total=Count("id")).values_list("to_customuser_id", "total")
+            )
+
+            stale = []
+            for user in users:
+                counts = followers.get(user.pk, 0), following.get(user.pk, 0)
+                if (user.followers_count, user.following_count) != counts:
+                    user.followers_count, user.following_count = counts
+                    stale.append(user)
+            if stale:
+                User.objects.bulk_update(stale, list(follows.COUNT_FIELDS))
+
+            checked += len(users)
+            fixed += len(stale)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} users, fixed {fixed}."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+class Command(BaseCommand):
+    help = ("Recompute \"people you may know\" suggestions for users whose follows changed. "
+            "Run periodically, e.g. from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Rebuild every user's suggestions from the whole follow graph.")
+        parser.add_argument("--limit", type=int, default=None,
+                            help="Refresh at most this many stale users, oldest first.")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            users, written = suggestions.refresh_suggestions()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt suggestions for {users} users ({written} rows)."))
+            return
+        stale, users, written = suggestions.refresh_stale(options["limit"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {stale} stale users and their followers: {users} users ({written} rows)."
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_follow_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_picture_medium',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profiles/medium/'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_picture_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profiles/thumbnail/'),
+        ),
+    ]
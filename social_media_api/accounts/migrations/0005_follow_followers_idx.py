@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+# Follower lists filter on from_customuser and page on the through-table id;
+# without it MySQL reads them through the unique (from_customuser,
+# to_customuser) key and sorts every page. Added by hand: the through table
+# is auto-created, so its Meta cannot declare indexes.
+FOLLOWERS_RECENT_IDX = models.Index(fields=['from_customuser', 'id'], name='follow_followers_recent_idx')
+
+
+def add_index(apps, schema_editor):
+    through = apps.get_model('accounts', 'CustomUser').followers.through
+    schema_editor.add_index(through, FOLLOWERS_RECENT_IDX)
+
+
+def remove_index(apps, schema_editor):
+    through = apps.get_model('accounts', 'CustomUser').followers.through
+    schema_editor.remove_index(through, FOLLOWERS_RECENT_IDX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
@@ -1,10 +1,42 @@
 from django.contrib.auth.models import AbstractUser
+from django.conf import settings
 from django.db import models
 
 class CustomUser(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Pre-sized, metadata-free copies of profile_picture (accounts.pictures)
+    profile_picture_thumbnail = models.ImageField(upload_to='profiles/thumbnail/', blank=True, null=True, editable=False)
+    profile_picture_medium = models.ImageField(upload_to='profiles/medium/', blank=True, null=True, editable=False)
     followers = models.ManyToManyField('self', symmetrical=False, related_name='following', blank=True)
+    # Denormalized from followers, maintained by accounts.signals
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.username
+
+
+class FollowSuggestion(models.Model):
+    """A precomputed "people you may know" entry (see accounts.suggestions)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='follow_suggestions')
+    suggested = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    # Users followed by ``user`` who follow ``suggested``
+    mutual_count = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-mutual_count', '-suggested'], name='follow_suggestion_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"Suggest {self.suggested_id} to {self.user_id} ({self.mutual_count} mutual)"
+
+
+class StaleFollowSuggestions(models.Model):
+    """A user whose follows changed since their suggestions were computed."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='+')
+    marked_at = models.DateTimeField()
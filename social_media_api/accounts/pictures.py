@@ -0,0 +1,30 @@
+"""
+Thumbnail and medium variants of CustomUser.profile_picture.
+
+A new upload clears the variants and queues them (accounts.signals); until
+they are written, the profile serves the original and lists show no
+picture. See social_media_api.images for the pipeline itself.
+"""
+from django.db.models import Q
+
+from social_media_api import images
+
+from .models import CustomUser
+
+FIELD = 'profile_picture'
+VARIANT_FIELDS = {
+    'thumbnail': 'profile_picture_thumbnail',
+    'medium': 'profile_picture_medium',
+}
+
+
+def process(user_id):
+    return images.process(CustomUser.objects, user_id, FIELD, VARIANT_FIELDS)
+
+
+def pending():
+    """Users whose picture has no variants yet."""
+    missing = Q()
+    for name in VARIANT_FIELDS.values():
+        missing |= Q(**{f'{name}__isnull': True}) | Q(**{name: ''})
+    return CustomUser.objects.exclude(Q(profile_picture__isnull=True) | Q(profile_picture='')).filter(missing)
@@ -1,22 +1,54 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework.authtoken.models import Token
+from social_media_api.sparse import DynamicFieldsMixin
+from .models import FollowSuggestion
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class ImageVariantField(serializers.ImageField):
+    """
+    Accepts an upload for the image field it is bound to, and renders the URL
+    of its pre-sized ``variant_field`` instead (see accounts.pictures), or of
+    the upload itself until the variant exists.
+    """
+
+    def __init__(self, variant_field, **kwargs):
+        self.variant_field = variant_field
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.variant_field) or super().get_attribute(instance)
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    profile_picture = ImageVariantField('profile_picture_medium', required=False, allow_null=True)
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'followers']
+        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'followers_count', 'following_count']
+        read_only_fields = ['followers_count', 'following_count']
 
 
 class LightweightUserSerializer(serializers.ModelSerializer):
+    # The thumbnail only: lists never link to full-size uploads
+    profile_picture = serializers.ImageField(source='profile_picture_thumbnail', read_only=True)
+
     class Meta:
         model = User
-        fields = ["id", "username"]
+        fields = ["id", "username", "profile_picture"]
 
 
 
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='suggested_id')
+    username = serializers.ReadOnlyField(source='suggested.username')
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ['id', 'username', 'mutual_count']
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -25,20 +57,31 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ['username', 'email', 'password']
 
     def create(self, validated_data):
-        user = get_user_model().objects.create_user(
-            username=validated_data['username'],
-            email=validated_data.get('email'),
-            password=validated_data['password']
-        )
+        password_hash = validated_data.get('password_hash')
+        if password_hash is None:
+            user = User.objects.create_user(
+                username=validated_data['username'],
+                email=validated_data.get('email'),
+                password=validated_data['password']
+            )
+        else:
+            # Already hashed by accounts.hashing; create_user() would hash again
+            user = User.objects.create(
+                username=User.normalize_username(validated_data['username']),
+                email=User.objects.normalize_email(validated_data.get('email')),
+                password=password_hash,
+            )
         # Automatically create token for new user
         Token.objects.create(user=user)
         return user
 
 
-class LoginSerializer(serializers.Serializer):
+class CredentialsSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
 
+
+class LoginSerializer(CredentialsSerializer):
     def validate(self, data):
         user = authenticate(**data)
         if user and user.is_active:
@@ -0,0 +1,84 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from social_media_api import authentication, images
+
+from . import follows, pictures, suggestions
+from .models import CustomUser
+
+SIDES = {
+    # reverse: (instance column, other side's column, instance counter, other side's counter)
+    False: ("from_customuser_id", "to_customuser_id", "followers_count", "following_count"),
+    True: ("to_customuser_id", "from_customuser_id", "following_count", "followers_count"),
+}
+
+
+@receiver(m2m_changed, sender=CustomUser.followers.through)
+def follows_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the follow counters in step with ``user.followers`` / ``user.following``
+    changes, in the transaction that changes the through table, and queue the
+    followers involved for new follow suggestions.
+    """
+    own, other, field, other_field = SIDES[reverse]
+    if action in ("pre_remove", "pre_clear"):
+        # remove() reports every id it was given and clear() none at all:
+        # note the follows that really go away
+        rows = follows.follows().filter(**{own: instance.pk})
+        if action == "pre_remove":
+            rows = rows.filter(**{f"{other}__in": pk_set})
+        instance._removed_follow_ids = set(rows.values_list(other, flat=True))
+        return
+    if action in ("post_remove", "post_clear"):
+        changed, delta = instance.__dict__.pop("_removed_follow_ids", set()), -1
+    elif action == "post_add":
+        changed, delta = pk_set, 1  # only the follows that were inserted
+    else:
+        return
+    if changed:
+        follows.shift_counts(instance.pk, field, changed, other_field, delta)
+        if field in instance.__dict__:
+            # Keep the instance in hand (often request.user) current as well
+            setattr(instance, field, max(0, getattr(instance, field) + delta * len(changed)))
+        suggestions.follows_changed(instance.pk, changed, follower_is_instance=reverse, added=delta > 0)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def release_follow_counts(sender, instance, **kwargs):
+    # The follow rows are cascaded without m2m_changed
+    CustomUser.objects.filter(following=instance).update(following_count=follows.shifted("following_count", -1))
+    CustomUser.objects.filter(followers=instance).update(followers_count=follows.shifted("followers_count", -1))
+
+
+@receiver([post_save, post_delete], sender=Token)
+def forget_cached_token(sender, instance, created=False, **kwargs):
+    # A new key cannot be cached yet
+    if not created:
+        authentication.forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=CustomUser)
+def forget_cached_user_tokens(sender, instance, created, **kwargs):
+    # Deactivation, or any other change to the user cached with the token;
+    # deleting the user deletes its tokens
+    if not created:
+        authentication.forget_user(instance.pk)
+
+
+@receiver(pre_save, sender=CustomUser)
+def reset_picture_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and pictures.FIELD not in update_fields:
+        return
+    picture = instance.profile_picture
+    if not picture or not picture._committed:
+        # Removed, or a new upload whose variants are still to be made
+        for name in pictures.VARIANT_FIELDS.values():
+            setattr(instance, name, None)
+        instance._picture_uploaded = bool(picture)
+
+
+@receiver(post_save, sender=CustomUser)
+def queue_picture_variants(sender, instance, **kwargs):
+    if instance.__dict__.pop('_picture_uploaded', False):
+        images.schedule(pictures.process, instance.pk)
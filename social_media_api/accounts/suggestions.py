@@ -0,0 +1,217 @@
+"""
+"People you may know": friends-of-friends follow suggestions.
+
+A user's candidates are the users followed by the users they follow, scored
+by how many of the people they follow follow the candidate
+(``mutual_count``). Users they already follow, and they themselves, are left
+out. With the follow graph as a sparse adjacency matrix ``A`` (``A[u, v] = 1``
+when u follows v), the scores of a batch of users are the rows of ``A @ A``,
+so suggestions are computed in batch with scipy.sparse rather than by
+walking the graph per request. Without scipy the same scores are counted in
+pure Python.
+
+The best FOLLOW_SUGGESTIONS_MAX_PER_USER candidates of each user are stored
+as FollowSuggestion rows and served straight from the (user, score) index.
+Follows mark the follower stale (accounts.signals);
+``manage.py refresh_follow_suggestions`` recomputes the stale users and
+everyone following them, whose friends-of-friends changed with them, and
+``--all`` rebuilds every user's suggestions.
+"""
+import heapq
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from social_media_api.pagination import KeysetPagination
+
+from .models import FollowSuggestion, StaleFollowSuggestions
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - exercised only without scipy
+    np = sparse = None
+
+
+def get_max_per_user():
+    return getattr(settings, "FOLLOW_SUGGESTIONS_MAX_PER_USER", 30)
+
+
+def get_batch_size():
+    """Edges read per query, and users scored and written per batch."""
+    return getattr(settings, "FOLLOW_SUGGESTIONS_BATCH_SIZE", 5000)
+
+
+def _follows():
+    # from_customuser is the followed user, to_customuser the follower
+    return get_user_model().followers.through.objects
+
+
+def load_edges(follower_ids=None):
+    """(follower, followed) pairs, of ``follower_ids`` only when given, read in id batches."""
+    rows = _follows().order_by("pk").values_list("pk", "to_customuser_id", "from_customuser_id")
+    if follower_ids is not None:
+        follower_ids = list(follower_ids)
+        for start in range(0, len(follower_ids), get_batch_size()):
+            chunk = follower_ids[start:start + get_batch_size()]
+            yield from ((follower, followed) for _, follower, followed in rows.filter(to_customuser_id__in=chunk))
+        return
+    last_id = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_id)[:get_batch_size()])
+        if not batch:
+            return
+        yield from ((follower, followed) for _, follower, followed in batch)
+        last_id = batch[-1][0]
+
+
+def _scores_sparse(targets, edges, limit):
+    if edges:
+        src, dst = np.array(edges, dtype=np.int64).T
+    else:
+        src = dst = np.array([], dtype=np.int64)
+    ids = np.unique(np.concatenate([src, dst, np.asarray(targets, dtype=np.int64)]))
+    size = len(ids)
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(src), dtype=np.int32), (np.searchsorted(ids, src), np.searchsorted(ids, dst))),
+        shape=(size, size),
+    )
+    for start in range(0, len(targets), get_batch_size()):
+        chunk = np.searchsorted(ids, np.asarray(targets[start:start + get_batch_size()], dtype=np.int64))
+        followed = adjacency[chunk]
+        paths = (followed @ adjacency).tocsr()
+        # Zero out the users already followed
+        paths = (paths - paths.multiply(followed)).tocsr()
+        paths.eliminate_zeros()
+        result = {}
+        for row, target in enumerate(chunk):
+            begin, end = paths.indptr[row], paths.indptr[row + 1]
+            columns, counts = paths.indices[begin:end], paths.data[begin:end]
+            keep = columns != target
+            columns, counts = columns[keep], counts[keep]
+            best = np.lexsort((columns, counts))[::-1][:limit]
+            result[int(ids[target])] = [(int(counts[i]), int(ids[columns[i]])) for i in best]
+        yield result
+
+
+def _scores_python(targets, edges, limit):
+    following = {}
+    for follower, followed in edges:
+        following.setdefault(follower, set()).add(followed)
+    for start in range(0, len(targets), get_batch_size()):
+        result = {}
+        for target in targets[start:start + get_batch_size()]:
+            own = following.get(target, set())
+            counts = Counter()
+            for followed in own:
+                counts.update(following.get(followed, ()))
+            candidates = ((count, pk) for pk, count in counts.items() if pk != target and pk not in own)
+            result[target] = heapq.nlargest(limit, candidates)
+        yield result
+
+
+def iter_scores(targets, edges, limit=None):
+    """
+    Batches of ``{user_id: [(mutual_count, candidate_id), ...] best first}``
+    for the sorted ``targets``. ``edges`` must hold the follows of every
+    target and of every user a target follows.
+    """
+    limit = limit or get_max_per_user()
+    if sparse is not None:
+        return _scores_sparse(targets, edges, limit)
+    return _scores_python(targets, edges, limit)
+
+
+def affected_users(user_ids):
+    """``user_ids`` and their followers: the users whose friends-of-friends changed with them."""
+    followers = _follows().filter(from_customuser_id__in=list(user_ids)).values_list("to_customuser_id", flat=True)
+    return sorted(set(user_ids) | set(followers))
+
+
+def _write(scores, now):
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=list(scores)).delete()
+        FollowSuggestion.objects.bulk_create([
+            FollowSuggestion(user_id=user_id, suggested_id=pk, mutual_count=count, computed_at=now)
+            for user_id, candidates in scores.items() for count, pk in candidates
+        ], batch_size=get_batch_size())
+
+
+def refresh_suggestions(user_ids=None, now=None):
+    """
+    Recompute the suggestions of the users affected by changes to ``user_ids``
+    (default: rebuild every user's). Returns (users refreshed, rows written).
+    """
+    now = now or timezone.now()
+    if user_ids is None:
+        edges = list(load_edges())
+        targets = sorted({follower for follower, _ in edges})
+    else:
+        targets = affected_users(user_ids)
+        # Their follows, and the follows of everyone they follow
+        edges = list(load_edges(targets))
+        seen = set(targets)
+        edges += load_edges(sorted({followed for _, followed in edges} - seen))
+
+    users = written = 0
+    for scores in iter_scores(targets, edges):
+        _write(scores, now)
+        users += len(scores)
+        written += sum(len(candidates) for candidates in scores.values())
+
+    if user_ids is None:
+        # Users who have since unfollowed everyone
+        FollowSuggestion.objects.filter(computed_at__lt=now).delete()
+    return users, written
+
+
+def mark_stale(user_ids):
+    """Queue users whose follows changed for the next refresh."""
+    now = timezone.now()
+    conflicts = {"update_conflicts": True, "update_fields": ["marked_at"]}
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target (any unique key)
+    if connections[router.db_for_write(StaleFollowSuggestions)].features.supports_update_conflicts_with_target:
+        conflicts["unique_fields"] = ["user"]
+    StaleFollowSuggestions.objects.bulk_create(
+        [StaleFollowSuggestions(user_id=user_id, marked_at=now) for user_id in user_ids], **conflicts
+    )
+
+
+def follows_changed(user_id, other_ids, follower_is_instance, added):
+    """
+    ``user_id`` followed (or unfollowed) ``other_ids``, or was followed by
+    them when ``follower_is_instance`` is false: mark the followers stale and
+    stop suggesting users they have just followed.
+    """
+    followers = [user_id] if follower_is_instance else list(other_ids)
+    mark_stale(followers)
+    if not added:
+        return
+    if follower_is_instance:
+        FollowSuggestion.objects.filter(user_id=user_id, suggested_id__in=other_ids).delete()
+    else:
+        FollowSuggestion.objects.filter(user_id__in=followers, suggested_id=user_id).delete()
+
+
+def refresh_stale(limit=None):
+    """
+    Refresh the users marked stale, oldest mark first and at most ``limit``
+    of them. Returns (stale users, users refreshed, rows written).
+    """
+    started = timezone.now()
+    stale = StaleFollowSuggestions.objects.filter(marked_at__lte=started)
+    user_ids = list(stale.order_by("marked_at").values_list("user_id", flat=True)[:limit])
+    if not user_ids:
+        return 0, 0, 0
+    users, written = refresh_suggestions(user_ids, now=started)
+    # Users marked again while this ran keep their mark
+    stale.filter(user_id__in=user_ids).delete()
+    return len(user_ids), users, written
+
+
+class SuggestionPagination(KeysetPagination):
+    """Best suggestion first, along the (user, mutual_count, suggested) index."""
+    ordering = ("-mutual_count", "-suggested_id")
@@ -1,3 +1,370 @@
-from django.test import TestCase
+import asyncio
+import io
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from . import hashing, pictures
+from .serializers import LightweightUserSerializer
+
+User = get_user_model()
+
+
+class FollowListTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username="alice")
+        self.bob = User.objects.create(username="bob")
+        self.carol = User.objects.create(username="carol")
+        # bob, then carol, follow alice; alice follows carol
+        self.alice.followers.add(self.bob)
+        self.alice.followers.add(self.carol)
+        self.alice.following.add(self.carol)
+        token = Token.objects.create(user=self.bob)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_lists_the_user_in_the_url(self):
+        for prefix in ("/api/auth/", "/api/auth/async/"):
+            response = self.client.get(f"{prefix}followers/{self.alice.pk}/")
+            self.assertEqual(response.json(), {
+                "next": None,
+                "results": [{"id": self.carol.pk, "username": "carol"}, {"id": self.bob.pk, "username": "bob"}],
+                "followers_count": 2,
+                "following_count": 1,
+            })
+            response = self.client.get(f"{prefix}following/{self.alice.pk}/")
+            self.assertEqual(response.json()["results"], [{"id": self.carol.pk, "username": "carol"}])
+
+    def test_pages_are_keyed_on_the_follow(self):
+        first = self.client.get(f"/api/auth/followers/{self.alice.pk}/", {"page_size": 1})
+        self.assertEqual(first.data["results"], [{"id": self.carol.pk, "username": "carol"}])
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first.data["next"])
+        self.assertEqual(second.data["results"], [{"id": self.bob.pk, "username": "bob"}])
+        self.assertIsNone(second.data["next"])
+        # user with its counts, and the page; the token was cached by the first request
+        self.assertEqual(len(queries), 2)
+
+        # The followers page is an index range read on (from_customuser, id)
+        through = User.followers.through
+        constraints = connection.introspection.get_constraints(connection.cursor(), through._meta.db_table)
+        self.assertEqual(constraints["follow_followers_recent_idx"]["columns"], ["from_customuser_id", "id"])
+
+    def test_counts_are_refreshed_when_follows_change(self):
+        url = f"/api/auth/followers/{self.alice.pk}/"
+        self.assertEqual(self.client.get(url).data["followers_count"], 2)
+        self.alice.followers.remove(self.bob)
+        self.assertEqual(self.client.get(url).data["followers_count"], 1)
+        self.carol.following.clear()
+        self.assertEqual(self.client.get(url).data["followers_count"], 0)
+
+    def test_unknown_user(self):
+        self.assertEqual(self.client.get("/api/auth/followers/999/").status_code, 404)
+        self.assertEqual(self.client.get("/api/auth/async/followers/999/").status_code, 404)
+
+
+class FollowCountTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username="alice")
+        self.bob = User.objects.create(username="bob")
+        self.carol = User.objects.create(username="carol")
+        self.client.force_authenticate(self.bob)
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.followers_count, user.following_count
+
+    def test_follow_and_unfollow_endpoints_move_the_counts(self):
+        response = self.client.post(f"/api/auth/follow/{self.alice.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.client.post(f"/api/auth/follow/{self.alice.pk}/")  # already following
+        self.assertEqual(self.counts(self.alice), (1, 0))
+        self.assertEqual(self.counts(self.bob), (0, 1))
+
+        self.client.post(f"/api/auth/unfollow/{self.alice.pk}/")
+        self.client.post(f"/api/auth/unfollow/{self.alice.pk}/")  # not following any more
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+        self.assertEqual(self.client.post("/api/auth/follow/999/").status_code, 404)
+
+    def test_m2m_changes_from_either_side(self):
+        self.alice.followers.add(self.bob, self.carol)
+        self.carol.followers.add(self.alice)
+        self.assertEqual(self.counts(self.alice), (2, 1))
+        self.assertEqual(self.counts(self.carol), (1, 1))
+
+        self.alice.followers.remove(self.bob, self.alice)
+        self.assertEqual(self.counts(self.alice), (1, 1))
+        self.alice.following.clear()
+        self.assertEqual(self.counts(self.alice), (1, 0))
+        self.assertEqual(self.counts(self.carol), (0, 1))
+
+        self.carol.delete()
+        self.assertEqual(self.counts(self.alice), (0, 0))
+
+    def test_profile_shows_counts_and_reconcile_repairs_them(self):
+        self.alice.followers.add(self.bob)
+        User.objects.filter(pk=self.alice.pk).update(followers_count=5)
+        call_command("reconcile_follow_counts", chunk_size=1, stdout=StringIO())
+        self.client.force_authenticate(self.alice)
+        response = self.client.get("/api/auth/profile/")
+        self.assertEqual((response.data["followers_count"], response.data["following_count"]), (1, 0))
+        self.assertNotIn("followers", response.data)
+
+
+class ProfileFieldsTests(APITestCase):
+    def test_fields(self):
+        alice = User.objects.create(username="alice", email="a@example.com")
+        self.client.force_authenticate(alice)
+
+        response = self.client.get("/api/auth/profile/", {"fields": "username,email"})
+        self.assertEqual(response.data, {"username": "alice", "email": "a@example.com"})
+        response = self.client.get("/api/auth/profile/", {"fields": "followers_count"})
+        self.assertEqual(response.data, {"followers_count": 0})
+
+
+def jpeg_upload(name="me.jpg", size=(1200, 900)):
+    """A JPEG carrying EXIF metadata, as phones produce them."""
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    out = io.BytesIO()
+    Image.new("RGB", size, "teal").save(out, "JPEG", exif=exif.tobytes())
+    return SimpleUploadedFile(name, out.getvalue(), content_type="image/jpeg")
+
+
+class ProfilePictureTests(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.user = User.objects.create(username="alice")
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        with mock.patch("accounts.signals.images.schedule") as schedule:
+            response = self.client.patch("/api/auth/profile/", {"profile_picture": jpeg_upload()}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        schedule.assert_called_once_with(pictures.process, self.user.pk)
+        return response
+
+    def test_variants_are_written_in_the_background(self):
+        # Until processed, the profile shows the upload and lists show nothing
+        self.assertIn("/profiles/me", self.upload().data["profile_picture"])
+        self.assertIsNone(LightweightUserSerializer(User.objects.get(pk=self.user.pk)).data["profile_picture"])
+
+        self.assertTrue(pictures.process(self.user.pk))
+        user = User.objects.get(pk=self.user.pk)
+        with Image.open(user.profile_picture_thumbnail) as thumbnail:
+            self.assertEqual(thumbnail.size, (96, 96))
+            self.assertEqual(len(thumbnail.getexif()), 0)
+        with Image.open(user.profile_picture_medium) as medium:
+            self.assertEqual(medium.size, (480, 360))
+        self.assertEqual(pictures.pending().count(), 0)
+
+        response = self.client.get("/api/auth/profile/")
+        self.assertTrue(response.data["profile_picture"].endswith(user.profile_picture_medium.url))
+        self.assertRegex(
+            LightweightUserSerializer(user).data["profile_picture"], r"/profiles/thumbnail/[0-9a-f]{32}\.jpg$"
+        )
+
+    def test_new_upload_replaces_the_variants(self):
+        self.upload()
+        pictures.process(self.user.pk)
+        thumbnail = User.objects.get(pk=self.user.pk).profile_picture_thumbnail.name
+        self.upload()
+        self.assertEqual(list(pictures.pending()), [self.user])
+        call_command("process_profile_pictures", stdout=StringIO())
+        # Same pixels, same name: the file already stored is reused
+        self.assertEqual(User.objects.get(pk=self.user.pk).profile_picture_thumbnail.name, thumbnail)
+
+    def test_stale_processing_is_discarded(self):
+        self.upload()
+        render = pictures.images.render_variants
+
+        def replaced_meanwhile(file):
+            User.objects.filter(pk=self.user.pk).update(profile_picture="profiles/other.jpg")
+            return render(file)
+
+        with mock.patch.object(pictures.images, "render_variants", replaced_meanwhile):
+            self.assertFalse(pictures.process(self.user.pk))
+        self.assertFalse(User.objects.get(pk=self.user.pk).profile_picture_thumbnail)
+
+
+class BulkFollowTests(APITestCase):
+    def setUp(self):
+        self.me = User.objects.create(username="me")
+        self.others = [User.objects.create(username=f"user{i}") for i in range(4)]
+        self.client.force_authenticate(self.me)
+
+    def ids(self, users):
+        return [user.pk for user in users]
+
+    def test_bulk_follow_in_one_insert(self):
+        self.me.following.add(self.others[0])
+        payload = {"ids": self.ids(self.others) + [999, self.me.pk]}
+        # id check, then in a savepoint: INSERT, the two counter UPDATEs,
+        # the stale mark for suggestions and dropping the followed suggestions
+        with self.assertNumQueries(8):
+            response = self.client.post("/api/auth/follow/bulk/", payload, format="json")
+        self.assertEqual(response.data, {
+            "followed": self.ids(self.others[1:]),
+            "already_following": [self.others[0].pk],
+            "invalid": [999, self.me.pk],
+        })
+        self.assertEqual(set(self.me.following.values_list("pk", flat=True)), set(self.ids(self.others)))
+        self.me.refresh_from_db()
+        self.others[1].refresh_from_db()
+        self.assertEqual((self.me.following_count, self.others[1].followers_count), (4, 1))
+
+    def test_bulk_unfollow(self):
+        self.me.following.add(*self.others[:2])
+        response = self.client.post("/api/auth/unfollow/bulk/", {"ids": self.ids(self.others[1:3])}, format="json")
+        self.assertEqual(response.data, {"unfollowed": [self.others[1].pk], "not_following": [self.others[2].pk]})
+        self.me.refresh_from_db()
+        self.assertEqual(self.me.following_count, 1)
+
+    @override_settings(FOLLOW_BULK_MAX_IDS=2)
+    def test_rejects_bad_ids(self):
+        self.assertEqual(self.client.post("/api/auth/follow/bulk/", {"ids": ["x"]}, format="json").status_code, 400)
+        for body in ([1, 2], {"ids": [1.5]}, {"ids": [True]}, {"ids": 3}, {"ids": [[1]]}):
+            response = self.client.post("/api/auth/follow/bulk/", body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn("ids", response.data)
+        response = self.client.post("/api/auth/follow/bulk/", {"ids": self.ids(self.others)}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_relationship_status_in_one_query(self):
+        a, b, c, d = self.others
+        self.me.following.add(a, b)
+        self.me.followers.add(b, c)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/auth/relationships/", {"ids": f"{a.pk},{b.pk},{c.pk},{d.pk}"})
+        self.assertEqual(response.data["relationships"], {
+            str(a.pk): {"following": True, "followed_by": False},
+            str(b.pk): {"following": True, "followed_by": True},
+            str(c.pk): {"following": False, "followed_by": True},
+            str(d.pk): {"following": False, "followed_by": False},
+        })
+
+
+class FollowSuggestionTests(APITestCase):
+    def setUp(self):
+        # me -> a, b; a -> c, d; b -> c, me; c -> e
+        self.me, self.a, self.b, self.c, self.d, self.e = (
+            User.objects.create(username=name) for name in ("me", "a", "b", "c", "d", "e")
+        )
+        self.me.following.add(self.a, self.b)
+        self.a.following.add(self.c, self.d)
+        self.b.following.add(self.c, self.me)
+        self.c.following.add(self.e)
+        self.client.force_authenticate(self.me)
+
+    def suggested(self, user):
+        return list(user.follow_suggestions.order_by("-mutual_count", "-suggested_id")
+                    .values_list("suggested__username", "mutual_count"))
+
+    def test_friends_of_friends_ranked_by_mutual_follows(self):
+        call_command("refresh_follow_suggestions", "--all", stdout=StringIO())
+        self.assertEqual(self.suggested(self.me), [("c", 2), ("d", 1)])
+        self.assertEqual(self.suggested(self.a), [("e", 1)])
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/auth/suggestions/", {"page_size": 1})
+        self.assertEqual(response.data["results"], [{"id": self.c.pk, "username": "c", "mutual_count": 2}])
+        rest = self.client.get(response.data["next"])
+        self.assertEqual(rest.data["results"], [{"id": self.d.pk, "username": "d", "mutual_count": 1}])
+
+    def test_pure_python_scores_match(self):
+        from accounts import suggestions
+
+        targets = sorted({user.pk for user in (self.me, self.a, self.b, self.c)})
+        edges = list(suggestions.load_edges())
+        expected = [batch for batch in suggestions.iter_scores(targets, edges)]
+        with mock.patch.object(suggestions, "sparse", None):
+            self.assertEqual(list(suggestions.iter_scores(targets, edges)), expected)
+
+    def test_follows_refresh_incrementally(self):
+        call_command("refresh_follow_suggestions", "--all", stdout=StringIO())
+        self.assertEqual(self.suggested(self.b), [("e", 1), ("a", 1)])
+        # Following c drops it at once; the refresh also reaches b, who follows me
+        self.client.post(f"/api/auth/follow/{self.c.pk}/")
+        self.assertEqual(self.suggested(self.me), [("d", 1)])
+        call_command("refresh_follow_suggestions", stdout=StringIO())
+        self.assertEqual(self.suggested(self.me), [("e", 1), ("d", 1)])
+        self.assertEqual(self.suggested(self.b), [("e", 1), ("a", 1)])
+        self.client.post(f"/api/auth/follow/{self.e.pk}/")
+        call_command("refresh_follow_suggestions", stdout=StringIO())
+        self.assertEqual(self.suggested(self.b), [("e", 2), ("a", 1)])
+
+    def test_marking_stale_without_conflict_targets(self):
+        # MySQL upserts on any unique key and rejects unique_fields
+        from accounts.models import StaleFollowSuggestions
+
+        features = type(connection.features)
+        with mock.patch.object(features, "supports_update_conflicts_with_target", False), \
+                mock.patch.object(StaleFollowSuggestions.objects, "bulk_create") as bulk_create:
+            self.me.following.add(self.c)
+        self.assertNotIn("unique_fields", bulk_create.call_args.kwargs)
+        self.assertEqual(bulk_create.call_args.kwargs["update_fields"], ["marked_at"])
+
+
+class AsyncLoginTests(APITestCase):
+    async def test_register_then_login(self):
+        response = await self.async_client.post(
+            "/api/auth/async/register/", {"username": "dana", "email": "dana@example.com", "password": "s3cret-pw"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        token = response.json()["token"]
+        user = await User.objects.aget(username="dana")
+        self.assertTrue(check_password("s3cret-pw", user.password))
+
+        response = await self.async_client.post(
+            "/api/auth/async/login/", {"username": "dana", "password": "s3cret-pw"}, content_type="application/json"
+        )
+        self.assertEqual(response.json()["token"], token)
+        for username, password in [("dana", "wrong"), ("nobody", "s3cret-pw")]:
+            response = await self.async_client.post(
+                "/api/auth/async/login/", {"username": username, "password": password},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"non_field_errors": ["Invalid credentials"]})
+
+    async def test_rejected_when_the_pool_is_full(self):
+        with mock.patch.object(hashing, "_pool", hashing.HashingPool(workers=1, max_pending=0)):
+            response = await self.async_client.post(
+                "/api/auth/async/login/", {"username": "dana", "password": "pw"}, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_pool_bounds_pending_jobs(self):
+        pool, release = hashing.HashingPool(workers=1, max_pending=1), threading.Event()
+        job = pool.submit(release.wait)
+        with self.assertRaises(hashing.HashingUnavailable):
+            pool.submit(release.wait)
+        release.set()
+        job.result()
+        self.assertEqual(pool.submit(sum, [1, 2]).result(), 3)
+
+    async def test_outdated_hashes_are_rehashed_in_the_background(self):
+        old = PBKDF2PasswordHasher().encode("pw", "salt", iterations=1000)
+        user = await User.objects.acreate(username="erin", password=old)
+        self.assertEqual(await hashing.aauthenticate("erin", "pw"), user)
+        await asyncio.gather(*hashing._rehashes)
+        await user.arefresh_from_db()
+        self.assertNotEqual(user.password, old)
+        self.assertTrue(check_password("pw", user.password))
+        # A password changed meanwhile is kept
+        self.assertFalse(await hashing.arehash(user.pk, old, "pw"))
@@ -1,18 +1,28 @@
 # accounts/urls.py
 from django.urls import path
 from .views import (
-    RegisterView, LoginView, ProfileView,
-    FollowUserView, UnfollowUserView,
+    RegisterView, LoginView, AsyncRegisterView, AsyncLoginView, ProfileView,
+    FollowUserView, UnfollowUserView, BulkFollowView, BulkUnfollowView, RelationshipStatusView,
+    FollowSuggestionsView,
     FollowersListView, FollowingListView,
+    AsyncFollowersListView, AsyncFollowingListView,
 )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/',    LoginView.as_view(),    name='login'),
     path('profile/',  ProfileView.as_view(),  name='profile'),
+    path('async/register/', AsyncRegisterView.as_view(), name='async-register'),
+    path('async/login/',    AsyncLoginView.as_view(),    name='async-login'),
 
     path('follow/<int:user_id>/',   FollowUserView.as_view(),   name='follow-user'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow-user'),
+    path('follow/bulk/',   BulkFollowView.as_view(),   name='bulk-follow'),
+    path('unfollow/bulk/', BulkUnfollowView.as_view(), name='bulk-unfollow'),
+    path('relationships/', RelationshipStatusView.as_view(), name='relationship-status'),
+    path('suggestions/',   FollowSuggestionsView.as_view(),  name='follow-suggestions'),
     path('followers/<int:user_id>/', FollowersListView.as_view(), name='followers-list'),
     path('following/<int:user_id>/', FollowingListView.as_view(), name='following-list'),
+    path('async/followers/<int:user_id>/', AsyncFollowersListView.as_view(), name='async-followers-list'),
+    path('async/following/<int:user_id>/', AsyncFollowingListView.as_view(), name='async-following-list'),
 ]
@@ -1,14 +1,25 @@
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from accounts.models import CustomUser
+from django.db import transaction
+from accounts.models import CustomUser, FollowSuggestion
+from social_media_api.async_views import AsyncAPIView
+from social_media_api.params import requested_ids
 
-from .serializers import RegisterSerializer, LoginSerializer, UserSerializer, LightweightUserSerializer
+from . import follows, hashing, suggestions
+from .serializers import (
+    RegisterSerializer, LoginSerializer, CredentialsSerializer, UserSerializer, LightweightUserSerializer,
+    FollowSuggestionSerializer,
+)
 
 User = get_user_model()
 
@@ -38,28 +49,67 @@ class LoginView(APIView):
         })
 
 
+class AsyncRegisterView(AsyncAPIView):
+    """RegisterView with the password hashed in a bounded pool (see accounts.hashing)."""
+    http_method_names = ['post', 'options']
+    authentication_required = False
+
+    async def post(self, request):
+        serializer = RegisterSerializer(data=self.request.data)
+        # The unique username check queries
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        password_hash = await hashing.ahash_password(serializer.validated_data['password'])
+        user = await sync_to_async(serializer.save)(password_hash=password_hash)
+        token = await Token.objects.aget(user=user)
+        return self.render({
+            "user": UserSerializer(user).data,
+            "token": token.key
+        })
+
+
+class AsyncLoginView(AsyncAPIView):
+    """LoginView with the password checked in a bounded pool (see accounts.hashing)."""
+    http_method_names = ['post', 'options']
+    authentication_required = False
+
+    async def post(self, request):
+        serializer = CredentialsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        user = await hashing.aauthenticate(**serializer.validated_data)
+        if user is None:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["Invalid credentials"]})
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return self.render({
+            "user": UserSerializer(user).data,
+            "token": token.key
+        })
+
+
 class ProfileView(generics.RetrieveUpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user may come from the token cache, with stale counters
+        return get_object_or_404(self.get_queryset(), pk=self.request.user.pk)
     
 
 class FollowUserView(generics.GenericAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, pk):
+    def post(self, request, user_id):
         """Follow a user"""
-        user_to_follow = get_object_or_404(CustomUser, pk=pk)
+        user_to_follow = get_object_or_404(CustomUser, pk=user_id)
 
         if user_to_follow == request.user:
             return Response({"detail": "You cannot follow yourself."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        request.user.following.add(user_to_follow)
+        with transaction.atomic():
+            # The follow counters move in the same transaction (accounts.signals)
+            request.user.following.add(user_to_follow)
         return Response({"detail": f"You are now following {user_to_follow.username}."},
                         status=status.HTTP_200_OK)
 
@@ -68,33 +118,103 @@ class UnfollowUserView(generics.GenericAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, pk):
+    def post(self, request, user_id):
         """Unfollow a user"""
-        user_to_unfollow = get_object_or_404(CustomUser, pk=pk)
+        user_to_unfollow = get_object_or_404(CustomUser, pk=user_id)
 
         if user_to_unfollow == request.user:
             return Response({"detail": "You cannot unfollow yourself."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        request.user.following.remove(user_to_unfollow)
+        with transaction.atomic():
+            request.user.following.remove(user_to_unfollow)
         return Response({"detail": f"You have unfollowed {user_to_unfollow.username}."},
                         status=status.HTTP_200_OK)
 
 
-class FollowersListView(APIView):
+class BulkFollowView(APIView):
+    """Follow up to FOLLOW_BULK_MAX_IDS users at once: ``{"ids": [...]}``."""
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        user = request.user
-        followers = user.followers.all()  # depends on your model’s related_name
-        data = [{"id": f.id, "username": f.username} for f in followers]
-        return Response(data)
-    
-class FollowingListView(APIView):
+    def post(self, request):
+        ids = requested_ids(request, getattr(settings, 'FOLLOW_BULK_MAX_IDS', 100), 'user')
+        followed, already_following, invalid = follows.follow_many(request.user, ids)
+        return Response({'followed': followed, 'already_following': already_following, 'invalid': invalid})
+
+
+class BulkUnfollowView(APIView):
+    """Unfollow up to FOLLOW_BULK_MAX_IDS users at once: ``{"ids": [...]}``."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ids = requested_ids(request, getattr(settings, 'FOLLOW_BULK_MAX_IDS', 100), 'user')
+        unfollowed, not_following = follows.unfollow_many(request.user, ids)
+        return Response({'unfollowed': unfollowed, 'not_following': not_following})
+
+
+class RelationshipStatusView(APIView):
+    """
+    Whether the current user follows, and is followed by, each of up to
+    RELATIONSHIP_STATUS_MAX_IDS users (``?ids=`` or a ``{"ids": [...]}`` body).
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        following = user.following.all()  # users I follow
-        data = [{"id": f.id, "username": f.username} for f in following]
-        return Response(data)
+        ids = requested_ids(request, getattr(settings, 'RELATIONSHIP_STATUS_MAX_IDS', 500), 'user')
+        status_by_id = follows.relationships(request.user, ids)
+        return Response({'relationships': {str(pk): flags for pk, flags in status_by_id.items()}})
+
+    post = get
+
+
+class FollowSuggestionsView(generics.ListAPIView):
+    """Precomputed "people you may know" for the current user (see accounts.suggestions)."""
+    serializer_class = FollowSuggestionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = suggestions.SuggestionPagination
+
+    def get_queryset(self):
+        return FollowSuggestion.objects.filter(user=self.request.user).select_related('suggested').only(
+            'suggested_id', 'mutual_count', 'suggested__username'
+        )
+
+
+class FollowersListView(generics.GenericAPIView):
+    """Followers of the user in the URL, newest first, with their follow counts (see accounts.follows)."""
+    permission_classes = [IsAuthenticated]
+    pagination_class = follows.FollowPagination
+    relation = follows.FOLLOWERS
+
+    def get(self, request, user_id):
+        user = get_object_or_404(User.objects.only('pk', *follows.COUNT_FIELDS), pk=user_id)
+        page = self.paginate_queryset(follows.follow_rows(user.pk, self.relation))
+        response = self.get_paginated_response(follows.render_rows(page))
+        response.data.update(follows.follow_counts(user))
+        return response
+
+
+class FollowingListView(FollowersListView):
+    """Users followed by the user in the URL."""
+    relation = follows.FOLLOWING
+
+
+class AsyncFollowersListView(AsyncAPIView):
+    """FollowersListView read with the async ORM."""
+    relation = follows.FOLLOWERS
+
+    async def get(self, request, user_id):
+        user = await User.objects.only('pk', *follows.COUNT_FIELDS).filter(pk=user_id).afirst()
+        if user is None:
+            raise NotFound()
+        paginator = follows.FollowPagination()
+        page = await paginator.apaginate_queryset(
+            follows.follow_rows(user_id, self.relation), self.request, view=self
+        )
+        data = paginator.get_paginated_response(follows.render_rows(page)).data
+        data.update(follows.follow_counts(user))
+        return self.render(data)
+
+
+class AsyncFollowingListView(AsyncFollowersListView):
+    """Users followed by the user in the URL."""
+    relation = follows.FOLLOWING
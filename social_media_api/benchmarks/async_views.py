@@ -0,0 +1,126 @@
+"""
+Throughput of the sync and async feed/notification views under ASGI when
+every query is slow.
+
+Requests are driven concurrently through the project's ASGI application in
+process, against SQLite with an artificial per-query delay
+(``benchmarks.slow_sqlite``). ASGI_THREADS sets the size of the thread pool
+that sync views, and the async ORM's queries, run in.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks import harness
+
+
+def build_data(authors, posts_per_author, notifications):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from rest_framework.authtoken.models import Token
+
+    from notifications.models import Notification
+    from posts.models import Post
+
+    User = get_user_model()
+    User.objects.bulk_create([User(username=f"user{i}", password="!") for i in range(authors + 1)])
+    reader, *others = User.objects.order_by("pk")
+    reader.following.add(*others)
+
+    now = timezone.now()
+    Post.objects.bulk_create([
+        Post(author=author, title="t", content="c", created_at=now - timezone.timedelta(minutes=i))
+        for author in others for i in range(posts_per_author)
+    ])
+    Notification.objects.bulk_create([
+        Notification(recipient=reader, actor=others[i % len(others)], verb="followed you")
+        for i in range(notifications)
+    ])
+    return Token.objects.create(user=reader).key
+
+
+async def request(application, path, token):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"testserver"), (b"authorization", f"Token {token}".encode())],
+        "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+    }
+    disconnected = asyncio.Event()
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    disconnected.set()
+    if status != [200]:
+        raise RuntimeError(f"{path} answered {status}")
+
+
+async def load(application, path, token, requests, concurrency):
+    """Return (requests per second, median latency in ms)."""
+    semaphore, latencies = asyncio.Semaphore(concurrency), []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await request(application, path, token)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start), statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay-ms", type=float, default=20, help="Added to every query.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    os.environ.setdefault("BENCH_DB_ENGINE", "benchmarks.slow_sqlite")
+    harness.setup()
+    from django.core.asgi import get_asgi_application
+
+    from benchmarks import slow_sqlite
+    from benchmarks.slow_sqlite import base
+
+    with harness.bench_database():
+        token = build_data(authors=50, posts_per_author=5, notifications=200)
+        application = get_asgi_application()
+        base.query_delay = args.delay_ms / 1000
+        print(f"{args.delay_ms:g} ms per query, {args.requests} requests per cell, "
+              f"ASGI_THREADS={os.getenv('ASGI_THREADS', 'default')} ({slow_sqlite.__name__})\n")
+
+        rows = []
+        for label, path in [
+            ("feed (sync)", "/api/feed/"),
+            ("feed (async)", "/api/async/feed/"),
+            ("notifications (sync)", "/api/notifications/"),
+            ("notifications (async)", "/api/notifications/async/"),
+        ]:
+            row = [label]
+            for concurrency in args.concurrency:
+                throughput, latency = asyncio.run(load(application, path, token, args.requests, concurrency))
+                row.append(f"{throughput:.0f} req/s, p50 {latency:.0f} ms")
+            rows.append(row)
+        base.query_delay = 0
+
+    harness.print_table(["endpoint", *(f"concurrency {c}" for c in args.concurrency)], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Create N posts (and N comments) through the API: N single POSTs vs bulk
+requests of --chunk items.
+
+Requests go through the full DRF stack in process, so the numbers include
+authentication, validation and rendering but no network round-trips; over a
+network the gap grows by one round-trip per single create.
+"""
+import argparse
+
+from benchmarks import harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--chunk", type=int, default=500, help="Items per bulk request.")
+    parser.add_argument("--followers", type=int, default=50, help="Followers of the author (fan-out work).")
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+
+    from posts.models import Comment, Post
+
+    User = get_user_model()
+    with harness.bench_database():
+        author = User.objects.create(username="author")
+        User.objects.bulk_create([User(username=f"follower{i}") for i in range(args.followers)])
+        author.followers.add(*User.objects.exclude(pk=author.pk))
+        client = APIClient()
+        client.force_authenticate(author)
+        target = Post.objects.create(author=author, title="target", content="x")
+
+        def posts(count):
+            return [{"title": f"Imported {i}", "content": "Lorem ipsum dolor sit amet. " * 5} for i in range(count)]
+
+        def comments(count):
+            return [{"post": target.pk, "content": f"Imported comment {i}"} for i in range(count)]
+
+        def single(url, payload):
+            for item in payload:
+                assert client.post(url, item, format="json").status_code == 201
+
+        def bulk(url, payload):
+            for start in range(0, len(payload), args.chunk):
+                assert client.post(url + "bulk/", payload[start:start + args.chunk], format="json").status_code == 201
+
+        rows = []
+        for label, url, make in (("posts", "/api/posts/", posts), ("comments", "/api/comments/", comments)):
+            payload = make(args.items)
+            single_time, _ = harness.measure(lambda: single(url, payload), repeat=1)
+            bulk_time, _ = harness.measure(lambda: bulk(url, payload), repeat=1)
+            for mode, seconds in (("single", single_time), (f"bulk x{args.chunk}", bulk_time)):
+                rows.append([label, mode, f"{seconds:.2f}", f"{args.items / seconds:.0f}"])
+
+        assert Comment.objects.count() == 2 * args.items
+    print(f"{args.items} items, author with {args.followers} followers\n")
+    harness.print_table(["objects", "mode", "seconds", "items/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+A viral post's likes: notification rows written and the author's list,
+with and without coalescing.
+
+``--likes`` users like one post through ``notifications.aggregation.notify``
+(what LikePostView calls), in one window. "per event" is
+NOTIFICATION_COALESCE_WINDOW = 0, one row per like as before; "coalesced" is
+the default. Reported: rows written, time per like, and the author's first
+page of notifications (median), which per event is a page of the same post.
+"""
+import argparse
+
+from benchmarks import harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--likes", type=int, default=1000)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.contrib.auth import get_user_model
+    from django.test import Client, override_settings
+    from rest_framework.authtoken.models import Token
+
+    from notifications.aggregation import notify
+    from notifications.models import Notification
+    from posts.models import Post
+
+    User = get_user_model()
+    rows = []
+    with harness.bench_database():
+        author = User.objects.create(username="author")
+        post = Post.objects.create(author=author, title="Viral", content="c")
+        fans = User.objects.bulk_create([User(username=f"fan{i}") for i in range(args.likes)])
+        client = Client(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=author).key}")
+        for label, window in [("per event", 0), ("coalesced", 3600)]:
+            Notification.objects.all().delete()
+            with override_settings(NOTIFICATION_COALESCE_WINDOW=window):
+                seconds, _ = harness.measure(lambda: [notify(author, fan, "liked", post) for fan in fans], repeat=1)
+            listing, response = harness.measure(lambda: client.get("/api/notifications/"))
+            first = response.json()["results"][0]
+            rows.append([
+                label, Notification.objects.count(), f"{seconds / args.likes * 1000:.2f}",
+                f"{listing * 1000:.1f}", first.get("summary", ""),
+            ])
+
+    harness.print_table(["notifications", "rows", "ms per like", "list ms", "first row"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare the pull, push and hybrid home feeds on a synthetic follow graph.
+
+Reports the rows written to fan out one post per author class and the median
+time to read the first page of a feed for each read path.
+"""
+import argparse
+import io
+import random
+
+from benchmarks import harness
+
+
+def build_graph(users, follows_per_user, celebrities, posts_per_author):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from posts.models import Post
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        [User(username=f"user{i}", password="!") for i in range(users)], batch_size=1000
+    )
+    ids = list(User.objects.order_by("pk").values_list("pk", flat=True))
+    celebrity_ids, regular_ids = ids[:celebrities], ids[celebrities:]
+
+    # Everyone follows every celebrity plus a random sample of regular users
+    Follow = User.followers.through
+    edges = []
+    for follower in ids:
+        followed = set(celebrity_ids) | set(random.sample(regular_ids, follows_per_user))
+        followed.discard(follower)
+        edges.extend(Follow(from_customuser_id=f, to_customuser_id=follower) for f in followed)
+    Follow.objects.bulk_create(edges, batch_size=5000)
+    # bulk_create sends no m2m_changed; the hybrid threshold reads followers_count
+    call_command("reconcile_follow_counts", stdout=io.StringIO())
+
+    now = timezone.now()
+    Post.objects.bulk_create(
+        [
+            Post(author_id=author, title="t", content="c", created_at=now - timezone.timedelta(minutes=random.randint(0, 10000)))
+            for author in ids
+            for _ in range(posts_per_author)
+        ],
+        batch_size=5000,
+    )
+    return ids, celebrity_ids, len(edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--follows", type=int, default=50, help="Regular users followed per user.")
+    parser.add_argument("--celebrities", type=int, default=5)
+    parser.add_argument("--posts", type=int, default=5, help="Posts per author.")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--readers", type=int, default=50, help="Users whose feed is read.")
+    args = parser.parse_args()
+
+    harness.setup()
+    from posts import timeline
+    from posts.models import Post, TimelineEntry
+
+    random.seed(1)
+    with harness.bench_database():
+        ids, celebrity_ids, edge_count = build_graph(args.users, args.follows, args.celebrities, args.posts)
+        threshold = args.users // 2
+        print(f"{args.users} users, {edge_count} follow edges, {Post.objects.count()} posts, "
+              f"{len(celebrity_ids)} authors above the {threshold}-follower threshold\n")
+
+        # Write side: rows needed to fan out one post
+        celebrity_post = Post.objects.filter(author_id=celebrity_ids[0]).first()
+        regular_post = Post.objects.filter(author_id=ids[-1]).first()
+        write_rows = []
+        for label, limit in (("push", None), ("hybrid", threshold)):
+            for kind, post in (("celebrity", celebrity_post), ("regular", regular_post)):
+                TimelineEntry.objects.all().delete()
+                seconds, written = harness.measure(
+                    lambda: timeline.fan_out_post(post, threshold=limit if limit is not None else args.users), repeat=1
+                )
+                write_rows.append([label, kind, written, f"{seconds * 1000:.1f}"])
+        harness.print_table(["mode", "author", "rows written", "ms"], write_rows)
+        print()
+
+        # Read side: materialize timelines for the push and hybrid variants
+        from django.contrib.auth import get_user_model
+
+        readers = list(get_user_model().objects.filter(pk__in=ids[: args.readers]))
+        read_rows = []
+        for label in ("pull", "push", "hybrid"):
+            TimelineEntry.objects.all().delete()
+            if label != "pull":
+                limit = threshold if label == "hybrid" else args.users
+                for post in Post.objects.only("pk", "author_id", "created_at").iterator():
+                    timeline.fan_out_post(post, threshold=limit)
+
+            def read_pages():
+                for reader in readers:
+                    if label == "pull":
+                        feed = timeline.pull_feed(reader)
+                    elif label == "push":
+                        feed = timeline.push_feed(reader)
+                    else:
+                        feed = timeline.hybrid_feed(reader, threshold=threshold)
+                    list(feed[: args.page_size])
+
+            seconds, _ = harness.measure(read_pages, repeat=3)
+            read_rows.append([label, TimelineEntry.objects.count(), f"{seconds / len(readers) * 1000:.2f}"])
+        harness.print_table(["mode", "timeline rows", "ms per first page"], read_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Build "people you may know" suggestions for every user of a synthetic follow
+graph and report build time and peak Python memory per graph size.
+
+Follows are skewed like a real graph: a tenth of the users are popular and
+draw half of the follows. "score" reads the graph and computes every user's
+friends-of-friends (sparse A @ A, or the pure-Python fallback); "build" is a
+full ``refresh_follow_suggestions --all``, which also writes the
+FollowSuggestion rows. Memory is the tracemalloc peak of "score", which
+covers numpy/scipy buffers; writes go out in bounded batches.
+"""
+import argparse
+import random
+import tracemalloc
+from unittest import mock
+
+from benchmarks import harness
+
+
+def build_graph(users, edges):
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    Follow = User.followers.through
+    Follow.objects.all().delete()  # from the previous graph size
+    created = User.objects.bulk_create(
+        [User(username=f"user{edges}-{i}", password="!") for i in range(users)], batch_size=5000
+    )
+    ids = [user.pk for user in created]
+    popular = ids[:max(1, users // 10)]
+
+    pairs = set()
+    while len(pairs) < edges:
+        follower = random.choice(ids)
+        followed = random.choice(popular if random.random() < 0.5 else ids)
+        if follower != followed:
+            pairs.add((follower, followed))
+    pairs = list(pairs)
+    for start in range(0, len(pairs), 20000):
+        Follow.objects.bulk_create(
+            [Follow(from_customuser_id=f, to_customuser_id=u) for u, f in pairs[start:start + 20000]]
+        )
+
+
+def peak_memory(fn):
+    """Peak traced Python memory (MB) while running ``fn``; timed separately, as tracing is slow."""
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--follows-per-user", type=int, default=20,
+                        help="Average out-degree; sets the number of users per graph.")
+    parser.add_argument("--engines", nargs="+", default=["sparse", "python"], choices=["sparse", "python"])
+    args = parser.parse_args()
+
+    harness.setup()
+    from accounts import suggestions
+    from accounts.models import FollowSuggestion
+
+    if suggestions.sparse is None and "sparse" in args.engines:
+        parser.error("the sparse engine needs numpy and scipy installed")
+
+    rows = []
+    with harness.bench_database():
+        for edge_count in args.edges:
+            users = max(2, edge_count // args.follows_per_user)
+            build_graph(users, edge_count)
+            for engine in args.engines:
+                sparse = suggestions.sparse if engine == "sparse" else None
+                with mock.patch.object(suggestions, "sparse", sparse):
+                    def score():
+                        edges = list(suggestions.load_edges())
+                        targets = sorted({follower for follower, _ in edges})
+                        return sum(len(batch) for batch in suggestions.iter_scores(targets, edges))
+
+                    score_seconds, _ = harness.measure(score, repeat=1)
+                    score_mb = peak_memory(score)
+                    build_seconds, (_, written) = harness.measure(suggestions.refresh_suggestions, repeat=1)
+                assert FollowSuggestion.objects.count() == written
+                rows.append([
+                    f"{edge_count:,}", f"{users:,}", engine, f"{score_seconds:.1f}", f"{score_mb:.0f}",
+                    f"{build_seconds:.1f}", f"{written:,}",
+                ])
+    print(f"{args.follows_per_user} follows per user on average, "
+          f"{suggestions.get_max_per_user()} suggestions kept per user\n")
+    harness.print_table(
+        ["edges", "users", "engine", "score s", "score peak MB", "build s", "rows"], rows
+    )
+
+
+if __name__ == "__main__":
+    main()
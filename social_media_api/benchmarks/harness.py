@@ -0,0 +1,55 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run a benchmark from the project directory, e.g.::
+
+    python -m benchmarks.feed_modes --users 5000
+
+Every run creates a fresh test database and destroys it afterwards.
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup(extra_apps=()):
+    """Configure Django with the benchmark settings, plus ``extra_apps`` if given."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    from django.conf import settings
+
+    if extra_apps:
+        settings.INSTALLED_APPS = [*settings.INSTALLED_APPS, *extra_apps]
+    django.setup()
+
+
+@contextmanager
+def bench_database():
+    """Create a throwaway test database for the duration of the block."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times; return (median seconds, last result)."""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers, ["-" * w for w in widths], *rows]:
+        print("  ".join(str(cell).ljust(w) for cell, w in zip(row, widths)))
@@ -0,0 +1,110 @@
+"""
+Serialize + render time per 1,000 objects: DRF's stdlib JSON vs orjson.
+
+Objects are built in memory, so no database is needed. The Book and Author
+serializers come from advanced-api-project, whose ``api`` app is loaded next
+to this project's apps for the run. Every case renders with this project's
+``social_media_api.renderers``; advanced-api-project and api_project each
+keep their own identical copy of that module, so the numbers hold for them.
+"""
+import argparse
+import io
+import sys
+from pathlib import Path
+
+from benchmarks import harness
+
+BOOK_PROJECT = Path(__file__).resolve().parents[2] / "advanced-api-project"
+
+
+def build_posts(count):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from posts.models import Comment, Post
+
+    now = timezone.now()
+    author = get_user_model()(id=1, username="author")
+    posts = []
+    for i in range(count):
+        post = Post(id=i + 1, author=author, title=f"Post {i}", content="Lorem ipsum dolor sit amet. " * 10,
+                    created_at=now, updated_at=now, like_count=i % 97, comment_count=3)
+        post.recent_comments = [
+            Comment(id=i * 3 + j, post=post, author=author, content="Nice post!", created_at=now, updated_at=now)
+            for j in range(3)
+        ]
+        posts.append(post)
+    return posts
+
+
+def build_notifications(count):
+    from django.contrib.auth import get_user_model
+
+    from notifications.models import Notification
+
+    User = get_user_model()
+    recipient, actor = User(id=1, username="recipient"), User(id=2, username="actor")
+    return [Notification(id=i + 1, recipient=recipient, actor=actor, verb="liked your post") for i in range(count)]
+
+
+def build_authors(count, books_per_author=5):
+    from api.models import Author, Book
+
+    authors = []
+    for i in range(count // books_per_author):
+        author = Author(id=i + 1, name=f"Author {i}")
+        books = [
+            Book(id=i * books_per_author + j + 1, title=f"Book {j} by author {i}", publication_year=1950 + j,
+                 author=author)
+            for j in range(books_per_author)
+        ]
+        # What prefetch_related("books") would leave behind
+        author._prefetched_objects_cache = {"books": books}
+        authors.append(author)
+    return authors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--objects", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BOOK_PROJECT))
+    harness.setup(extra_apps=["api"])
+    from api.serializers import AuthorSerializer, BookSerializer
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from notifications.serializers import NotificationSerializer
+    from posts.serializers import PostListSerializer
+    from social_media_api import renderers
+
+    print(f"orjson available: {renderers.orjson is not None}; times in ms per {args.objects} objects\n")
+    cases = [
+        ("PostListSerializer", PostListSerializer, build_posts(args.objects), {"liked_post_ids": set()}),
+        ("NotificationSerializer", NotificationSerializer, build_notifications(args.objects), {}),
+        ("BookSerializer", BookSerializer,
+         [book for author in build_authors(args.objects) for book in author.books.all()], {}),
+        # Counted in books: authors of five nested books each
+        ("AuthorSerializer", AuthorSerializer, build_authors(args.objects), {}),
+    ]
+    rows = []
+    for label, serializer_class, objects, context in cases:
+        serialize, data = harness.measure(
+            lambda: serializer_class(objects, many=True, context=context).data, args.repeat
+        )
+        for renderer, json_parser in ((JSONRenderer(), JSONParser()),
+                                      (renderers.FastJSONRenderer(), renderers.FastJSONParser())):
+            render, body = harness.measure(lambda: renderer.render(data), args.repeat)
+            parse, _ = harness.measure(lambda: json_parser.parse(io.BytesIO(body)), args.repeat)
+            rows.append([
+                label, type(renderer).__name__,
+                f"{serialize * 1000:.1f}", f"{render * 1000:.2f}",
+                f"{(serialize + render) * 1000:.1f}", f"{parse * 1000:.2f}", len(body),
+            ])
+    harness.print_table(["serializer", "renderer", "serialize", "render", "total", "parse", "bytes"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Like latency with its side effects queued, and worker throughput by batch size.
+
+Every query gets a fixed delay, standing in for the round trip to a database
+server (``benchmarks.slow_sqlite``). "queued" is POST /api/<id>/like/ as it
+is now: the Like insert and two job inserts. "inline" is the same request
+followed by running its own jobs one at a time, i.e. the work the request
+used to do before answering (counter UPDATE, notification merge), plus the
+queue's own claim and delete queries, so it somewhat overstates it. The
+worker rows then drain ``--likes`` queued likes of a few posts with
+``run_jobs``' batch sizes.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks import harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay-ms", type=float, default=1, help="Added to every query.")
+    parser.add_argument("--likes", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=5)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+
+    os.environ.setdefault("BENCH_DB_ENGINE", "benchmarks.slow_sqlite")
+    harness.setup()
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from rest_framework.authtoken.models import Token
+
+    from benchmarks.slow_sqlite import base
+    from jobs import queue
+    from jobs.models import Job
+    from posts.models import Like, Post
+
+    User = get_user_model()
+    rows = []
+    with harness.bench_database():
+        author = User.objects.create(username="author")
+        posts = Post.objects.bulk_create([Post(author=author, title="t", content="c") for _ in range(args.posts)])
+        fans = User.objects.bulk_create([User(username=f"fan{i}") for i in range(args.likes)])
+        clients = [Client(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=fan).key}") for fan in fans]
+        base.query_delay = args.delay_ms / 1000
+
+        def like_all(run_inline):
+            Like.objects.all().delete()
+            Job.objects.all().delete()
+            latencies = []
+            for i, client in enumerate(clients):
+                start = time.perf_counter()
+                assert client.post(f"/api/{posts[i % len(posts)].pk}/like/").status_code == 201
+                if run_inline:
+                    queue.run_pending(batch_size=1)
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        for label, inline in [("inline", True), ("queued", False)]:
+            latencies = like_all(inline)
+            rows.append([f"like, {label}", f"{statistics.median(latencies) * 1000:.1f} ms", ""])
+
+        for batch_size in args.batch_sizes:
+            like_all(False)
+            seconds, (ran, failed) = harness.measure(lambda: queue.run_pending(batch_size), repeat=1)
+            rows.append([f"worker, batch {batch_size}", f"{seconds / ran * 1000:.2f} ms per job", f"{ran / seconds:.0f}"])
+        base.query_delay = 0
+
+    print(f"{args.delay_ms:g} ms per query, {args.likes} likes over {args.posts} posts\n")
+    harness.print_table(["", "latency", "jobs/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Latency of other endpoints during a burst of logins, sync vs async login.
+
+A storm of concurrent logins is driven through the ASGI application in
+process while a single client keeps reading its notifications (async view).
+The sync LoginView hashes in whichever worker thread serves it; the async
+one hashes in accounts.hashing's bounded pool and answers 503 once
+PASSWORD_HASHING_MAX_PENDING hashes are in flight. Reported: logins
+accepted per second, logins rejected, and the reader's median and worst
+latency while the storm lasts.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks import harness
+from benchmarks.async_views import build_data, request
+
+
+async def post(application, path, body):
+    payload = json.dumps(body).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+        "headers": [
+            (b"host", b"testserver"), (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+        ],
+    }
+    disconnected = asyncio.Event()
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    disconnected.set()
+    return status[0]
+
+
+async def storm(application, login_path, token, logins, concurrency):
+    semaphore, statuses, latencies = asyncio.Semaphore(concurrency), [], []
+    done = asyncio.Event()
+
+    async def login():
+        async with semaphore:
+            statuses.append(await post(application, login_path, {"username": "storm", "password": "storm-pw"}))
+
+    async def reader():
+        while not done.is_set():
+            start = time.perf_counter()
+            await request(application, "/api/notifications/async/", token)
+            latencies.append(time.perf_counter() - start)
+
+    reading = asyncio.ensure_future(reader())
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await reading
+    accepted = statuses.count(200)
+    return accepted / elapsed, len(statuses) - accepted, statistics.median(latencies), max(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50])
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.asgi import get_asgi_application
+
+    from accounts import hashing
+
+    rows = []
+    with harness.bench_database():
+        token = build_data(authors=20, posts_per_author=1, notifications=20)
+        get_user_model().objects.create_user(username="storm", password="storm-pw")
+        application = get_asgi_application()
+        for label, path in [("sync", "/api/auth/login/"), ("async", "/api/auth/async/login/")]:
+            for concurrency in args.concurrency:
+                throughput, rejected, p50, worst = asyncio.run(
+                    storm(application, path, token, args.logins, concurrency)
+                )
+                rows.append([
+                    label, concurrency, f"{throughput:.1f}", rejected, f"{p50 * 1000:.0f}", f"{worst * 1000:.0f}",
+                ])
+
+    print(f"{args.logins} logins per cell, {hashing.get_workers()} hashing workers, "
+          f"at most {hashing.get_max_pending()} pending\n")
+    harness.print_table(
+        ["login", "concurrency", "logins/s", "rejected", "reader p50 ms", "reader max ms"], rows
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Bytes a client downloads for one feed page with author avatars, before and
+after pre-sized profile picture variants.
+
+Every author on the page has uploaded a phone-sized photo. The page is
+requested with ``?expand=author`` and each distinct avatar URL is counted
+once, as a browser would fetch it. "original" is the page when lists linked
+to the uploads themselves (before variants existed); "thumbnail" is what
+LightweightUserSerializer links to now. Processing time is per upload, for
+both variants.
+"""
+import argparse
+import io
+import tempfile
+from unittest import mock
+
+from benchmarks import harness
+
+
+def photo(width, height):
+    """A noisy JPEG with EXIF; noise compresses somewhat worse than a typical photo."""
+    from PIL import Image
+
+    noise = Image.effect_noise((width // 4, height // 4), 60).resize((width, height))
+    image = Image.merge("RGB", [noise, noise.rotate(90), noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)])
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=92, exif=exif.tobytes())
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--authors", type=int, default=10, help="Authors, and posts, on the feed page.")
+    parser.add_argument("--size", type=int, nargs=2, default=[3024, 4032], metavar=("WIDTH", "HEIGHT"))
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.test import Client, override_settings
+    from rest_framework.authtoken.models import Token
+
+    from accounts import pictures
+    from posts.models import Post
+
+    User = get_user_model()
+    # Processed below, in the foreground, to time it
+    no_background = mock.patch("accounts.signals.images.schedule")
+    with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), no_background, \
+            harness.bench_database():
+        reader = User.objects.create(username="reader")
+        authors = []
+        for i in range(args.authors):
+            author = User(username=f"author{i}")
+            author.profile_picture.save(f"photo{i}.jpg", ContentFile(photo(*args.size)), save=False)
+            author.save()
+            authors.append(author)
+        reader.following.add(*authors)
+        Post.objects.bulk_create([Post(author=author, title="t", content="c") for author in authors])
+
+        seconds, _ = harness.measure(lambda: [pictures.process(author.pk) for author in authors], repeat=1)
+        client = Client(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=reader).key}")
+        response = client.get("/api/feed/", {"expand": "author", "page_size": args.authors})
+        page_bytes = len(response.content)
+        shown = {row["author"]["id"] for row in response.json()["results"]}
+
+        rows = []
+        for label, field in [("original", "profile_picture"), ("medium", "profile_picture_medium"),
+                             ("thumbnail", "profile_picture_thumbnail")]:
+            names = User.objects.filter(pk__in=shown).values_list(field, flat=True)
+            image_bytes = sum(default_storage.size(name) for name in names)
+            rows.append([label, f"{page_bytes:,}", f"{image_bytes:,}", f"{page_bytes + image_bytes:,}"])
+
+    print(f"{len(shown)} authors on the page, {args.size[0]}x{args.size[1]} uploads, "
+          f"{seconds / len(authors) * 1000:.0f} ms to process each\n")
+    harness.print_table(["avatars", "JSON bytes", "image bytes", "total bytes"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare full-text post search against the LIKE search of DRF's SearchFilter.
+
+Generates posts from a synthetic vocabulary, builds the full-text index and
+times the first page of results for common, rare and prefix queries.
+"""
+import argparse
+import random
+import time
+from functools import reduce
+from operator import and_, or_
+
+from benchmarks import harness
+
+PAGE_SIZE = 10
+
+
+def make_vocabulary(size):
+    random.seed(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return sorted({"".join(random.choices(letters, k=random.randint(4, 9))) for _ in range(size)})
+
+
+def populate(posts, vocabulary, words_per_post, batch_size=10000):
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Post
+
+    author = get_user_model().objects.create(username="author")
+    # Zipf-like word frequencies so there are both common and rare terms
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    for start in range(0, posts, batch_size):
+        Post.objects.bulk_create([
+            Post(
+                author=author,
+                title=" ".join(random.choices(vocabulary, weights, k=4)),
+                content=" ".join(random.choices(vocabulary, weights, k=words_per_post)),
+            )
+            for _ in range(min(batch_size, posts - start))
+        ])
+
+
+def like_search(terms):
+    """What SearchFilter(search_fields=['title', 'content']) runs."""
+    from django.db.models import Q
+
+    from posts.models import Post
+
+    condition = reduce(and_, (reduce(or_, (Q(title__icontains=t), Q(content__icontains=t))) for t in terms))
+    return Post.objects.filter(condition).order_by("-created_at", "-id")
+
+
+def fulltext_search(terms):
+    from posts import search
+    from posts.models import Post
+
+    return search.get_backend().search(Post.objects.all(), terms).order_by("-search_rank", "-id")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=40, help="Words per post body.")
+    args = parser.parse_args()
+
+    harness.setup()
+    from posts import search
+
+    with harness.bench_database():
+        vocabulary = make_vocabulary(args.vocabulary)
+        start = time.perf_counter()
+        populate(args.posts, vocabulary, args.words)
+        print(f"Inserted {args.posts} posts in {time.perf_counter() - start:.1f}s")
+
+        backend = search.get_backend()
+        start = time.perf_counter()
+        backend.rebuild(chunk_size=5000)
+        print(f"Built the {backend.vendor or 'LIKE'} index in {time.perf_counter() - start:.1f}s\n")
+
+        queries = {
+            "common term": [vocabulary[0]],
+            "rare term": [vocabulary[-1]],
+            "two terms": [vocabulary[1], vocabulary[50]],
+            "prefix": [vocabulary[10][:3]],
+        }
+        rows = []
+        for label, terms in queries.items():
+            like_seconds, like_page = harness.measure(lambda: list(like_search(terms)[:PAGE_SIZE]), repeat=3)
+            fts_seconds, fts_page = harness.measure(lambda: list(fulltext_search(terms)[:PAGE_SIZE]), repeat=3)
+            rows.append([
+                label, " ".join(terms),
+                f"{like_seconds * 1000:.1f}", len(like_page),
+                f"{fts_seconds * 1000:.1f}", len(fts_page),
+            ])
+        harness.print_table(["query", "terms", "LIKE ms", "rows", "full-text ms", "rows"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Settings for the benchmark scripts.
+
+The project settings, pointed at a throwaway database (in-memory SQLite
+unless BENCH_DB_ENGINE/BENCH_DB_NAME say otherwise).
+"""
+import os
+
+from social_media_api.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': os.getenv('BENCH_DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.getenv('BENCH_DB_NAME', 'bench'),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+    }
+}
+
+DEBUG = False
+SECURE_SSL_REDIRECT = False
+STATICFILES_DIRS = []
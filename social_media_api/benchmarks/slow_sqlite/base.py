@@ -0,0 +1,31 @@
+"""
+SQLite with an artificial per-query delay, standing in for a database server
+whose queries spend their time waiting on the network or on disk.
+
+The delay (seconds) is read from ``query_delay`` at execution time, so a
+benchmark can load its data first and switch it on afterwards.
+"""
+import time
+
+from django.db.backends.sqlite3 import base
+
+query_delay = 0.0
+
+
+class SlowCursorWrapper(base.SQLiteCursorWrapper):
+
+    def execute(self, query, params=None):
+        if query_delay:
+            time.sleep(query_delay)
+        return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if query_delay:
+            time.sleep(query_delay)
+        return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=SlowCursorWrapper)
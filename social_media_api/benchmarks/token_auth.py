@@ -0,0 +1,65 @@
+"""
+Requests per second with and without the token authentication cache.
+
+Same setup as ``benchmarks.async_views``: requests are driven concurrently
+through the ASGI application against SQLite with a per-query delay, one
+token throughout. "no cache" turns both levels of CachedTokenAuthentication
+off, so every request reads the Token and user as TokenAuthentication does;
+"django cache" keeps only the shared level; "lru + django cache" is the
+default configuration.
+"""
+import argparse
+import asyncio
+import os
+
+from benchmarks import harness
+from benchmarks.async_views import build_data, load
+
+CONFIGURATIONS = [
+    ("no cache", {"TOKEN_AUTH_CACHE_TTL": 0, "TOKEN_AUTH_LOCAL_CACHE_SIZE": 0}),
+    ("django cache", {"TOKEN_AUTH_LOCAL_CACHE_SIZE": 0}),
+    ("lru + django cache", {}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay-ms", type=float, default=2, help="Added to every query.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10])
+    args = parser.parse_args()
+
+    os.environ.setdefault("BENCH_DB_ENGINE", "benchmarks.slow_sqlite")
+    harness.setup()
+    from django.core.asgi import get_asgi_application
+    from django.core.cache import cache
+    from django.test import override_settings
+
+    from benchmarks.slow_sqlite import base
+    from social_media_api.authentication import local_cache
+
+    rows = []
+    with harness.bench_database():
+        token = build_data(authors=20, posts_per_author=5, notifications=50)
+        application = get_asgi_application()
+        base.query_delay = args.delay_ms / 1000
+        for path in ["/api/auth/profile/", "/api/notifications/", "/api/notifications/async/", "/api/feed/"]:
+            for label, overrides in CONFIGURATIONS:
+                cache.clear()
+                local_cache.clear()
+                row = [path, label]
+                with override_settings(**overrides):
+                    for concurrency in args.concurrency:
+                        throughput, latency = asyncio.run(
+                            load(application, path, token, args.requests, concurrency)
+                        )
+                        row.append(f"{throughput:.0f} req/s, p50 {latency:.1f} ms")
+                rows.append(row)
+        base.query_delay = 0
+
+    print(f"{args.delay_ms:g} ms per query, {args.requests} requests per cell\n")
+    harness.print_table(["endpoint", "auth cache", *(f"concurrency {c}" for c in args.concurrency)], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = ("Process queued jobs (notifications, counters, timeline fan-out) in batches. "
+            "Runs until interrupted; run one or more alongside the web server.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Jobs claimed at a time (default: JOBS_BATCH_SIZE).")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds to wait when no job is due.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once no job is due instead of waiting for more.")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            total, failed = queue.run_pending(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Ran {total} jobs, {failed} failed."))
+            return
+        while True:
+            claimed, failed = queue.run_batch(options["batch_size"])
+            if failed:
+                self.stderr.write(f"{failed} of {claimed} jobs failed and will be retried.")
+            if not claimed:
+                # Don't hold a connection open while idle
+                connections.close_all()
+                time.sleep(options["poll_interval"])
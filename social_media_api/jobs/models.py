@@ -0,0 +1,24 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A queued side effect (see jobs.queue). Deleted once it has run."""
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # Due time; moved ahead while a worker holds the job and after a failure
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Set once the job has used up its attempts; such jobs are kept, not run
+    failed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Due jobs, oldest first: failed_at IS NULL ORDER BY run_at, id
+            models.Index(fields=['failed_at', 'run_at', 'id'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
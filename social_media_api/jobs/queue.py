@@ -0,0 +1,145 @@
+"""
+A small durable job queue in the database.
+
+Side effects that the client does not wait for (notifications, counter
+updates, timeline fan-out) are enqueued as Job rows by the request that causes them, in the
+same transaction: a job exists exactly when the change that caused it was
+committed. ``manage.py run_jobs`` processes them in batches.
+
+A handler is registered per job kind with ``@handler(kind)`` and receives
+the payloads of up to JOBS_BATCH_SIZE jobs of its kind at once, so it can
+coalesce them (one UPDATE per post for a batch of counter deltas). The
+handler runs in a transaction together with the deletion of its jobs. When
+it raises, each job of the batch is retried on its own to isolate the
+failing ones, which are scheduled again after JOBS_RETRY_DELAY seconds,
+doubling with every attempt, and given up after JOBS_MAX_ATTEMPTS (kept
+with ``failed_at`` and ``last_error`` set).
+
+Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it, and push the claimed jobs' ``run_at`` JOBS_LEASE
+seconds ahead: a worker that dies mid-batch leaves its jobs to be picked up
+again once the lease runs out. Delivery is therefore at least once.
+"""
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+def get_batch_size():
+    return getattr(settings, 'JOBS_BATCH_SIZE', 100)
+
+
+def get_max_attempts():
+    return getattr(settings, 'JOBS_MAX_ATTEMPTS', 5)
+
+
+def get_retry_delay():
+    return getattr(settings, 'JOBS_RETRY_DELAY', 10)
+
+
+def get_lease():
+    return getattr(settings, 'JOBS_LEASE', 300)
+
+
+_handlers = {}
+
+
+def handler(kind):
+    """Register the decorated ``fn(payloads)`` to run jobs of ``kind``."""
+
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+
+    return register
+
+
+def enqueue(kind, payload):
+    """Queue a job; it is visible to workers when the current transaction commits."""
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def claim(batch_size=None, kinds=None, now=None):
+    """Lease up to ``batch_size`` due jobs, oldest first."""
+    now = now or timezone.now()
+    due = Job.objects.filter(failed_at=None, run_at__lte=now)
+    if kinds is not None:
+        due = due.filter(kind__in=kinds)
+    with transaction.atomic():
+        jobs = list(
+            due.select_for_update(skip_locked=True)
+            .order_by('run_at', 'id')
+            .only('kind', 'payload', 'attempts')[:batch_size or get_batch_size()]
+        )
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            run_at=now + timedelta(seconds=get_lease()), attempts=F('attempts') + 1
+        )
+    for job in jobs:
+        job.attempts += 1
+    return jobs
+
+
+def _run(fn, jobs):
+    with transaction.atomic():
+        fn([job.payload for job in jobs])
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+
+
+def _retry_later(job, error):
+    now = timezone.now()
+    if job.attempts >= get_max_attempts():
+        changes = {'failed_at': now}
+    else:
+        changes = {'run_at': now + timedelta(seconds=get_retry_delay() * 2 ** (job.attempts - 1))}
+    Job.objects.filter(pk=job.pk).update(last_error=error, **changes)
+
+
+def run_batch(batch_size=None, kinds=None):
+    """Claim and run one batch. Returns (jobs claimed, jobs that failed)."""
+    jobs = claim(batch_size, kinds)
+    by_kind = defaultdict(list)
+    for job in jobs:
+        by_kind[job.kind].append(job)
+
+    failed = 0
+    for kind, group in by_kind.items():
+        fn = _handlers.get(kind)
+        if fn is None:
+            for job in group:
+                _retry_later(job, f'No handler registered for {kind!r}')
+            failed += len(group)
+            continue
+        try:
+            _run(fn, group)
+            continue
+        except Exception:
+            if len(group) == 1:
+                _retry_later(group[0], traceback.format_exc())
+                failed += 1
+                continue
+        # One bad job should not hold back the rest of its batch
+        for job in group:
+            try:
+                _run(fn, [job])
+            except Exception:
+                _retry_later(job, traceback.format_exc())
+                failed += 1
+    return len(jobs), failed
+
+
+def run_pending(batch_size=None, kinds=None):
+    """Run batches until no job is due. Returns (jobs run, jobs that failed)."""
+    total = failed = 0
+    while True:
+        claimed, batch_failed = run_batch(batch_size, kinds)
+        if not claimed:
+            return total, failed
+        total += claimed
+        failed += batch_failed
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from notifications.models import Notification
+from posts.models import Post
+
+from . import queue
+from .models import Job
+
+User = get_user_model()
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.seen = []
+        patcher = mock.patch.dict(queue._handlers, {"test.record": self.record})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, payloads):
+        if any(payload.get("fail") for payload in payloads):
+            raise ValueError("bad job")
+        self.seen.append([payload["n"] for payload in payloads])
+
+    def test_runs_jobs_of_a_kind_in_batches(self):
+        for n in range(5):
+            queue.enqueue("test.record", {"n": n})
+        self.assertEqual(queue.run_pending(batch_size=3), (5, 0))
+        self.assertEqual(self.seen, [[0, 1, 2], [3, 4]])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_DELAY=10)
+    def test_failing_job_is_isolated_retried_and_given_up(self):
+        queue.enqueue("test.record", {"n": 0})
+        bad = queue.enqueue("test.record", {"n": 1, "fail": True})
+        queue.enqueue("test.record", {"n": 2})
+
+        self.assertEqual(queue.run_pending(), (3, 1))
+        self.assertEqual(self.seen, [[0], [2]])
+        bad.refresh_from_db()
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn("bad job", bad.last_error)
+        self.assertGreater(bad.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(queue.run_pending(), (0, 0))  # not due yet
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(queue.run_pending(), (1, 1))
+        bad.refresh_from_db()
+        self.assertIsNotNone(bad.failed_at)
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(queue.run_pending(), (0, 0))
+
+    def test_claimed_jobs_are_leased(self):
+        job = queue.enqueue("test.record", {"n": 0})
+        self.assertEqual([claimed.pk for claimed in queue.claim()], [job.pk])
+        self.assertEqual(queue.claim(), [])  # held by the first worker
+
+        # The first worker died: the job is due again once its lease runs out
+        later = timezone.now() + timedelta(seconds=queue.get_lease() + 1)
+        self.assertEqual([claimed.attempts for claimed in queue.claim(now=later)], [2])
+
+    def test_unknown_kind_is_retried(self):
+        job = queue.enqueue("test.missing", {})
+        self.assertEqual(queue.run_pending(), (1, 1))
+        job.refresh_from_db()
+        self.assertIn("No handler", job.last_error)
+
+
+class LikeJobsTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.fan = User.objects.create(username="fan")
+        self.post = Post.objects.create(author=self.author, title="t", content="c")
+        self.client.force_authenticate(self.fan)
+
+    def test_like_only_queues_its_side_effects(self):
+        # The post, get_or_create() of the like and its savepoints, and two job inserts
+        with self.assertNumQueries(9):
+            response = self.client.post(f"/api/{self.post.pk}/like/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Job.objects.count(), 2)
+        self.assertFalse(Notification.objects.exists())
+
+        stdout = StringIO()
+        call_command("run_jobs", once=True, stdout=stdout)
+        self.assertIn("Ran 2 jobs, 0 failed.", stdout.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        notification = Notification.objects.get()
+        self.assertEqual(
+            (notification.recipient, notification.actor, notification.target), (self.author, self.fan, self.post)
+        )
+
+    def test_deleted_target_drops_the_notification(self):
+        self.client.post(f"/api/{self.post.pk}/like/")
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(queue.run_pending(), (2, 0))
+        self.assertFalse(Notification.objects.exists())
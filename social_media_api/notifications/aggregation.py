@@ -0,0 +1,100 @@
+"""
+Coalesced notifications: "alice and 41 others liked your post".
+
+A viral post used to write one Notification per like, flooding its author's
+list with near-identical rows. ``notify()`` instead merges every event with
+the same recipient, verb and target into one row per
+NOTIFICATION_COALESCE_WINDOW seconds (fixed windows, counted from the
+epoch). The row keeps the latest actor in ``actor``, the newest
+NOTIFICATION_SAMPLE_ACTORS actors in ``recent_actors`` and the number of
+actors in ``actor_count``; each merge moves it back to the top of the list
+and marks it unread. A window of 0 writes one row per event, as before.
+
+Concurrent events for the same group are safe: the row is looked up under
+``select_for_update``, the first writer's INSERT wins the unique
+``group_key`` and the others fall back to merging into it, and the count is
+incremented in the database (``F('actor_count') + 1``), never read and
+written back. An actor already among the samples (an unlike and like again)
+is not counted twice.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification
+
+
+def get_window():
+    return getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', 3600)
+
+
+def get_sample_size():
+    return getattr(settings, 'NOTIFICATION_SAMPLE_ACTORS', 3)
+
+
+def group_key(recipient_id, verb, content_type_id, object_id, now):
+    """The ``group_key`` of the window ``now`` falls in, or None when coalescing is off."""
+    window = get_window()
+    if not window:
+        return None
+    bucket = int(now.timestamp()) // window
+    raw = f'{recipient_id}:{verb}:{content_type_id}:{object_id}:{bucket}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _locked_row(key):
+    return Notification.objects.select_for_update().filter(group_key=key).only('pk', 'recent_actors').first()
+
+
+def notify(recipient, actor, verb, target=None, now=None):
+    """Record that ``actor`` did ``verb`` (to ``target``) for ``recipient``; returns the row's pk."""
+    now = now or timezone.now()
+    content_type_id = ContentType.objects.get_for_model(target).pk if target is not None else None
+    object_id = target.pk if target is not None else None
+    sample = {'id': actor.pk, 'username': actor.username}
+    fields = {
+        'recipient_id': recipient.pk, 'actor_id': actor.pk, 'verb': verb,
+        'target_content_type_id': content_type_id, 'target_object_id': object_id,
+        'timestamp': now, 'recent_actors': [sample],
+    }
+    key = group_key(recipient.pk, verb, content_type_id, object_id, now)
+    if key is None:
+        return Notification.objects.create(**fields).pk
+
+    with transaction.atomic():
+        row = _locked_row(key)
+        if row is None:
+            try:
+                with transaction.atomic():
+                    return Notification.objects.create(group_key=key, **fields).pk
+            except IntegrityError:
+                # Another event created the group first; merge into it
+                row = _locked_row(key)
+        others = [entry for entry in row.recent_actors if entry['id'] != actor.pk]
+        update = {
+            'actor_id': actor.pk, 'timestamp': now, 'read': False,
+            'recent_actors': [sample] + others[:get_sample_size() - 1],
+        }
+        if len(others) == len(row.recent_actors):
+            update['actor_count'] = F('actor_count') + 1
+        Notification.objects.filter(pk=row.pk).update(**update)
+        return row.pk
+
+
+def summarize(actor_names, actor_count, verb):
+    """'alice liked', 'alice and bob liked' or 'alice and 41 others liked'."""
+    if not actor_names:
+        return verb
+    first = actor_names[0]
+    if actor_count <= 1:
+        who = first
+    elif actor_count == 2 and len(actor_names) > 1:
+        who = f'{first} and {actor_names[1]}'
+    else:
+        others = actor_count - 1
+        who = f'{first} and {others} other' + ('' if others == 1 else 's')
+    return f'{who} {verb}'
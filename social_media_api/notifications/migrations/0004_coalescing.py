@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+
+def fill_recent_actors(apps, schema_editor):
+    # Existing rows each stand for a single event by their actor
+    Notification = apps.get_model('notifications', 'Notification')
+    rows = Notification.objects.filter(recent_actors=[]).select_related('actor').only('pk', 'actor__username')
+    batch = []
+    for notification in rows.iterator(chunk_size=2000):
+        notification.recent_actors = [{'id': notification.actor_id, 'username': notification.actor.username}]
+        batch.append(notification)
+        if len(batch) == 2000:
+            Notification.objects.bulk_update(batch, ['recent_actors'])
+            batch = []
+    Notification.objects.bulk_update(batch, ['recent_actors'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_read_and_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='group_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='recent_actors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(fill_recent_actors, migrations.RunPython.noop),
+    ]
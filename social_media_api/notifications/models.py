@@ -24,6 +24,26 @@ class Notification(models.Model):
     target = GenericForeignKey("target_content_type", "target_object_id")
 
     timestamp = models.DateTimeField(default=timezone.now)  # ✅ default added
+    read = models.BooleanField(default=False)
+
+    # Coalescing (notifications.aggregation): events with the same recipient,
+    # verb and target within one window share the row keyed by group_key.
+    # ``actor`` is the latest actor, ``recent_actors`` the latest few as
+    # [{"id": ..., "username": ...}], newest first.
+    group_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_actors = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # A recipient's notifications, newest first, paginated on (timestamp, id)
+            models.Index(fields=["recipient", "-timestamp", "-id"], name="notification_recent_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.recent_actors and self.actor_id:
+            self.recent_actors = [{"id": self.actor_id, "username": self.actor.username}]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.actor} {self.verb} {self.target} -> {self.recipient}"
@@ -1,10 +1,21 @@
 from rest_framework import serializers
+from accounts.serializers import LightweightUserSerializer
+from social_media_api.sparse import DynamicFieldsMixin
+from .aggregation import summarize
 from .models import Notification
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     actor = serializers.StringRelatedField()
     target = serializers.StringRelatedField()
+    # A coalesced row: the newest few of its actor_count actors, newest first
+    actors = serializers.JSONField(source="recent_actors", read_only=True)
+    summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
-        fields = ["id", "actor", "verb", "target", "timestamp", "read"]
+        fields = ["id", "actor", "verb", "target", "timestamp", "read", "actor_count", "actors", "summary"]
+        expandable_fields = {"actor": lambda: LightweightUserSerializer(read_only=True)}
+
+    def get_summary(self, obj):
+        names = [entry["username"] for entry in obj.recent_actors]
+        return summarize(names, obj.actor_count, obj.verb)
@@ -0,0 +1,57 @@
+"""
+Notifications delivered by the job queue (see jobs.queue).
+
+The request enqueues who did what to which object, and when; the worker
+loads the users and targets of a whole batch with one query per model and
+merges each event through ``aggregation.notify`` at the time it happened.
+Events whose actor, recipient or target was deleted meanwhile are dropped.
+"""
+from collections import defaultdict
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs import queue
+
+from . import aggregation
+
+NOTIFY = "notifications.notify"
+
+
+def enqueue_notify(recipient_id, actor_id, verb, target=None):
+    queue.enqueue(NOTIFY, {
+        "recipient": recipient_id,
+        "actor": actor_id,
+        "verb": verb,
+        "target": [target._meta.label_lower, target.pk] if target is not None else None,
+        "at": timezone.now().isoformat(),
+    })
+
+
+@queue.handler(NOTIFY)
+def deliver(payloads):
+    user_ids, target_ids = set(), defaultdict(set)
+    for payload in payloads:
+        user_ids.update((payload["recipient"], payload["actor"]))
+        if payload["target"]:
+            label, pk = payload["target"]
+            target_ids[label].add(pk)
+    users = get_user_model().objects.only("pk", "username").in_bulk(user_ids)
+    targets = {
+        label: apps.get_model(label)._default_manager.only("pk").in_bulk(ids)
+        for label, ids in target_ids.items()
+    }
+
+    for payload in payloads:
+        recipient, actor = users.get(payload["recipient"]), users.get(payload["actor"])
+        if recipient is None or actor is None:
+            continue
+        target = None
+        if payload["target"]:
+            label, pk = payload["target"]
+            target = targets[label].get(pk)
+            if target is None:
+                continue
+        aggregation.notify(recipient, actor, payload["verb"], target, now=parse_datetime(payload["at"]))
@@ -1,3 +1,146 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from .models import Notification
+
+User = get_user_model()
+
+
+class NotificationListTests(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username="recipient", password="pass12345")
+        self.actor = User.objects.create_user(username="actor", password="pass12345")
+        self.notifications = [
+            Notification.objects.create(recipient=self.recipient, actor=self.actor, verb="followed you")
+            for _ in range(5)
+        ]
+        Notification.objects.create(recipient=self.actor, actor=self.recipient, verb="followed you")
+
+    def test_lists_own_notifications_with_cursor(self):
+        self.client.force_authenticate(self.recipient)
+        first = self.client.get("/api/notifications/", {"page_size": 3})
+        second = self.client.get(first.data["next"])
+
+        ids = [row["id"] for row in first.data["results"] + second.data["results"]]
+        self.assertEqual(ids, [n.pk for n in reversed(self.notifications)])
+        self.assertIsNone(second.data["next"])
+
+    def test_async_list_matches_sync_list(self):
+        from rest_framework.authtoken.models import Token
+
+        from posts.models import Post
+
+        post = Post.objects.create(author=self.recipient, title="Hi", content="There")
+        Notification.objects.create(recipient=self.recipient, actor=self.actor, verb="liked", target=post)
+        token = Token.objects.create(user=self.recipient)
+
+        self.client.force_authenticate(self.recipient)
+        expected = self.client.get("/api/notifications/", {"page_size": 4}).json()
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        first = self.client.get("/api/notifications/async/", {"page_size": 4})
+        self.assertEqual(first.json()["results"], expected["results"])
+        self.assertEqual(first.json()["results"][0]["target"], "Hi")
+
+        second = self.client.get(first.json()["next"]).json()
+        self.assertEqual(len(second["results"]), 2)
+        self.assertIsNone(second["next"])
+
+    def test_async_list_requires_token(self):
+        self.assertEqual(self.client.get("/api/notifications/async/").status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION="Token nope")
+        self.assertEqual(self.client.get("/api/notifications/async/").status_code, 401)
+
+    def test_sparse_fieldset_and_actor_expansion(self):
+        self.client.force_authenticate(self.recipient)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/notifications/", {"fields": "id,verb"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "verb"})
+
+        response = self.client.get("/api/notifications/", {"fields": "actor", "expand": "actor"})
+        self.assertEqual(
+            response.data["results"][0]["actor"], {"id": self.actor.pk, "username": "actor", "profile_picture": None}
+        )
+
+
+class CoalescedNotificationTests(APITestCase):
+    def setUp(self):
+        from posts.models import Post
+
+        self.author = User.objects.create_user(username="author", password="pass12345")
+        self.post = Post.objects.create(author=self.author, title="Viral", content="c")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="pass12345") for i in range(5)]
+
+    def like(self, fan):
+        from jobs import queue
+
+        self.client.force_authenticate(fan)
+        response = self.client.post(f"/api/{self.post.pk}/like/")
+        queue.run_pending()
+        return response
+
+    def test_likes_merge_into_one_row(self):
+        for fan in self.fans:
+            self.assertEqual(self.like(fan).status_code, 201)
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actor, self.fans[-1])
+        self.assertEqual([entry["username"] for entry in notification.recent_actors], ["fan4", "fan3", "fan2"])
+
+        self.client.force_authenticate(self.author)
+        row = self.client.get("/api/notifications/").data["results"][0]
+        self.assertEqual(row["summary"], "fan4 and 4 others liked")
+        self.assertEqual(row["actor_count"], 5)
+        self.assertEqual([actor["id"] for actor in row["actors"]], [fan.pk for fan in self.fans[:1:-1]])
+
+    def test_relike_is_not_counted_twice_and_reopens_the_row(self):
+        self.like(self.fans[0])
+        self.like(self.fans[1])
+        Notification.objects.update(read=True)
+        self.client.post(f"/api/{self.post.pk}/unlike/")
+        self.like(self.fans[1])
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 2)
+        self.assertFalse(notification.read)
+        self.client.force_authenticate(self.author)
+        row = self.client.get("/api/notifications/", {"fields": "summary"}).data["results"][0]
+        self.assertEqual(row, {"summary": "fan1 and fan0 liked"})
+
+    def test_windows_and_targets_split_groups(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from posts.models import Post
+
+        from .aggregation import notify
+
+        now = timezone.now()
+        notify(self.author, self.fans[0], "liked", self.post, now=now)
+        notify(self.author, self.fans[1], "liked", self.post, now=now + timedelta(hours=2))
+        other = Post.objects.create(author=self.author, title="Other", content="c")
+        notify(self.author, self.fans[2], "liked", other, now=now)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 3)
+
+        with self.settings(NOTIFICATION_COALESCE_WINDOW=0):
+            notify(self.author, self.fans[3], "liked", self.post, now=now)
+            notify(self.author, self.fans[4], "liked", self.post, now=now)
+        self.assertEqual(Notification.objects.filter(recipient=self.author, group_key=None).count(), 2)
+
+    def test_concurrent_first_events_merge(self):
+        from unittest import mock
+
+        from . import aggregation
+
+        aggregation.notify(self.author, self.fans[0], "liked", self.post)
+        # The second event looks before the first one's row is visible
+        real = aggregation._locked_row
+        calls = iter([None])
+        with mock.patch.object(aggregation, "_locked_row", side_effect=lambda key: next(calls, None) or real(key)):
+            aggregation.notify(self.author, self.fans[1], "liked", self.post)
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual([entry["id"] for entry in notification.recent_actors], [self.fans[1].pk, self.fans[0].pk])
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import NotificationListView
+from .views import NotificationListView, AsyncNotificationListView
 
 urlpatterns = [
     path("", NotificationListView.as_view(), name="notifications"),
+    path("async/", AsyncNotificationListView.as_view(), name="async-notifications"),
 ]
@@ -1,11 +1,29 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from social_media_api.async_views import AsyncListAPIView
+from social_media_api.pagination import TimestampKeysetPagination
+from social_media_api.sparse import SparseFieldsetMixin, restrict_to_rendered
 from .models import Notification
 from .serializers import NotificationSerializer
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimestampKeysetPagination
 
     def get_queryset(self):
-        return self.request.user.notifications.all().order_by("-timestamp")
+        fields = self.get_rendered_fields()
+        always = self.get_always_loaded()
+        if "summary" in fields:
+            always += ["verb", "actor_count", "recent_actors"]
+        queryset = restrict_to_rendered(Notification.objects.filter(recipient=self.request.user), fields, always)
+        if "target" in fields:
+            queryset = queryset.prefetch_related("target")
+        return queryset.order_by("-timestamp", "-id")
+
+
+class AsyncNotificationListView(AsyncListAPIView):
+    serializer_class = NotificationSerializer
+    pagination_class = TimestampKeysetPagination
+
+    get_queryset = NotificationListView.get_queryset
@@ -0,0 +1,34 @@
+"""
+Denormalized like/comment counters on Post.
+
+Likes, unlikes and comment writes enqueue their delta as a job (see
+posts.tasks) in the transaction that changes the Like or Comment table, so a
+delta exists exactly when its change was committed and survives a process
+restart. A worker sums a batch of deltas per post and applies them with one
+atomic ``F()`` UPDATE per post, so concurrent likes on a viral post do not
+queue on one row lock.
+
+``manage.py reconcile_post_counters`` recomputes the counters from the
+source tables.
+"""
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import Post
+
+LIKE_COUNT = "like_count"
+COMMENT_COUNT = "comment_count"
+
+
+def _shifted(field, delta):
+    if delta >= 0:
+        return F(field) + delta
+    # GREATEST first so an unsigned column never holds a negative intermediate
+    return Greatest(F(field), Value(-delta)) + delta
+
+
+def apply_deltas(post_id, deltas):
+    """Apply {field: delta} to one post in a single UPDATE, never going below zero."""
+    changes = {field: _shifted(field, delta) for field, delta in deltas.items() if delta}
+    if changes:
+        Post.objects.filter(pk=post_id).update(**changes)
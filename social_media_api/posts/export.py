@@ -0,0 +1,63 @@
+"""
+Streaming NDJSON export of a user's posts, comments and likes.
+
+Rows are written one JSON object per line, section by section (posts, then
+comments, then likes) in id order. Each line carries a ``cursor`` such as
+``"comment:1234"``; passing the last one received as ``?cursor=`` resumes an
+interrupted download right after that row.
+
+Sections are read in primary-key batches of EXPORT_CHUNK_SIZE rows rather
+than through one long-lived ``iterator()``: MySQL's client library buffers a
+whole result set, so batches are what keeps memory flat, and no cursor or
+transaction stays open while a slow client drains the response.
+"""
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+
+from social_media_api.renderers import dumps
+
+from .models import Comment, Like, Post
+
+SECTIONS = {
+    "post": (Post, "author", ("id", "title", "content", "created_at", "updated_at", "like_count", "comment_count")),
+    "comment": (Comment, "author", ("id", "post_id", "parent_id", "content", "created_at", "updated_at")),
+    "like": (Like, "user", ("id", "post_id", "created_at")),
+}
+SECTION_ORDER = tuple(SECTIONS)
+
+
+def get_chunk_size():
+    return getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+
+def parse_cursor(cursor):
+    """``"type:id"`` -> (type, id); None -> (first section, 0)."""
+    if not cursor:
+        return SECTION_ORDER[0], 0
+    kind, _, last_id = cursor.partition(":")
+    if kind not in SECTIONS or not last_id.isdigit():
+        raise NotFound("Invalid cursor")
+    return kind, int(last_id)
+
+
+def section_rows(kind, user, after_id=0, chunk_size=None):
+    """Batches of the user's rows of one section as dicts, in id order."""
+    model, owner, fields = SECTIONS[kind]
+    rows = model.objects.filter(**{owner: user}).order_by("pk").values(*fields)
+    chunk_size = chunk_size or get_chunk_size()
+    while True:
+        batch = list(rows.filter(pk__gt=after_id)[:chunk_size])
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1]["id"]
+
+
+def export_lines(user, cursor=None, chunk_size=None):
+    """NDJSON bytes for everything after ``cursor``, one chunk per database batch."""
+    start_kind, after_id = parse_cursor(cursor)
+    for kind in SECTION_ORDER[SECTION_ORDER.index(start_kind):]:
+        for batch in section_rows(kind, user, after_id if kind == start_kind else 0, chunk_size):
+            yield b"".join(
+                dumps({"type": kind, **row, "cursor": f"{kind}:{row['id']}"}) + b"\n" for row in batch
+            )
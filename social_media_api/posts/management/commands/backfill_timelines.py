@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = "Fill materialized home timelines from the posts of followed authors."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only backfill this user id (repeatable).")
+        parser.add_argument("--max-entries", type=int, default=None,
+                            help="Newest posts written per user (default: FEED_TIMELINE_MAX_ENTRIES).")
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Users loaded per query.")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("pk")
+        if options["user_ids"]:
+            users = users.filter(pk__in=options["user_ids"])
+
+        total_users = total_entries = 0
+        for user in users.only("pk").iterator(chunk_size=options["chunk_size"]):
+            total_entries += timeline.backfill_timeline(user, options["max_entries"])
+            total_users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {total_entries} timeline entries for {total_users} users."
+        ))
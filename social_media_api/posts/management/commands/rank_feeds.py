@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's ranked (\"top\") feed. Run periodically, e.g. from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, nargs="*", default=None,
+                            help="Only rank the feeds of these user ids.")
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Users ranked and written per transaction.")
+
+    def handle(self, *args, **options):
+        users, written = ranking.rank_feeds(user_ids=options["users"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {users} feeds ({written} entries)."))
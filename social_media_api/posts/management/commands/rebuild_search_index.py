@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over post titles and content."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Posts indexed per batch (SQLite FTS5).")
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend.vendor is None:
+            self.stdout.write(self.style.WARNING("No full-text index on this database; searches use LIKE."))
+            return
+        indexed = backend.rebuild(options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the {backend.vendor} search index over {indexed} posts."))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from jobs import queue
+from posts import tasks
+from posts.models import Comment, Like, Post
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.like_count and Post.comment_count from the Like and Comment tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Posts recomputed per batch.")
+
+    def handle(self, *args, **options):
+        # Apply the queued deltas before comparing
+        queue.run_pending(kinds=[tasks.COUNTER])
+
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_id).order_by("pk")
+                .only("pk", "like_count", "comment_count")[:options["chunk_size"]]
+            )
+            if not posts:
+                break
+            ids = [post.pk for post in posts]
+            likes = dict(
+                Like.objects.filter(post_id__in=ids).values("post_id")
+                .annotate(total=Count("id")).values_list("post_id", "total")
+            )
+            comments = dict(
+                Comment.objects.filter(post_id__in=ids).values("post_id")
+                .annotate(total=Count("id")).values_list("post_id", "total")
+            )
+
+            stale = []
+            for post in posts:
+                like_count, comment_count = likes.get(post.pk, 0), comments.get(post.pk, 0)
+                if (post.like_count, post.comment_count) != (like_count, comment_count):
+                    post.like_count, post.comment_count = like_count, comment_count
+                    stale.append(post)
+            if stale:
+                Post.objects.bulk_update(stale, ["like_count", "comment_count"])
+
+            checked += len(posts)
+            fixed += len(stale)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} posts, fixed {fixed}."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Delete timeline entries beyond the newest N per user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-entries", type=int, default=None,
+                            help="Entries kept per user (default: FEED_TIMELINE_MAX_ENTRIES).")
+        parser.add_argument("--chunk-size", type=int, default=200,
+                            help="Users trimmed per query.")
+
+    def handle(self, *args, **options):
+        user_ids = TimelineEntry.objects.order_by("user_id").values_list("user_id", flat=True).distinct()
+        deleted, last_id = 0, 0
+        while True:
+            # Walk users by id so deletes never run under an open cursor
+            chunk = list(user_ids.filter(user_id__gt=last_id)[:options["chunk_size"]])
+            if not chunk:
+                break
+            deleted += timeline.trim_timelines(chunk, options["max_entries"])
+            last_id = chunk[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Trimmed {deleted} timeline entries."))
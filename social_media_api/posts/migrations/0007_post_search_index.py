@@ -0,0 +1,49 @@
+import django.db.models.deletion
+import posts.models
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute('CREATE FULLTEXT INDEX post_fulltext_idx ON posts_post (title, content)')
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute('CREATE VIRTUAL TABLE posts_post_fts USING fts5(title, content)')
+        schema_editor.execute('INSERT INTO posts_post_fts (rowid, title, content) SELECT id, title, content FROM posts_post')
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX post_fulltext_idx ON posts_post')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='posts.post')),
+                ('title', models.TextField()),
+                ('content', models.TextField()),
+                ('document', posts.models.FullTextDocumentField(db_column='posts_post_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+    ]
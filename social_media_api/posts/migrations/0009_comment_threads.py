@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, LPad
+
+
+def backfill_paths(apps, schema_editor):
+    # Existing comments are all top-level: the path is the zero-padded id
+    Comment = apps.get_model('posts', 'Comment')
+    Comment.objects.filter(path='').update(path=LPad(Cast('id', CharField()), 12, Value('0')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_rankedfeedentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=252),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
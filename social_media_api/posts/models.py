@@ -9,21 +9,100 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized from Like and Comment, maintained by posts.counters (likes via posts.tasks)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Pull side of the feed: newest posts of a set of authors
+            models.Index(fields=['author', '-created_at'], name='post_author_recent_idx'),
+            # Keyset pagination over (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='post_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class FullTextMatch(models.Lookup):
+    """``document__match='query'`` renders as SQLite FTS5's ``<column> MATCH <query>``."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class FullTextDocumentField(models.TextField):
+    pass
+
+
+FullTextDocumentField.register_lookup(FullTextMatch)
+
+
+class PostSearchDocument(models.Model):
+    """
+    A row of the SQLite FTS5 table behind post search (see posts.search).
+
+    The table is created by a migration on SQLite only; MySQL searches a
+    FULLTEXT index on Post itself and never touches this model.
+    """
+    post = models.OneToOneField(Post, on_delete=models.DO_NOTHING, primary_key=True,
+                                db_column='rowid', related_name='search_document')
+    title = models.TextField()
+    content = models.TextField()
+    # FTS5 hidden columns: the table-named column takes MATCH queries over
+    # every column, and rank is the bm25() score of the match (lower is better).
+    document = FullTextDocumentField(db_column='posts_post_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+
+
 class Comment(models.Model):
+    # Materialized path: the ids of the ancestors and then of the comment
+    # itself, PATH_DIGITS digits each (see posts.threads)
+    PATH_DIGITS = 12
+    MAX_DEPTH = 20
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    depth = models.PositiveSmallIntegerField(default=0)
+    path = models.CharField(max_length=PATH_DIGITS * (MAX_DEPTH + 1), blank=True, editable=False)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='comment_recent_idx'),
+            # Comments of one post, newest first (previews and per-post pages)
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_recent_idx'),
+            # Threads of one post and subtrees, as ranges of paths
+            models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author} on {self.post}"
 
+    def build_path(self):
+        prefix = self.parent.path if self.parent_id else ''
+        return f'{prefix}{self.pk:0{self.PATH_DIGITS}d}'
+
+    def save(self, *args, **kwargs):
+        if self.parent_id and not self.path:
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+        if not self.path:
+            # The path ends with the comment's own id, known only once inserted
+            self.path = self.build_path()
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="likes")
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="likes")
@@ -33,4 +112,37 @@ class Like(models.Model):
         unique_together = ("user", "post")
 
     def __str__(self):
-        return f"{self.user.username} liked {self.post.id}"
\ No newline at end of file
+        return f"{self.user.username} liked {self.post.id}"
+
+class TimelineEntry(models.Model):
+    """A post materialized into one follower's home timeline (fan-out-on-write)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    # Copy of post.created_at so the timeline can be read from its own index.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-post"], name="timeline_user_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in timeline of user {self.user_id}"
+
+
+class RankedFeedEntry(models.Model):
+    """A post's precomputed "top" score in one user's ranked feed (see posts.ranking)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="ranked_feed_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="ranked_feed_entries")
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "-score", "-post"], name="ranked_feed_user_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} ranked {self.score:.3f} for user {self.user_id}"
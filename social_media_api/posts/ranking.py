@@ -0,0 +1,174 @@
+"""
+Precomputed "top" feeds.
+
+``rank_feeds`` scores every post of the last FEED_RANKING_WINDOW_DAYS once,
+from its age and its like and comment counts, and stores the best
+FEED_RANKING_MAX_ENTRIES posts of the authors each user follows as
+RankedFeedEntry rows. ``?ordering=ranked`` on the feed is then a range read
+on (user, score), like the chronological timeline.
+
+Run ``manage.py rank_feeds`` periodically (e.g. every few minutes from
+cron). Scores only change when it runs, so cursors over a ranked feed stay
+stable in between; each run is a new generation of the user's feed
+(``computed_at``), and cursors issued before it are rejected rather than
+seeking on scores that were replaced. Scores are computed in vectorized batches with numpy
+when it is installed, and in pure Python otherwise.
+"""
+import heapq
+import math
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post, RankedFeedEntry
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+# Scores are rounded so numpy and pure Python rank posts identically
+SCORE_DECIMALS = 9
+
+
+def get_half_life_hours():
+    """Age at which a post's score has halved."""
+    return getattr(settings, "FEED_RANKING_HALF_LIFE_HOURS", 24)
+
+
+def get_weights():
+    """(like weight, comment weight) applied to log-scaled counts."""
+    return (
+        getattr(settings, "FEED_RANKING_LIKE_WEIGHT", 1.0),
+        getattr(settings, "FEED_RANKING_COMMENT_WEIGHT", 2.0),
+    )
+
+
+def get_window_days():
+    return getattr(settings, "FEED_RANKING_WINDOW_DAYS", 7)
+
+
+def get_max_entries():
+    return getattr(settings, "FEED_RANKING_MAX_ENTRIES", 500)
+
+
+def get_batch_size():
+    return getattr(settings, "FEED_RANKING_BATCH_SIZE", 5000)
+
+
+def score_posts(ages_hours, like_counts, comment_counts):
+    """
+    Scores for parallel sequences of post ages and counts:
+    ``(1 + wl * ln(1 + likes) + wc * ln(1 + comments)) * 2 ** (-age / half_life)``.
+    """
+    like_weight, comment_weight = get_weights()
+    half_life = get_half_life_hours()
+    if np is not None:
+        ages = np.maximum(np.asarray(ages_hours, dtype=float), 0.0)
+        engagement = (
+            1.0
+            + like_weight * np.log1p(np.asarray(like_counts, dtype=float))
+            + comment_weight * np.log1p(np.asarray(comment_counts, dtype=float))
+        )
+        return np.round(engagement * np.exp2(-ages / half_life), SCORE_DECIMALS).tolist()
+    return [
+        round(
+            (1.0 + like_weight * math.log1p(likes) + comment_weight * math.log1p(comments))
+            * 2.0 ** (-max(age, 0.0) / half_life),
+            SCORE_DECIMALS,
+        )
+        for age, likes, comments in zip(ages_hours, like_counts, comment_counts)
+    ]
+
+
+def score_recent_posts(now):
+    """{author_id: [(score, post_id), ...] best first} for every post in the window."""
+    recent = Post.objects.filter(created_at__gte=now - timezone.timedelta(days=get_window_days()))
+    rows = recent.order_by("pk").values_list("pk", "author_id", "created_at", "like_count", "comment_count")
+    by_author, last_id = {}, 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_id)[:get_batch_size()])
+        if not batch:
+            break
+        post_ids, author_ids, created, likes, comments = zip(*batch)
+        ages = [(now - created_at).total_seconds() / 3600 for created_at in created]
+        for post_id, author_id, score in zip(post_ids, author_ids, score_posts(ages, likes, comments)):
+            by_author.setdefault(author_id, []).append((score, post_id))
+        last_id = post_ids[-1]
+
+    limit = get_max_entries()
+    for author_id, scored in by_author.items():
+        # No feed can use more than ``limit`` posts from a single author
+        by_author[author_id] = heapq.nlargest(limit, scored)
+    return by_author
+
+
+def _write(entries_by_user):
+    with transaction.atomic():
+        RankedFeedEntry.objects.filter(user_id__in=list(entries_by_user)).delete()
+        RankedFeedEntry.objects.bulk_create(
+            [entry for entries in entries_by_user.values() for entry in entries], batch_size=get_batch_size()
+        )
+
+
+def rank_feeds(user_ids=None, now=None, chunk_size=500):
+    """
+    Recompute the ranked feed of ``user_ids`` (default: every user who follows
+    someone). Returns (users ranked, entries written).
+    """
+    now = now or timezone.now()
+    by_author = score_recent_posts(now)
+    limit = get_max_entries()
+
+    # Through table of CustomUser.followers: to_customuser is the follower
+    follows = get_user_model().followers.through.objects.order_by("to_customuser_id", "from_customuser_id")
+    if user_ids is not None:
+        follows = follows.filter(to_customuser_id__in=user_ids)
+    followers = follows.order_by("to_customuser_id").values_list("to_customuser_id", flat=True).distinct()
+
+    users = written = 0
+    last_id = 0
+    while True:
+        # Walk followers by id so writes never run under an open cursor
+        chunk = list(followers.filter(to_customuser_id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        edges = follows.filter(to_customuser_id__in=chunk).values_list("to_customuser_id", "from_customuser_id")
+        entries_by_user = {user_id: [] for user_id in chunk}
+        for user_id, followed in groupby(edges, key=lambda edge: edge[0]):
+            streams = [by_author[author_id] for _, author_id in followed if author_id in by_author]
+            entries_by_user[user_id] = [
+                RankedFeedEntry(user_id=user_id, post_id=post_id, score=score, computed_at=now)
+                for score, post_id in islice(heapq.merge(*streams, reverse=True), limit)
+            ]
+        _write(entries_by_user)
+        users += len(chunk)
+        written += sum(len(entries) for entries in entries_by_user.values())
+        last_id = chunk[-1]
+
+    if user_ids is None:
+        # Users who have since unfollowed everyone
+        RankedFeedEntry.objects.filter(computed_at__lt=now).delete()
+    return users, written
+
+
+def ranked_feed(user):
+    """
+    The user's precomputed ranked feed, annotated with ``rank_score`` and the
+    ``rank_computed_at`` of the run that wrote it.
+    """
+    return (
+        Post.objects.filter(ranked_feed_entries__user=user)
+        .annotate(rank_score=F("ranked_feed_entries__score"), rank_computed_at=F("ranked_feed_entries__computed_at"))
+        .order_by("-rank_score", "-id")
+    )
+
+
+def generation(user):
+    """When the user's ranked feed was last computed, or None if it is empty."""
+    entries = RankedFeedEntry.objects.filter(user=user).order_by("-score", "-post")  # on the feed's index
+    return entries.values_list("computed_at", flat=True).first()
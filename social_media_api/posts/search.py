@@ -0,0 +1,161 @@
+"""
+Full-text search over post titles and content.
+
+MySQL matches against a FULLTEXT index (``MATCH ... AGAINST`` in boolean
+mode); SQLite, used for local runs, against an FTS5 table that is kept in
+sync when posts are saved or deleted. Both rank by relevance and treat every
+term as a prefix. Other databases fall back to ``LIKE`` matching of every
+term against the same columns, unranked.
+
+Matching rows are annotated with ``search_rank`` (higher is better).
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Round
+from rest_framework import filters
+
+from .models import Post
+
+SEARCH_FIELDS = ("title", "content")
+FTS_TABLE = "posts_post_fts"
+FULLTEXT_INDEX = "post_fulltext_idx"
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def parse_terms(query):
+    """Split a search string into at most MAX_TERMS lower-cased word terms."""
+    return [term.lower() for term in _TERM_RE.findall(query or "")][:MAX_TERMS]
+
+
+def snippet(text, terms, width=160):
+    """A window of ``text`` around the first word matching a term prefix, with that word marked."""
+    if not text:
+        return ""
+    pattern = re.compile(r"\b(?:%s)\w*" % "|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(text) if terms else None
+    if match is None:
+        return text[:width] + ("…" if len(text) > width else "")
+
+    start = max(0, match.start() - width // 3)
+    end = min(len(text), max(start + width, match.end()))
+    window = f"{text[start:match.start()]}<mark>{match.group()}</mark>{text[match.end():end]}"
+    return ("…" if start else "") + window + ("…" if end < len(text) else "")
+
+
+class SearchBackend:
+    """LIKE-based fallback: no index to maintain and no relevance."""
+    vendor = None
+
+    def supported(self):
+        return True
+
+    def search(self, queryset, terms):
+        # Every term, in any of the fields
+        for term in terms:
+            matches = Q()
+            for field in SEARCH_FIELDS:
+                matches |= Q(**{f"{field}__icontains": term})
+            queryset = queryset.filter(matches)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_posts(self, posts):
+        pass
+
+    def remove_posts(self, post_ids):
+        pass
+
+    def rebuild(self, chunk_size=1000):
+        return 0
+
+
+class MySQLBackend(SearchBackend):
+    vendor = "mysql"
+
+    def search(self, queryset, terms):
+        # "+term*": every term required, each matched as a prefix
+        against = " ".join(f"+{term}*" for term in terms)
+        table = connection.ops.quote_name(Post._meta.db_table)
+        rank = RawSQL(
+            f"ROUND(MATCH ({table}.title, {table}.content) AGAINST (%s IN BOOLEAN MODE), 6)",
+            [against], output_field=FloatField(),
+        )
+        return queryset.annotate(search_rank=rank).filter(search_rank__gt=0)
+
+    def rebuild(self, chunk_size=1000):
+        table = connection.ops.quote_name(Post._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} DROP INDEX {FULLTEXT_INDEX}")
+            cursor.execute(f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON {table} (title, content)")
+        return Post.objects.count()
+
+
+class SQLiteBackend(SearchBackend):
+    vendor = "sqlite"
+    _table_exists = False
+
+    def supported(self):
+        # The FTS5 table needs an SQLite built with FTS5; the migration skips it otherwise
+        if not self._table_exists:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                self._table_exists = cursor.fetchone() is not None
+        return self._table_exists
+
+    def search(self, queryset, terms):
+        match = " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        # Joined on rowid; bm25 rank is lower for better matches, so negate it to rank like MySQL
+        return queryset.filter(search_document__document__match=match).annotate(
+            search_rank=Round(-F("search_document__rank"), 6)
+        )
+
+    def index_posts(self, posts):
+        rows = [(post.pk, post.title, post.content) for post in posts]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)", rows)
+
+    def remove_posts(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in post_ids])
+
+    def rebuild(self, chunk_size=1000):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        indexed, last_id = 0, 0
+        while True:
+            posts = list(Post.objects.filter(pk__gt=last_id).order_by("pk").only("pk", "title", "content")[:chunk_size])
+            if not posts:
+                return indexed
+            self.index_posts(posts)
+            indexed += len(posts)
+            last_id = posts[-1].pk
+
+
+_BACKENDS = {backend.vendor: backend for backend in (MySQLBackend(), SQLiteBackend())}
+
+
+def get_backend():
+    backend = _BACKENDS.get(connection.vendor)
+    if backend is not None and backend.supported():
+        return backend
+    return SearchBackend()
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the full-text index, ranked by relevance. The view
+    provides the terms with ``get_search_terms()``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = view.get_search_terms()
+        if not terms:
+            return queryset
+        return get_backend().search(queryset, terms)
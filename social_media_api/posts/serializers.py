@@ -1,20 +1,175 @@
+from django.conf import settings
+from django.utils.functional import cached_property
+from django.db import connections, router, transaction
+from django.db.models import Max, Q
 from rest_framework import serializers
-from .models import Post, Comment
+from accounts.serializers import LightweightUserSerializer
+from social_media_api.sparse import DynamicFieldsMixin, requested_fields
+from .models import Post, Comment, Like
+from .search import snippet
 
-class CommentSerializer(serializers.ModelSerializer):
+
+def get_bulk_batch_size():
+    return getattr(settings, 'BULK_CREATE_BATCH_SIZE', 500)
+
+
+def get_bulk_max_items():
+    return getattr(settings, 'BULK_CREATE_MAX_ITEMS', 1000)
+
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` serializer that creates with ``bulk_create``.
+
+    Items are validated one by one: invalid items are left out of
+    ``validated_data`` and reported in ``item_errors`` ({index: errors}), so
+    one bad item does not reject the whole list. ``valid_indexes`` maps
+    ``validated_data`` back to positions in the payload.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(data) > get_bulk_max_items():
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'At most {get_bulk_max_items()} items per request.']}
+            )
+        self.valid_indexes, self.item_errors, validated = [], {}, []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.child.run_validation(item))
+                self.valid_indexes.append(index)
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+        return validated
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objs = [model(**attrs) for attrs in validated_data]
+        connection = connections[router.db_for_write(model)]
+        with transaction.atomic(using=connection.alias):
+            if connection.features.can_return_rows_from_bulk_insert:
+                return model.objects.bulk_create(objs, batch_size=get_bulk_batch_size())
+            # MySQL does not report the ids of a multi-row INSERT
+            last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            model.objects.bulk_create(objs, batch_size=get_bulk_batch_size())
+            self.read_back_pks(model, objs, last_pk)
+        return objs
+
+    @staticmethod
+    def read_back_pks(model, objs, last_pk):
+        """
+        Set the pks of just-inserted ``objs`` from the rows created after ``last_pk``.
+
+        Rows are matched in id order on every field that was set, so rows other
+        requests inserted concurrently are skipped.
+        """
+        fields = [field for field in model._meta.concrete_fields
+                  if not field.primary_key and not getattr(field, 'auto_now', False)
+                  and not getattr(field, 'auto_now_add', False)]
+        attnames = [field.attname for field in fields]
+        related = {
+            field.attname: {getattr(obj, field.attname) for obj in objs} for field in fields if field.is_relation
+        }
+        rows = model.objects.filter(pk__gt=last_pk)
+        for name, values in related.items():
+            # IN (NULL) matches nothing, so optional relations need IS NULL
+            condition = Q(**{f'{name}__in': values - {None}})
+            if None in values:
+                condition |= Q(**{f'{name}__isnull': True})
+            rows = rows.filter(condition)
+        pending = iter(objs)
+        obj = next(pending, None)
+        for pk, *values in rows.order_by('pk').values_list('pk', *attnames).iterator():
+            if obj is None:
+                break
+            if values == [getattr(obj, name) for name in attnames]:
+                obj.pk = pk
+                obj = next(pending, None)
+
+
+class CommentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
 
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'author', 'author_username', 'content', 'created_at', 'updated_at']
-        read_only_fields = ['author', 'created_at', 'updated_at']
+        fields = ['id', 'post', 'parent', 'depth', 'author', 'author_username', 'content', 'created_at', 'updated_at']
+        read_only_fields = ['author', 'depth', 'created_at', 'updated_at']
+        list_serializer_class = BulkCreateListSerializer
+        expandable_fields = {'author': lambda: LightweightUserSerializer(read_only=True)}
 
+    def validate(self, attrs):
+        if self.instance is not None:
+            # Paths are fixed once written, so a comment cannot be moved
+            for name in ('post', 'parent'):
+                if name in attrs and attrs[name] != getattr(self.instance, name):
+                    raise serializers.ValidationError({name: 'A comment cannot be moved.'})
+            return attrs
+        parent = attrs.get('parent')
+        if parent is not None:
+            if parent.post_id != attrs['post'].pk:
+                raise serializers.ValidationError({'parent': 'Replies must be on the same post as their parent.'})
+            if parent.depth >= Comment.MAX_DEPTH:
+                raise serializers.ValidationError(
+                    {'parent': f'Replies can be nested at most {Comment.MAX_DEPTH} levels deep.'}
+                )
+        return attrs
 
-class PostSerializer(serializers.ModelSerializer):
+
+class CommentThreadSerializer(CommentSerializer):
+    """A top-level comment with its replies, as paginated by ``posts.threads.ThreadPagination``."""
+    replies = CommentSerializer(many=True, read_only=True, source='thread_replies')
+    replies_truncated = serializers.BooleanField(read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ['replies', 'replies_truncated']
+
+
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
     comments = CommentSerializer(many=True, read_only=True)
+    liked_by_me = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ['id', 'author', 'author_username', 'title', 'content', 'created_at', 'updated_at', 'comments']
-        read_only_fields = ['author', 'created_at', 'updated_at']
+        fields = ['id', 'author', 'author_username', 'title', 'content', 'created_at', 'updated_at',
+                  'like_count', 'comment_count', 'liked_by_me', 'comments']
+        read_only_fields = ['author', 'created_at', 'updated_at', 'like_count', 'comment_count']
+        list_serializer_class = BulkCreateListSerializer
+        expandable_fields = {'author': lambda: LightweightUserSerializer(read_only=True)}
+
+    def get_liked_by_me(self, obj):
+        # List views resolve the whole page up front (see LikedByMeMixin)
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return False
+        return Like.objects.filter(user=request.user, post=obj).exists()
+
+
+class PostListSerializer(PostSerializer):
+    """
+    Post as rendered in lists: the newest comments only instead of all of them.
+
+    Expects the queryset from ``posts.views.with_comment_previews``.
+    """
+    recent_comments = CommentSerializer(many=True, read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = ['id', 'author', 'author_username', 'title', 'content', 'created_at', 'updated_at',
+                  'like_count', 'comment_count', 'liked_by_me', 'recent_comments']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Search results also carry a highlighted excerpt of the content
+        terms = self.context.get('search_terms')
+        if terms and self.renders_snippet:
+            data['snippet'] = snippet(instance.content, terms)
+        return data
+
+    @cached_property
+    def renders_snippet(self):
+        wanted = requested_fields(self.context.get('request'))
+        return wanted is None or 'snippet' in wanted
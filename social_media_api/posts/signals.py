@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import search, tasks, timeline
+from .models import Post
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.get_backend().index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove_posts([instance.pk])
+
+
+@receiver(m2m_changed, sender=get_user_model().followers.through)
+def update_timelines(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Queue the timeline changes of ``user.followers`` / ``user.following``
+    changes. The job reads the follows once they are committed, so removals
+    are queued before the rows go and may name ids that were not followed.
+    """
+    if not timeline.timelines_enabled():
+        return
+    if action == "pre_clear":
+        pk_set = timeline.followed_ids(instance.pk) if reverse else timeline.follower_ids(instance.pk)
+    elif action not in ("post_add", "pre_remove"):
+        return
+    # reverse: the instance is the follower
+    tasks.enqueue_follow_changes([(instance.pk, pk) if reverse else (pk, instance.pk) for pk in pk_set])
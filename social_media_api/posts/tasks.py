@@ -0,0 +1,56 @@
+"""
+Queued side effects of posts, likes and comments (see jobs.queue).
+
+Like, unlike and comment create/delete enqueue their counter delta instead
+of updating the post in the request; a batch of deltas is summed per post
+and written as one UPDATE per post. New posts enqueue their timeline
+fan-out, which writes a row per follower, and follow changes the matching
+timeline updates.
+"""
+from collections import Counter, defaultdict
+
+from jobs import queue
+
+from . import timeline
+from .counters import apply_deltas
+from .models import Post
+
+COUNTER = "posts.counter"
+FAN_OUT = "posts.fan_out"
+FOLLOWS = "posts.timeline_follows"
+
+
+def enqueue_counter(post_id, field, delta):
+    queue.enqueue(COUNTER, {"post": post_id, "field": field, "delta": delta})
+
+
+@queue.handler(COUNTER)
+def apply_counters(payloads):
+    deltas = defaultdict(Counter)
+    for payload in payloads:
+        deltas[payload["post"]][payload["field"]] += payload["delta"]
+    for post_id, changes in deltas.items():
+        apply_deltas(post_id, changes)
+
+
+def enqueue_fan_out(posts):
+    if timeline.timelines_enabled():
+        queue.enqueue(FAN_OUT, {"posts": [post.pk for post in posts]})
+
+
+@queue.handler(FAN_OUT)
+def fan_out(payloads):
+    post_ids = [post_id for payload in payloads for post_id in payload["posts"]]
+    # Posts deleted meanwhile are skipped
+    timeline.fan_out_posts(list(Post.objects.filter(pk__in=post_ids).only("pk", "author_id", "created_at")))
+
+
+def enqueue_follow_changes(pairs):
+    """Queue ``timeline.sync_follows`` for (follower id, author id) pairs."""
+    if timeline.timelines_enabled() and pairs:
+        queue.enqueue(FOLLOWS, {"pairs": [list(pair) for pair in pairs]})
+
+
+@queue.handler(FOLLOWS)
+def sync_follows(payloads):
+    timeline.sync_follows(pair for payload in payloads for pair in payload["pairs"])
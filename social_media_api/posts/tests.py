@@ -1,3 +1,866 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from jobs import queue
+from jobs.models import Job
+
+from . import counters, export, ranking, search, tasks, threads, timeline
+from .models import Comment, Like, Post, RankedFeedEntry, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(FEED_MODE="push")
+class TimelineFanOutTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass12345")
+        self.reader = User.objects.create_user(username="reader", password="pass12345")
+        self.stranger = User.objects.create_user(username="stranger", password="pass12345")
+        self.reader.following.add(self.author)
+
+    def test_create_fans_out_to_followers(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post("/api/posts/", {"title": "Hello", "content": "World"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        post = Post.objects.get(pk=response.data["id"])
+        # Fanned out by the job worker, not in the request
+        self.assertFalse(TimelineEntry.objects.exists())
+        queue.run_pending()
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertFalse(TimelineEntry.objects.filter(user=self.stranger).exists())
+
+    @override_settings(FEED_MODE="pull")
+    def test_pull_mode_keeps_no_timelines(self):
+        self.client.force_authenticate(self.author)
+        self.client.post("/api/posts/", {"title": "Hello", "content": "World"})
+        self.assertFalse(Job.objects.filter(kind=tasks.FAN_OUT).exists())
+
+        # ?mode= cannot read the timelines that are not kept
+        timeline.backfill_timeline(self.reader)
+        Post.objects.create(author=self.author, title="Later", content="x")
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(reverse("feed"), {"mode": "push"})
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_destroy_removes_timeline_entries(self):
+        post = Post.objects.create(author=self.author, title="Bye", content="Soon gone")
+        timeline.fan_out_post(post)
+
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f"/api/posts/{post.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_push_and_pull_feeds_match(self):
+        for i in range(3):
+            timeline.fan_out_post(Post.objects.create(author=self.author, title=f"p{i}", content="x"))
+
+        self.client.force_authenticate(self.reader)
+        pull = self.client.get(reverse("feed"), {"mode": "pull"})
+        push = self.client.get(reverse("feed"), {"mode": "push"})
+        self.assertEqual(
+            [p["id"] for p in pull.data["results"]],
+            [p["id"] for p in push.data["results"]],
+        )
+        self.assertEqual(len(push.data["results"]), 3)
+
+    def test_push_feed_pages_on_the_timeline_index(self):
+        for i in range(3):
+            timeline.fan_out_post(Post.objects.create(author=self.author, title=f"p{i}", content="x"))
+
+        self.client.force_authenticate(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(reverse("feed"), {"mode": "push", "page_size": 2, "fields": "id"})
+        page_sql = next(q["sql"] for q in queries.captured_queries if q["sql"].endswith("LIMIT 3"))
+        # Ordered on the entry's columns, through the single join the filter uses
+        self.assertIn('"posts_timelineentry"."created_at" AS "timeline_created_at"', page_sql)
+        self.assertIn('"posts_timelineentry"."post_id" AS "timeline_post_id"', page_sql)
+        self.assertEqual(page_sql.count(" JOIN "), 1)
+
+        rest = self.client.get(first.data["next"])
+        pull = self.client.get(reverse("feed"), {"mode": "pull", "fields": "id"})
+        self.assertEqual(first.data["results"] + rest.data["results"], pull.data["results"])
+        self.assertIsNone(rest.data["next"])
+
+    def test_follow_and_unfollow_update_the_timeline(self):
+        posts = [Post.objects.create(author=self.stranger, title=f"s{i}", content="x") for i in range(3)]
+        own = Post.objects.create(author=self.author, title="a", content="x")
+        self.client.force_authenticate(self.reader)
+
+        def feed():
+            queue.run_pending()
+            response = self.client.get(reverse("feed"), {"mode": "push", "fields": "id"})
+            return [row["id"] for row in response.data["results"]]
+
+        with override_settings(FEED_TIMELINE_MAX_ENTRIES=2):
+            self.client.post(f"/api/auth/follow/{self.stranger.pk}/")
+            self.assertEqual(feed(), [own.pk, posts[2].pk, posts[1].pk])
+
+        self.client.post(f"/api/auth/unfollow/{self.stranger.pk}/")
+        self.assertEqual(feed(), [own.pk])
+
+    def test_bulk_follow_and_clear_update_the_timeline(self):
+        post = Post.objects.create(author=self.stranger, title="s", content="x")
+        self.client.force_authenticate(self.reader)
+        self.client.post("/api/auth/follow/bulk/", {"ids": [self.stranger.pk]}, format="json")
+        queue.run_pending()
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+        self.stranger.followers.clear()
+        queue.run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+    def test_replayed_follow_changes_follow_the_current_state(self):
+        post = Post.objects.create(author=self.stranger, title="s", content="x")
+        self.reader.following.add(self.stranger)
+        self.reader.following.remove(self.stranger)
+        # The follow's job runs after the unfollow: it must not bring the post back
+        queue.run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+    @override_settings(FEED_TIMELINE_MAX_ENTRIES=2)
+    def test_backfill_and_trim_keep_newest_entries(self):
+        posts = [Post.objects.create(author=self.author, title=f"p{i}", content="x") for i in range(4)]
+
+        call_command("backfill_timelines", max_entries=3, stdout=StringIO())
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 3)
+
+        call_command("trim_timelines", stdout=StringIO())
+        kept = set(TimelineEntry.objects.filter(user=self.reader).values_list("post_id", flat=True))
+        self.assertEqual(kept, {posts[3].pk, posts[2].pk})
+
+
+@override_settings(FEED_MODE="hybrid", FEED_FANOUT_FOLLOWER_THRESHOLD=1)
+class HybridFeedTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader", password="pass12345")
+        self.fan = User.objects.create_user(username="fan", password="pass12345")
+        self.celebrity = User.objects.create_user(username="celebrity", password="pass12345")
+        self.friend = User.objects.create_user(username="friend", password="pass12345")
+        self.reader.following.add(self.celebrity, self.friend)
+        self.fan.following.add(self.celebrity)
+
+    def test_high_follower_posts_are_not_fanned_out(self):
+        post = Post.objects.create(author=self.celebrity, title="big", content="x")
+        self.assertEqual(timeline.fan_out_post(post), 0)
+        post = Post.objects.create(author=self.friend, title="small", content="x")
+        self.assertEqual(timeline.fan_out_post(post), 1)
+
+    def test_following_a_high_follower_author_backfills_nothing(self):
+        newcomer = User.objects.create_user(username="newcomer", password="pass12345")
+        unknown = User.objects.create_user(username="unknown", password="pass12345")
+        Post.objects.create(author=self.celebrity, title="big", content="x")
+        small = Post.objects.create(author=unknown, title="small", content="x")
+        newcomer.following.add(self.celebrity, unknown)
+        queue.run_pending()
+        self.assertEqual(list(TimelineEntry.objects.filter(user=newcomer).values_list("post_id", flat=True)), [small.pk])
+
+    def test_hybrid_feed_merges_streams_in_order(self):
+        posts = []
+        for i in range(6):
+            author = self.celebrity if i % 2 else self.friend
+            post = Post.objects.create(author=author, title=f"p{i}", content="x")
+            timeline.fan_out_post(post)
+            posts.append(post)
+
+        feed = timeline.hybrid_feed(self.reader)
+        self.assertEqual(feed.count(), 6)
+        self.assertEqual([p.pk for p in feed[2:5]], [p.pk for p in reversed(posts)][2:5])
+
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(reverse("feed"), {"page": 1})
+        self.assertEqual(response.data["count"], 6)
+        self.assertEqual([p["id"] for p in response.data["results"]], [p.pk for p in reversed(posts)])
+
+        first = self.client.get(reverse("feed"), {"page_size": 4})
+        second = self.client.get(first.data["next"])
+        self.assertEqual(
+            [p["id"] for p in first.data["results"] + second.data["results"]],
+            [p.pk for p in reversed(posts)],
+        )
+        self.assertIsNone(second.data["next"])
+
+    def test_conditional_feed_in_every_mode(self):
+        for i in range(4):
+            post = Post.objects.create(author=self.celebrity if i % 2 else self.friend, title=f"p{i}", content="x")
+            timeline.fan_out_post(post)
+        ranking.rank_feeds()
+        self.client.force_authenticate(self.reader)
+        for params in [{"mode": mode} for mode in timeline.FEED_MODES] + [{"ordering": "ranked"}]:
+            first = self.client.get(reverse("feed"), {**params, "page_size": 2})
+            self.assertEqual(len(first.data["results"]), 2, params)
+            again = self.client.get(reverse("feed"), {**params, "page_size": 2}, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED, params)
+
+            Comment.objects.create(post_id=first.data["results"][0]["id"], author=self.fan, content="new")
+            changed = self.client.get(reverse("feed"), {**params, "page_size": 2}, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(changed.status_code, status.HTTP_200_OK, params)
+
+    def test_async_feed_matches_sync_feed_in_every_mode(self):
+        for i in range(5):
+            post = Post.objects.create(author=self.celebrity if i % 2 else self.friend, title=f"p{i}", content="x")
+            timeline.fan_out_post(post)
+        Like.objects.create(user=self.reader, post=post)
+        Comment.objects.create(post=post, author=self.fan, content="nice")
+        token = Token.objects.create(user=self.reader)
+
+        for mode in timeline.FEED_MODES:
+            self.client.force_authenticate(self.reader)
+            expected = self.client.get(reverse("feed"), {"mode": mode, "page_size": 3}).json()
+            self.client.force_authenticate(None)
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+            response = self.client.get(reverse("async-feed"), {"mode": mode, "page_size": 3})
+            self.client.credentials()
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()["results"], expected["results"], mode)
+            self.assertEqual((response.json()["next"] or "").replace("async/", ""), expected["next"] or "")
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass12345")
+        now = timezone.now()
+        # Pairs of posts share a created_at so the id tie-breaker is exercised
+        self.posts = []
+        for i in range(7):
+            post = Post.objects.create(author=self.author, title=f"p{i}", content="x")
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(minutes=i // 2))
+            self.posts.append(post)
+        self.expected = [self.posts[i].pk for i in (1, 0, 3, 2, 5, 4, 6)]
+
+    def collect(self, url, params):
+        ids, response = [], self.client.get(url, params)
+        while True:
+            self.assertNotIn("count", response.data)
+            ids += [row["id"] for row in response.data["results"]]
+            if not response.data["next"]:
+                return ids
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_walks_every_post_once_in_order(self):
+        self.assertEqual(self.collect("/api/posts/", {"page_size": 3}), self.expected)
+
+    def test_page_number_mode_is_opt_in(self):
+        response = self.client.get("/api/posts/", {"page": 2, "page_size": 3})
+        self.assertEqual(response.data["count"], 7)
+        self.assertEqual([row["id"] for row in response.data["results"]], self.expected[3:6])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/posts/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(POST_COMMENT_PREVIEW_COUNT=2)
+class PostListQueryTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader", password="pass12345")
+        self.posts = []
+        for i in range(5):
+            author = User.objects.create(username=f"author{i}")
+            self.reader.following.add(author)
+            post = Post.objects.create(author=author, title=f"p{i}", content="x")
+            for j in range(4):
+                commenter = User.objects.create(username=f"c{i}{j}")
+                Comment.objects.create(post=post, author=commenter, content=f"c{j}")
+            self.posts.append(post)
+        call_command("reconcile_post_counters", stdout=StringIO())
+
+    def assert_previews(self, results):
+        for row in results:
+            self.assertEqual(row["comment_count"], 4)
+            self.assertEqual([c["content"] for c in row["recent_comments"]], ["c3", "c2"])
+            self.assertNotIn("comments", row)
+
+    def test_post_list_query_count_is_constant(self):
+        # The page's validators (rows, preview versions), then posts with
+        # authors and one windowed query for previews
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/posts/")
+        self.assert_previews(response.data["results"])
+
+    def test_feed_query_count_is_constant(self):
+        self.client.force_authenticate(self.reader)
+        # plus one Like query for liked_by_me, in the validators and the page
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("feed"))
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assert_previews(response.data["results"])
+
+    def test_per_post_comments_endpoint_is_paginated(self):
+        post = self.posts[0]
+        first = self.client.get(f"/api/posts/{post.pk}/comments/", {"page_size": 3})
+        second = self.client.get(first.data["next"])
+        contents = [c["content"] for c in first.data["results"] + second.data["results"]]
+        self.assertEqual(contents, ["c3", "c2", "c1", "c0"])
+
+    def test_sparse_fieldset_skips_unrendered_columns_and_relations(self):
+        self.client.force_authenticate(self.reader)
+        # Validator rows and the page; no author join, previews or Like query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("feed"), {"fields": "id,title", "page_size": 3})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"content"', queries[1]["sql"])
+        self.assertNotIn('"username"', queries[1]["sql"])
+        self.assertEqual([set(row) for row in response.data["results"]], [{"id", "title"}] * 3)
+
+        # Cursors still work: the ordering columns are always loaded
+        with self.assertNumQueries(2):
+            response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_expand_author(self):
+        response = self.client.get("/api/posts/", {"fields": "id,author", "expand": "author"})
+        row = response.data["results"][0]
+        self.assertEqual(
+            row["author"], {"id": self.posts[-1].author_id, "username": "author4", "profile_picture": None}
+        )
+
+        response = self.client.get(f"/api/posts/{self.posts[0].pk}/", {"fields": "title,comments"})
+        self.assertEqual(set(response.data), {"title", "comments"})
+        self.assertEqual(len(response.data["comments"]), 4)
+
+        response = self.client.get("/api/comments/", {"fields": "content,author", "expand": "author"})
+        self.assertEqual(set(response.data["results"][0]["author"]), {"id", "username", "profile_picture"})
+
+
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.fan = User.objects.create(username="fan")
+        self.post = Post.objects.create(author=self.author, title="t", content="c")
+        self.client.force_authenticate(self.fan)
+
+    def counts(self):
+        queue.run_pending()  # like counters are queued
+        self.post.refresh_from_db()
+        return self.post.like_count, self.post.comment_count
+
+    def test_like_unlike_and_comments_update_counters(self):
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        response = self.client.post("/api/comments/", {"post": self.post.pk, "content": "nice"})
+        self.assertEqual(self.counts(), (1, 1))
+
+        self.client.post(reverse("unlike-post", args=[self.post.pk]))
+        self.client.post(reverse("unlike-post", args=[self.post.pk]))
+        self.client.delete(f"/api/comments/{response.data['id']}/")
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_deltas_are_summed_per_post(self):
+        payload = [{"post": self.post.pk, "content": f"c{i}"} for i in range(3)]
+        self.client.post("/api/comments/bulk/", payload, format="json")
+        self.client.post("/api/comments/", {"post": self.post.pk, "content": "nice"})
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        with CaptureQueriesContext(connection) as queries:
+            queue.run_pending()
+        updates = [q["sql"] for q in queries.captured_queries if q["sql"].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.counts(), (1, 4))
+
+    def test_rolled_back_comments_are_not_counted(self):
+        from django.db import transaction
+
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            self.client.post("/api/comments/", {"post": self.post.pk, "content": "nice"})
+            1 / 0
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_recomputes_from_source_tables(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        Comment.objects.create(post=self.post, author=self.fan, content="x")
+        Post.objects.filter(pk=self.post.pk).update(like_count=7)
+
+        call_command("reconcile_post_counters", chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 1))
+
+
+class RankedFeedTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create(username="reader")
+        self.author = User.objects.create(username="author")
+        self.other = User.objects.create(username="other")
+        self.reader.following.add(self.author)
+        now = timezone.now()
+
+        def post(title, hours_ago, likes=0, comments=0, author=self.author):
+            post = Post.objects.create(author=author, title=title, content="x")
+            Post.objects.filter(pk=post.pk).update(
+                created_at=now - timedelta(hours=hours_ago), like_count=likes, comment_count=comments
+            )
+            return post
+
+        self.fresh = post("fresh", 1)
+        self.popular = post("popular", 20, likes=50, comments=10)
+        self.discussed = post("discussed", 5, comments=4)
+        self.stale = post("stale", 24 * 30, likes=1000)
+        self.unfollowed = post("unfollowed", 1, likes=100, author=self.other)
+
+    def feed_ids(self, **params):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(reverse("feed"), {"ordering": "ranked", **params})
+        ids = [row["id"] for row in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            ids += [row["id"] for row in response.data["results"]]
+        return ids
+
+    def test_feed_is_served_from_precomputed_scores(self):
+        self.assertEqual(self.feed_ids(), [])
+        out = StringIO()
+        call_command("rank_feeds", stdout=out)
+        self.assertIn("Ranked 1 feeds (3 entries)", out.getvalue())
+
+        expected = [self.popular.pk, self.discussed.pk, self.fresh.pk]
+        self.assertEqual(self.feed_ids(), expected)
+        self.assertEqual(self.feed_ids(page_size=1), expected)
+
+        # Scores are frozen until the next run
+        Post.objects.filter(pk=self.fresh.pk).update(like_count=10000)
+        self.assertEqual(self.feed_ids(page_size=2), expected)
+
+    def test_cursors_from_an_older_run_are_rejected(self):
+        ranking.rank_feeds(now=timezone.now() - timedelta(minutes=5))
+        self.client.force_authenticate(self.reader)
+        first = self.client.get(reverse("feed"), {"ordering": "ranked", "page_size": 1})
+        self.assertEqual(self.client.get(first.data["next"]).status_code, status.HTTP_200_OK)
+
+        ranking.rank_feeds()
+        response = self.client.get(first.data["next"])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn("recomputed", response.data["detail"])
+
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.reader).key}")
+        response = self.client.get(first.data["next"].replace(reverse("feed"), reverse("async-feed")))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        next_page = self.client.get(reverse("async-feed"), {"ordering": "ranked", "page_size": 1}).json()["next"]
+        self.assertEqual(self.client.get(next_page).status_code, status.HTTP_200_OK)
+
+    def test_numpy_and_python_scores_agree(self):
+        args = ([0, 3.5, 48, 500], [0, 7, 120, 1], [0, 2, 9, 0])
+        vectorized = ranking.score_posts(*args)
+        with mock.patch.object(ranking, "np", None):
+            self.assertEqual(ranking.score_posts(*args), vectorized)
+
+    def test_unfollowing_everyone_clears_the_feed(self):
+        ranking.rank_feeds()
+        self.reader.following.clear()
+        ranking.rank_feeds()
+        self.assertFalse(RankedFeedEntry.objects.exists())
+
+
+class BulkCreateTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="importer")
+        self.follower = User.objects.create(username="follower")
+        self.follower.following.add(self.author)
+        self.client.force_authenticate(self.author)
+
+    def test_creates_valid_items_and_reports_the_rest(self):
+        payload = [
+            {"title": "one", "content": "first"},
+            {"title": "", "content": "no title"},
+            {"title": "three", "content": "third"},
+        ]
+        response = self.client.post("/api/posts/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([item["index"] for item in response.data["created"]], [0, 2])
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        self.assertIn("title", response.data["errors"][0]["errors"])
+
+        posts = Post.objects.filter(author=self.author).order_by("pk")
+        self.assertEqual([p.pk for p in posts], [item["id"] for item in response.data["created"]])
+        with override_settings(FEED_MODE="push"):
+            self.client.post("/api/posts/bulk/", [{"title": "four", "content": "fourth"}], format="json")
+        queue.run_pending()
+        self.assertEqual(TimelineEntry.objects.filter(user=self.follower).count(), 1)
+        if search.get_backend().vendor:
+            self.assertEqual(self.client.get("/api/posts/", {"search": "third"}).data["results"][0]["title"], "three")
+
+    @override_settings(BULK_CREATE_BATCH_SIZE=2)
+    def test_comments_update_counters(self):
+        post = Post.objects.create(author=self.author, title="t", content="c")
+        payload = [{"post": post.pk, "content": f"c{i}"} for i in range(5)] + [{"post": 999999, "content": "x"}]
+        response = self.client.post("/api/comments/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(len(response.data["created"]), 5)
+        queue.run_pending()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 5)
+
+    def test_ids_are_read_back_without_returning_support(self):
+        Post.objects.create(author=self.follower, title="one", content="first")  # same values, other author
+        payload = [{"title": "one", "content": "first"}, {"title": "two", "content": "second"}]
+        from django.db import connection
+
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert",
+                               new_callable=mock.PropertyMock, return_value=False):
+            response = self.client.post("/api/posts/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = {item["id"]: item["index"] for item in response.data["created"]}
+        self.assertEqual(
+            {post.pk: post.title for post in Post.objects.filter(pk__in=created)},
+            {pk: payload[index]["title"] for pk, index in created.items()},
+        )
+
+    def test_rejects_malformed_payloads(self):
+        self.assertEqual(self.client.post("/api/posts/bulk/", {"title": "x"}, format="json").status_code, 400)
+        response = self.client.post("/api/posts/bulk/", [{"title": ""}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["created"], [])
+        with override_settings(BULK_CREATE_MAX_ITEMS=1):
+            response = self.client.post("/api/posts/bulk/", [{"title": "a", "content": "b"}] * 2, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CommentThreadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="threader")
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.user, title="t", content="c")
+
+    def reply(self, parent, content):
+        response = self.client.post(
+            "/api/comments/", {"post": self.post.pk, "parent": parent and parent.pk, "content": content}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return Comment.objects.get(pk=response.data["id"])
+
+    def build_threads(self):
+        """Two threads: a -> (b -> c, d) and e."""
+        a = self.reply(None, "a")
+        b = self.reply(a, "b")
+        e = self.reply(None, "e")
+        c = self.reply(b, "c")
+        d = self.reply(a, "d")
+        return a, b, c, d, e
+
+    def test_paths_nest_replies_under_their_parent(self):
+        a, b, c, d, e = self.build_threads()
+        self.assertEqual(a.path, f"{a.pk:012d}")
+        self.assertEqual(c.path, f"{a.pk:012d}{b.pk:012d}{c.pk:012d}")
+        self.assertEqual([a.depth, b.depth, c.depth], [0, 1, 2])
+        ordered = Comment.objects.filter(post=self.post).order_by("path")
+        self.assertEqual([comment.content for comment in ordered], ["a", "b", "c", "d", "e"])
+
+    def test_thread_lists_the_subtree_in_one_query(self):
+        a, b, c, d, e = self.build_threads()
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(f"/api/comments/{a.pk}/thread/", {"page_size": 2})
+        self.assertEqual([row["content"] for row in first.data["results"]], ["b", "c"])
+        self.assertEqual(len(queries), 2)  # the parent's path, then the range of replies
+        rest = self.client.get(first.data["next"])
+        self.assertEqual([row["content"] for row in rest.data["results"]], ["d"])
+        self.assertIsNone(rest.data["next"])
+
+    def test_post_threads_are_paginated_by_whole_threads(self):
+        a, b, c, d, e = self.build_threads()
+        first = self.client.get(f"/api/posts/{self.post.pk}/threads/", {"page_size": 1})
+        thread = first.data["results"][0]
+        self.assertEqual(thread["content"], "a")
+        self.assertEqual([reply["content"] for reply in thread["replies"]], ["b", "c", "d"])
+        self.assertFalse(thread["replies_truncated"])
+        second = self.client.get(first.data["next"])
+        self.assertEqual([thread["content"] for thread in second.data["results"]], ["e"])
+        self.assertIsNone(second.data["next"])
+
+    @override_settings(COMMENT_THREAD_MAX_ROWS=3)
+    def test_a_long_thread_is_cut_short(self):
+        self.build_threads()
+        response = self.client.get(f"/api/posts/{self.post.pk}/threads/")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertTrue(response.data["results"][0]["replies_truncated"])
+        rest = self.client.get(response.data["next"])
+        self.assertEqual([thread["content"] for thread in rest.data["results"]], ["e"])
+
+    def test_replies_must_stay_on_the_parents_post(self):
+        a = self.reply(None, "a")
+        other = Post.objects.create(author=self.user, title="other", content="c")
+        response = self.client.post("/api/comments/", {"post": other.pk, "parent": a.pk, "content": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(f"/api/comments/{a.pk}/", {"post": other.pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_replies_get_paths(self):
+        a = self.reply(None, "a")
+        payload = [{"post": self.post.pk, "parent": a.pk, "content": f"r{i}"} for i in range(3)]
+        self.assertEqual(self.client.post("/api/comments/bulk/", payload, format="json").status_code, 201)
+        self.assertEqual(threads.descendants(a).filter(depth=1).count(), 3)
+
+    def test_filter_by_post_and_delete_subtree(self):
+        a, b, c, d, e = self.build_threads()
+        Comment.objects.create(post=Post.objects.create(author=self.user, title="o", content="c"), author=self.user)
+        response = self.client.get("/api/comments/", {"post": self.post.pk})
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual(self.client.get("/api/comments/", {"post": "x"}).status_code, 400)
+
+        self.client.delete(f"/api/comments/{a.pk}/")
+        queue.run_pending()
+        self.post.refresh_from_db()
+        self.assertEqual(list(Comment.objects.filter(post=self.post).values_list("content", flat=True)), ["e"])
+        self.assertEqual(self.post.comment_count, 1)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="exporter")
+        other = User.objects.create(username="other")
+        self.posts = [Post.objects.create(author=self.user, title=f"p{i}", content="x") for i in range(5)]
+        foreign = Post.objects.create(author=other, title="theirs", content="y")
+        self.comments = [Comment.objects.create(post=foreign, author=self.user, content=f"c{i}") for i in range(3)]
+        Comment.objects.create(post=self.posts[0], author=other, content="not mine")
+        self.like = Like.objects.create(user=self.user, post=foreign)
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse("export"), params)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_streams_every_own_row_once(self):
+        rows = self.export()
+        self.assertEqual(
+            [(row["type"], row["id"]) for row in rows],
+            [("post", p.pk) for p in self.posts] + [("comment", c.pk) for c in self.comments]
+            + [("like", self.like.pk)],
+        )
+        self.assertEqual(rows[5]["post_id"], self.comments[0].post_id)
+
+    def test_resumes_after_cursor(self):
+        rows = self.export()
+        resumed = self.export(cursor=rows[3]["cursor"])
+        self.assertEqual(resumed, rows[4:])
+        self.assertEqual(self.export(cursor=rows[-1]["cursor"]), [])
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ("bogus:1", "post:x"):
+            response = self.client.get(reverse("export"), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_memory_stays_bounded_by_chunk(self):
+        chunks = list(export.export_lines(self.user, chunk_size=2))
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [2, 2, 1, 2, 1, 1])
+
+
+class LikedByMeTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.reader = User.objects.create(username="reader")
+        self.reader.following.add(self.author)
+        self.posts = [Post.objects.create(author=self.author, title=f"p{i}", content="x") for i in range(4)]
+        for post in self.posts[:2]:
+            Like.objects.create(user=self.reader, post=post)
+        self.client.force_authenticate(self.reader)
+
+    def test_list_and_feed_resolve_liked_by_me_per_page(self):
+        expected = {post.pk: i < 2 for i, post in enumerate(self.posts)}
+        for url in ("/api/posts/", reverse("feed")):
+            response = self.client.get(url)
+            self.assertEqual({row["id"]: row["liked_by_me"] for row in response.data["results"]}, expected)
+
+    def test_detail_resolves_liked_by_me(self):
+        response = self.client.get(f"/api/posts/{self.posts[0].pk}/")
+        self.assertTrue(response.data["liked_by_me"])
+
+    def test_bulk_like_status(self):
+        ids = [post.pk for post in self.posts]
+        with self.assertNumQueries(1):
+            response = self.client.post("/api/posts/like-status/", {"ids": ids}, format="json")
+        self.assertEqual(response.data["liked_by_me"], {str(i): i in ids[:2] for i in ids})
+
+        response = self.client.get("/api/posts/like-status/", {"ids": f"{ids[0]},{ids[3]}"})
+        self.assertEqual(response.data["liked_by_me"], {str(ids[0]): True, str(ids[3]): False})
+
+    @override_settings(LIKE_STATUS_MAX_IDS=2)
+    def test_bulk_like_status_limits_ids(self):
+        response = self.client.get("/api/posts/like-status/", {"ids": "1,2,3"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_like_status_rejects_a_list_body(self):
+        response = self.client.post("/api/posts/like-status/", [self.posts[0].pk], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ids", response.data)
+
+
+class PostSearchTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.django = Post.objects.create(author=self.author, title="Django tips", content="Use select_related with Django.")
+        self.python = Post.objects.create(author=self.author, title="Python", content="A note that mentions django once.")
+        self.other = Post.objects.create(author=self.author, title="Gardening", content="Tomatoes and basil.")
+        # Enough unrelated posts for term frequencies to carry weight
+        for title in ("Cooking", "Music", "Travel"):
+            Post.objects.create(author=self.author, title=title, content=f"{title} notes.")
+
+    def search(self, query, **params):
+        return self.client.get("/api/posts/", {"search": query, **params}).data
+
+    def test_ranks_by_relevance_with_prefix_matching(self):
+        data = self.search("djan")
+        self.assertEqual([row["id"] for row in data["results"]], [self.django.pk, self.python.pk])
+        self.assertIn("<mark>Django</mark>", data["results"][0]["snippet"])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.other.content = "Tomatoes, basil and Django."
+        self.other.save()
+        self.assertIn(self.other.pk, [row["id"] for row in self.search("django")["results"]])
+
+        self.other.delete()
+        self.assertNotIn(self.other.pk, [row["id"] for row in self.search("django")["results"]])
+
+    def test_results_paginate_by_rank(self):
+        first = self.search("django", page_size=1)
+        second = self.client.get(first["next"]).data
+        self.assertEqual([row["id"] for row in first["results"] + second["results"]], [self.django.pk, self.python.pk])
+        self.assertIsNone(second["next"])
+
+    def test_rebuild_command_restores_index(self):
+        search.get_backend().remove_posts([self.django.pk, self.python.pk])
+        self.assertEqual(self.search("django")["results"], [])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(len(self.search("django")["results"]), 2)
+
+    def test_search_applies_to_the_list_only(self):
+        response = self.client.get(f"/api/posts/{self.other.pk}/", {"search": "django"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("snippet", response.data)
+        response = self.client.get(f"/api/posts/{self.other.pk}/comments/", {"search": "django"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_like_fallback_without_an_index(self):
+        with mock.patch.object(search, "get_backend", return_value=search.SearchBackend()):
+            data = self.search("djan tips")
+            self.assertEqual([row["id"] for row in data["results"]], [self.django.pk])
+            self.assertEqual(len(self.search("DJANGO")["results"]), 2)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.post = Post.objects.create(author=self.author, title="t", content="c")
+        self.client.force_authenticate(self.author)
+
+    def test_list_returns_304_without_serializing(self):
+        first = self.client.get("/api/posts/")
+        self.assertTrue(first["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", first)
+
+        # The page's ids and counters, its preview versions and the viewer's
+        # likes, read for those rows only; the page itself is never loaded
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(queries[0]["sql"].endswith("LIMIT 11"))
+        self.assertNotIn("COUNT", queries[1]["sql"] + queries[2]["sql"])
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second.content, b"")
+
+        Post.objects.create(author=self.author, title="new", content="c")
+        third = self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(third.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_follows_the_viewers_likes_before_jobs_run(self):
+        fan = User.objects.create(username="fan")
+        self.client.force_authenticate(fan)
+        fan.following.add(self.author)
+        etag = self.client.get("/api/posts/")["ETag"]
+
+        self.client.post(reverse("like-post", args=[self.post.pk]))  # like_count is queued
+        liked = self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(liked.status_code, status.HTTP_200_OK)
+        self.assertTrue(liked.data["results"][0]["liked_by_me"])
+
+        self.client.post(reverse("unlike-post", args=[self.post.pk]))
+        unliked = self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=liked["ETag"])
+        self.assertEqual(unliked.status_code, status.HTTP_200_OK)
+        self.assertFalse(unliked.data["results"][0]["liked_by_me"])
+
+        feed_etag = self.client.get("/api/feed/", {"mode": "pull"})["ETag"]
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        feed = self.client.get("/api/feed/", {"mode": "pull"}, HTTP_IF_NONE_MATCH=feed_etag)
+        self.assertEqual(feed.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_changes_when_a_previewed_comment_is_edited(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content="first")
+        etag = self.client.get("/api/posts/")["ETag"]
+        self.assertEqual(self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Comment.objects.filter(pk=comment.pk).update(content="edited", updated_at=timezone.now())
+        response = self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["recent_comments"][0]["content"], "edited")
+
+    def test_detail_etag_changes_with_likes_and_comments(self):
+        url = f"/api/posts/{self.post.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        liked = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(liked.status_code, status.HTTP_200_OK)
+
+        self.client.post("/api/comments/", {"post": self.post.pk, "content": "hi"})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=liked["ETag"]).status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        url = f"/api/comments/{Comment.objects.create(post=self.post, author=self.author, content='x').pk}/"
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_feed_supports_etags(self):
+        follower = User.objects.create(username="follower")
+        follower.following.add(self.author)
+        self.client.force_authenticate(follower)
+        etag = self.client.get(reverse("feed"))["ETag"]
+        self.assertEqual(
+            self.client.get(reverse("feed"), HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+
+class JSONRenderingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="writer")
+        self.client.force_authenticate(self.user)
+
+    def test_renderer_matches_stdlib_output(self):
+        from decimal import Decimal
+
+        from rest_framework.renderers import JSONRenderer
+
+        from social_media_api.renderers import FastJSONRenderer
+
+        data = {"when": timezone.now(), "price": Decimal("1.50"), "ids": [1, 2], "name": "café"}
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data))
+        )
+        # Integers orjson cannot represent fall back to the stdlib encoder
+        self.assertEqual(json.loads(FastJSONRenderer().render({"big": 2 ** 70})), {"big": 2 ** 70})
+
+    def test_json_request_round_trip(self):
+        response = self.client.post(
+            "/api/posts/", json.dumps({"title": "Über", "content": "Ünïcode"}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content)["title"], "Über")
+
+        response = self.client.post("/api/posts/", "{not json", content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
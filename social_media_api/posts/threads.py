@@ -0,0 +1,102 @@
+"""
+Reply threads stored as materialized paths.
+
+A comment's ``path`` is the ids of its ancestors followed by its own id, each
+zero-padded to Comment.PATH_DIGITS digits: reply 12 to comment 7 has the
+path ``000000000007000000000012``. Ordering a post's comments by path lists
+every thread depth-first, replies oldest first under their parent, and a
+subtree is the contiguous range ``[path, path + SUBTREE_END)``. Reading a
+thread, or a page of whole threads, is then one range scan on the
+(post, path) index instead of a walk over the replies level by level.
+"""
+from django.conf import settings
+from django.db.models import Case, CharField, Value, When
+
+from social_media_api.pagination import KeysetPagination
+
+from .models import Comment
+
+# Sorts right after '9', so it bounds every path under a prefix
+SUBTREE_END = ':'
+
+
+def get_max_thread_rows():
+    """Comments read for one page of threads; a longer thread is cut short."""
+    return getattr(settings, 'COMMENT_THREAD_MAX_ROWS', 200)
+
+
+def root_path(path):
+    return path[:Comment.PATH_DIGITS]
+
+
+def descendants(comment, queryset=None):
+    """Every reply under ``comment``, at any depth, unordered."""
+    queryset = Comment.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        post_id=comment.post_id, path__gt=comment.path, path__lt=comment.path + SUBTREE_END
+    )
+
+
+def subtree_size(comment):
+    """``comment`` and all of its replies."""
+    return descendants(comment).count() + 1
+
+
+def assign_paths(comments):
+    """
+    Set depth and path on comments inserted without ``save()`` (bulk creates),
+    in one UPDATE. Parents must already have their paths.
+    """
+    whens = []
+    for comment in comments:
+        if comment.parent_id:
+            comment.depth = comment.parent.depth + 1
+        comment.path = comment.build_path()
+        whens.append(When(pk=comment.pk, then=Value(comment.path)))
+    if whens:
+        Comment.objects.filter(pk__in=[comment.pk for comment in comments]).update(
+            path=Case(*whens, output_field=CharField()),
+            depth=Case(*(When(pk=comment.pk, then=Value(comment.depth)) for comment in comments)),
+        )
+
+
+class ThreadPagination(KeysetPagination):
+    """
+    Pages of whole threads: up to ``page_size`` top-level comments of a post,
+    each with its replies in path order (``thread_replies``).
+
+    The page is read as a single range of at most COMMENT_THREAD_MAX_ROWS
+    comments. When a thread does not fit, it ends the page with
+    ``replies_truncated`` set, and the rest of it can be read from
+    ``/api/comments/<id>/thread/``. The cursor sits after the last thread.
+    """
+    ordering = ('path',)
+
+    def get_ordering(self, view):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.page_number_paginator = None
+
+        page_size = self.get_page_size(request)
+        max_rows = get_max_thread_rows()
+        rows = list(self.get_page_queryset(queryset, request, view)[:max_rows + 1])
+        threads = []
+        for comment in rows[:max_rows]:
+            if threads and root_path(comment.path) == root_path(threads[-1].path):
+                threads[-1].thread_replies.append(comment)
+            else:
+                comment.thread_replies, comment.replies_truncated = [], False
+                threads.append(comment)
+        if len(rows) > max_rows and root_path(rows[max_rows].path) == root_path(threads[-1].path):
+            threads[-1].replies_truncated = True
+
+        self.has_next = len(rows) > max_rows or len(threads) > page_size
+        self.page = threads[:page_size]
+        return self.page
+
+    def get_position(self, row, ordering):
+        # After every path of the last thread
+        return [root_path(row.path) + SUBTREE_END]
@@ -0,0 +1,350 @@
+"""
+Materialized home timelines.
+
+When a post is written it is pushed ("fanned out") into a TimelineEntry row
+for every follower of its author, so reading the feed becomes a single
+indexed range read on (user, created_at) instead of an IN-subquery join and
+sort over every followed author's posts.
+
+Timelines are only kept when FEED_MODE is 'push' or 'hybrid'. Fan-out runs
+on the job queue (posts.tasks), after the post's request has been answered;
+so do follows and unfollows, which add the author's newest posts to the
+follower's timeline or remove them.
+In 'pull' mode nothing is fanned out and feeds are always pulled; run
+``backfill_timelines`` after switching away from it.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Post, TimelineEntry
+
+FEED_MODE_PULL = "pull"
+FEED_MODE_PUSH = "push"
+FEED_MODE_HYBRID = "hybrid"
+FEED_MODES = (FEED_MODE_PULL, FEED_MODE_PUSH, FEED_MODE_HYBRID)
+
+# Push and hybrid feeds are ordered, and paginated, on the timeline entry's
+# own columns so the (user, -created_at, -post) index serves the ORDER BY;
+# the values are those of the post's (created_at, id).
+TIMELINE_ORDERING = ("-timeline_created_at", "-timeline_post_id")
+
+
+def get_max_entries():
+    """Number of newest entries kept per user by the trim policy."""
+    return getattr(settings, "FEED_TIMELINE_MAX_ENTRIES", 800)
+
+
+def get_batch_size():
+    return getattr(settings, "FEED_FANOUT_BATCH_SIZE", 1000)
+
+
+def get_fanout_threshold():
+    """
+    Follower count above which an author's posts are not fanned out.
+
+    Only applies when FEED_MODE is 'hybrid'; in 'push' mode every post is
+    pushed, and in 'pull' mode none is.
+    """
+    if getattr(settings, "FEED_MODE", FEED_MODE_PULL) != FEED_MODE_HYBRID:
+        return None
+    return getattr(settings, "FEED_FANOUT_FOLLOWER_THRESHOLD", 10000)
+
+
+def timelines_enabled():
+    """Whether posts are fanned out, i.e. FEED_MODE is 'push' or 'hybrid'."""
+    return getattr(settings, "FEED_MODE", FEED_MODE_PULL) in (FEED_MODE_PUSH, FEED_MODE_HYBRID)
+
+
+def get_feed_mode(request):
+    """
+    Feed read path: the FEED_MODE setting, overridable per request with ?mode=
+    when timelines are kept.
+    """
+    if not timelines_enabled():
+        return FEED_MODE_PULL
+    mode = request.query_params.get("mode") or settings.FEED_MODE
+    return mode if mode in FEED_MODES else FEED_MODE_PULL
+
+
+def _follows():
+    # Through table of CustomUser.followers: from_customuser is the followed
+    # user, to_customuser is the follower.
+    return get_user_model().followers.through.objects
+
+
+def follower_ids(author_id):
+    return _follows().filter(from_customuser_id=author_id).values_list("to_customuser_id", flat=True)
+
+
+def followed_ids(user_id):
+    return _follows().filter(to_customuser_id=user_id).values_list("from_customuser_id", flat=True)
+
+
+def pull_feed(user):
+    """Posts of followed authors, computed at read time."""
+    return Post.objects.filter(author__in=user.following.all()).order_by("-created_at", "-id")
+
+
+def push_feed(user):
+    """Posts read from the user's materialized timeline, in TIMELINE_ORDERING."""
+    return (
+        Post.objects.filter(timeline_entries__user=user)
+        .annotate(timeline_created_at=F("timeline_entries__created_at"), timeline_post_id=F("timeline_entries__post"))
+        .order_by(*TIMELINE_ORDERING)
+    )
+
+
+def high_follower_author_ids(user, threshold=None):
+    """Followed authors whose posts are pulled at read time instead of pushed."""
+    threshold = get_fanout_threshold() if threshold is None else threshold
+    if threshold is None:
+        return []
+    return list(
+        get_user_model().objects.filter(pk__in=followed_ids(user.pk), followers_count__gt=threshold)
+        .values_list("pk", flat=True)
+    )
+
+
+def hybrid_feed(user, threshold=None):
+    """Pushed timeline entries merged with posts pulled from high-follower authors."""
+    pulled_authors = high_follower_author_ids(user, threshold)
+    if not pulled_authors:
+        return push_feed(user)
+    pulled = (
+        Post.objects.filter(author_id__in=pulled_authors)
+        .annotate(timeline_created_at=F("created_at"), timeline_post_id=F("id"))
+        .order_by(*TIMELINE_ORDERING)
+    )
+    return MergedFeed(push_feed(user), pulled)
+
+
+class MergedFeed:
+    """
+    Lazy k-way merge of querysets that are each ordered by (-created_at, -id).
+    Reordering with ``order_by`` is passed to the streams and must keep that order.
+
+    Slicing ``[start:stop]`` reads at most ``stop`` rows from every stream, so
+    the merge stays bounded by the requested page rather than by the size of
+    the streams. Queryset methods are applied to every stream, which lets
+    pagination and the views treat the result like a queryset.
+    """
+    ordered = True
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self.model = querysets[0].model
+
+    def _clone_with(self, method, *args, **kwargs):
+        return MergedFeed(*(getattr(qs, method)(*args, **kwargs) for qs in self.querysets))
+
+    def filter(self, *args, **kwargs):
+        return self._clone_with("filter", *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._clone_with("exclude", *args, **kwargs)
+
+    def order_by(self, *fields):
+        return self._clone_with("order_by", *fields)
+
+    def select_related(self, *fields):
+        return self._clone_with("select_related", *fields)
+
+    def prefetch_related(self, *lookups):
+        return self._clone_with("prefetch_related", *lookups)
+
+    def annotate(self, *args, **kwargs):
+        return self._clone_with("annotate", *args, **kwargs)
+
+    def only(self, *fields):
+        return self._clone_with("only", *fields)
+
+    def defer(self, *fields):
+        return self._clone_with("defer", *fields)
+
+    def _distinct_posts(self):
+        # Streams can overlap when an author crosses the threshold
+        condition = Q()
+        for qs in self.querysets:
+            condition |= Q(pk__in=qs.values("pk"))
+        return self.model.objects.filter(condition)
+
+    def count(self):
+        return self._distinct_posts().count()
+
+    def aggregate(self, *args, **kwargs):
+        return self._distinct_posts().aggregate(*args, **kwargs)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        raise TypeError("MergedFeed must be sliced before it is evaluated.")
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        if index.stop is None or index.step is not None:
+            raise ValueError("MergedFeed only supports bounded slices.")
+        start = index.start or 0
+        streams = [list(qs[:index.stop]) for qs in self.querysets]
+        merged = heapq.merge(*streams, key=lambda post: (post.created_at, post.pk), reverse=True)
+        return list(islice(_unique(merged), start, index.stop))
+
+
+def _unique(posts):
+    seen = set()
+    for post in posts:
+        if post.pk not in seen:
+            seen.add(post.pk)
+            yield post
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=get_batch_size(), ignore_conflicts=True)
+
+
+def fan_out_post(post, threshold=None):
+    """
+    Push a newly written post into every follower's timeline.
+
+    Authors with more than ``threshold`` followers are skipped; hybrid feeds
+    pull their posts at read time instead. Returns the number of rows written.
+    """
+    return fan_out_posts([post], threshold)
+
+
+def fan_out_posts(posts, threshold=None):
+    """``fan_out_post`` for many posts, reading each author's followers once."""
+    threshold = get_fanout_threshold() if threshold is None else threshold
+    by_author = {}
+    for post in posts:
+        by_author.setdefault(post.author_id, []).append(post)
+
+    skipped = set()
+    if threshold is not None:
+        skipped = set(
+            get_user_model().objects.filter(pk__in=list(by_author), followers_count__gt=threshold)
+            .values_list("pk", flat=True)
+        )
+
+    batch, written = [], 0
+    for author_id, author_posts in by_author.items():
+        if author_id in skipped:
+            continue
+        for user_id in follower_ids(author_id).iterator(chunk_size=get_batch_size()):
+            batch.extend(
+                TimelineEntry(user_id=user_id, post_id=post.pk, created_at=post.created_at) for post in author_posts
+            )
+            if len(batch) >= get_batch_size():
+                _bulk_insert(batch)
+                written += len(batch)
+                batch = []
+    if batch:
+        _bulk_insert(batch)
+        written += len(batch)
+    return written
+
+
+def remove_post(post):
+    """Delete a post's timeline entries in batches ahead of the post itself."""
+    entries = TimelineEntry.objects.filter(post_id=post.pk)
+    while True:
+        ids = list(entries.values_list("id", flat=True)[:get_batch_size()])
+        if not ids:
+            break
+        TimelineEntry.objects.filter(id__in=ids).delete()
+
+
+def backfill_timeline(user, max_entries=None):
+    """Rebuild one user's timeline from the pull query. Returns rows written."""
+    max_entries = max_entries or get_max_entries()
+    posts = (
+        Post.objects.filter(author_id__in=followed_ids(user.pk))
+        .order_by("-created_at", "-id")
+        .values_list("id", "created_at")[:max_entries]
+    )
+    entries = [TimelineEntry(user_id=user.pk, post_id=post_id, created_at=created_at) for post_id, created_at in posts]
+    _bulk_insert(entries)
+    return len(entries)
+
+
+def sync_follows(pairs):
+    """
+    Bring timelines in line with follows that changed, given as (follower id,
+    author id) pairs: if the follow exists now, the author's newest posts are
+    added to the follower's timeline (unless hybrid mode pulls them);
+    otherwise the author's posts are removed from it. Reads the follows as
+    they are when it runs, so pairs may be replayed in any order.
+    Returns (rows written, rows deleted).
+    """
+    pairs = {tuple(pair) for pair in pairs}
+    current = set(
+        _follows().filter(
+            to_customuser_id__in={follower for follower, _ in pairs},
+            from_customuser_id__in={author for _, author in pairs},
+        ).values_list("to_customuser_id", "from_customuser_id")
+    )
+
+    deleted = 0
+    unfollowed = {}
+    for follower_id, author_id in pairs - current:
+        unfollowed.setdefault(follower_id, []).append(author_id)
+    for follower_id, author_ids in unfollowed.items():
+        count, _ = TimelineEntry.objects.filter(user_id=follower_id, post__author_id__in=author_ids).delete()
+        deleted += count
+
+    followers_by_author = {}
+    for follower_id, author_id in pairs & current:
+        followers_by_author.setdefault(author_id, []).append(follower_id)
+    threshold = get_fanout_threshold()
+    if threshold is not None:
+        for author_id in get_user_model().objects.filter(
+            pk__in=list(followers_by_author), followers_count__gt=threshold
+        ).values_list("pk", flat=True):
+            del followers_by_author[author_id]
+
+    batch, written = [], 0
+    for author_id, followers in followers_by_author.items():
+        newest = list(
+            Post.objects.filter(author_id=author_id).order_by("-created_at", "-id")
+            .values_list("id", "created_at")[:get_max_entries()]
+        )
+        for user_id in followers:
+            batch.extend(
+                TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at) for post_id, created_at in newest
+            )
+            if len(batch) >= get_batch_size():
+                _bulk_insert(batch)
+                written += len(batch)
+                batch = []
+    if batch:
+        _bulk_insert(batch)
+        written += len(batch)
+    return written, deleted
+
+
+def trim_timelines(user_ids, max_entries=None):
+    """Keep only the newest ``max_entries`` timeline entries for each user. Returns rows deleted."""
+    max_entries = max_entries or get_max_entries()
+    ranked = (
+        TimelineEntry.objects.filter(user_id__in=user_ids)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("user_id")],
+                order_by=[F("created_at").desc(), F("post_id").desc()],
+            )
+        )
+        .filter(position__gt=max_entries)
+    )
+    deleted = 0
+    stale_ids = list(ranked.values_list("id", flat=True))
+    for start in range(0, len(stale_ids), get_batch_size()):
+        count, _ = TimelineEntry.objects.filter(id__in=stale_ids[start:start + get_batch_size()]).delete()
+        deleted += count
+    return deleted
@@ -1,8 +1,8 @@
 # posts/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, FeedView
-from .views import LikePostView, UnlikePostView
+from .views import PostViewSet, CommentViewSet, FeedView, AsyncFeedView
+from .views import LikePostView, UnlikePostView, ExportView
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
@@ -11,6 +11,8 @@ router.register(r'comments', CommentViewSet, basename='comment')
 urlpatterns = [
     path('', include(router.urls)),
     path('feed/', FeedView.as_view(), name='feed'),
+    path('async/feed/', AsyncFeedView.as_view(), name='async-feed'),
+    path('export/', ExportView.as_view(), name='export'),
 
     path("<int:pk>/like/", LikePostView.as_view(), name="like-post"),
     path("<int:pk>/unlike/", UnlikePostView.as_view(), name="unlike-post"),
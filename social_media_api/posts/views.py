@@ -1,11 +1,28 @@
-from rest_framework import viewsets, permissions, filters, generics
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, permissions, generics
 from .models import Post, Comment, Like
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from notifications.models import Notification
-from django.contrib.contenttypes.models import ContentType
-from .serializers import PostSerializer, CommentSerializer
+from notifications import tasks as notification_tasks
+from social_media_api.async_views import AsyncListAPIView
+from social_media_api.pagination import KeysetPagination
+from social_media_api.params import requested_ids
+from social_media_api.sparse import SparseFieldsetMixin, requested_fields, restrict_to_rendered
+from .serializers import PostSerializer, PostListSerializer, CommentSerializer, CommentThreadSerializer
+from . import counters, export, ranking, search, tasks, threads, timeline
+from .conditional import ConditionalGetMixin, make_etag
+
+FEED_ORDERING_RANKED = 'ranked'
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -17,54 +34,402 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.author == request.user
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all().order_by('-created_at')
+def get_preview_count():
+    return getattr(settings, 'POST_COMMENT_PREVIEW_COUNT', 3)
+
+
+def with_comment_previews(queryset):
+    """
+    Prefetch the newest comments of every post on a page in a single windowed
+    query, however many comments a post has (``recent_comments``).
+    """
+    previews = Comment.objects.select_related('author').order_by('-created_at', '-id')[:get_preview_count()]
+    return queryset.prefetch_related(Prefetch('comments', queryset=previews, to_attr='recent_comments'))
+
+
+def preview_versions(post_ids):
+    """(id, updated_at) of the comments ``with_comment_previews`` shows for ``post_ids``."""
+    ranked = Comment.objects.filter(post_id__in=post_ids).annotate(position=Window(
+        RowNumber(), partition_by=[F('post_id')], order_by=[F('created_at').desc(), F('id').desc()]
+    ))
+    return sorted(ranked.filter(position__lte=get_preview_count()).values_list('id', 'updated_at'))
+
+
+def load_rendered_posts(queryset, fields, always=()):
+    """
+    Load only what the rendered post ``fields`` read (see ``?fields=``): two
+    queries per page for the full list representation, one when neither
+    comments nor comment previews are rendered.
+    """
+    queryset = restrict_to_rendered(queryset, fields, always)
+    if 'recent_comments' in fields:
+        queryset = with_comment_previews(queryset)
+    if 'comments' in fields:
+        queryset = queryset.prefetch_related(Prefetch('comments', queryset=Comment.objects.select_related('author')))
+    return queryset
+
+
+def _liked(user, posts):
+    return Like.objects.filter(user=user, post_id__in=[post.pk for post in posts]).values_list('post_id', flat=True)
+
+
+def liked_post_ids(user, posts):
+    """Ids among ``posts`` that ``user`` has liked, in one query."""
+    if not user.is_authenticated:
+        return set()
+    return set(_liked(user, posts))
+
+
+async def aliked_post_ids(user, posts):
+    if not user.is_authenticated:
+        return set()
+    return {post_id async for post_id in _liked(user, posts)}
+
+
+def renders_liked_by_me(request):
+    wanted = requested_fields(request)
+    return wanted is None or 'liked_by_me' in wanted
+
+
+class LikedByMeMixin:
+    """Resolve ``liked_by_me`` for a whole page of posts with a single Like query."""
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            context = self.get_serializer_context()
+            rendered = renders_liked_by_me(self.request)
+            context['liked_post_ids'] = liked_post_ids(self.request.user, args[0]) if rendered else set()
+            kwargs.setdefault('context', context)
+        return super().get_serializer(*args, **kwargs)
+
+
+class PostListValidatorsMixin:
+    """
+    List ETags for post pages (see ConditionalGetMixin): the rows' counters,
+    and the comments and likes the page renders, read for its posts only.
+    """
+    list_etag_fields = ('like_count', 'comment_count')
+
+    def get_list_etag_extras(self, ids):
+        fields = self.get_rendered_fields()
+        extras = {}
+        if 'recent_comments' in fields:
+            # Edited comments change the previews without touching the post
+            extras['previews'] = preview_versions(ids)
+            extras['previews_updated_at'] = max((updated_at for _, updated_at in extras['previews']), default=None)
+        if 'comments' in fields:
+            extras.update(Comment.objects.filter(post_id__in=ids).aggregate(
+                comments=Count('pk'), comments_updated_at=Max('updated_at'),
+            ))
+        if 'liked_by_me' in fields and self.request.user.is_authenticated:
+            # like_count only moves once the queued counter job has run
+            extras['liked'] = sorted(
+                Like.objects.filter(user=self.request.user, post_id__in=ids).values_list('post_id', flat=True)
+            )
+        return extras
+
+
+class BulkCreateMixin:
+    """
+    ``POST .../bulk/`` with a JSON list: validate every item, insert the valid
+    ones with ``bulk_create`` and report the rest by position.
+
+    Answers 201 when every item was created, 207 when some were and 400 when
+    none were, with ``{"created": [{"index", "id"}], "errors": [{"index", "errors"}]}``.
+    """
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)  # only a malformed payload fails as a whole
+        created = self.perform_bulk_create(serializer) if serializer.validated_data else []
+
+        errors = [{'index': index, 'errors': detail} for index, detail in serializer.item_errors.items()]
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'created': [{'index': index, 'id': obj.pk} for index, obj in zip(serializer.valid_indexes, created)],
+            'errors': errors,
+        }, status=response_status)
+
+    def perform_bulk_create(self, serializer):
+        return serializer.save(author=self.request.user)
+
+
+class PostViewSet(PostListValidatorsMixin, ConditionalGetMixin, LikedByMeMixin, SparseFieldsetMixin, BulkCreateMixin,
+                  viewsets.ModelViewSet):
+    queryset = Post.objects.all().order_by('-created_at', '-id')
     serializer_class = PostSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'content']
+    filter_backends = [search.PostSearchFilter]
+
+    def get_detail_validators(self):
+        # Everything the detail representation depends on, in one query
+        posts = Post.objects.filter(pk=self.kwargs['pk']).annotate(
+            comments_updated_at=Max('comments__updated_at'),
+            liked=Exists(Like.objects.filter(post=OuterRef('pk'), user_id=self.request.user.pk)),
+        )
+        try:
+            row = posts.values('pk', 'updated_at', 'like_count', 'comment_count', 'comments_updated_at', 'liked').first()
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            return None, None
+        last_modified = max(filter(None, (row['updated_at'], row['comments_updated_at'])))
+        return make_etag(self.request.user.pk, *sorted(row.items())), last_modified
+
+    def get_search_terms(self):
+        # Only the list is searched; ?search= on a post or its comments is ignored
+        if self.action != 'list':
+            return []
+        return search.parse_terms(self.request.query_params.get('search', ''))
+
+    @property
+    def keyset_ordering(self):
+        # Search results are ordered, and therefore paginated, by relevance
+        if self.get_search_terms():
+            return ('-search_rank', '-id')
+        return None
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['search_terms'] = self.get_search_terms()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            always = self.get_always_loaded()
+            if self.get_search_terms():
+                always.append('content')  # for the snippet
+            return load_rendered_posts(queryset, self.get_rendered_fields(), always)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PostListSerializer
+        return super().get_serializer_class()
+
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        """Paginated comments of one post, newest first."""
+        post = self.get_object()
+        comments = Comment.objects.filter(post=post).select_related('author').order_by('-created_at', '-id')
+        page = self.paginate_queryset(comments)
+        return self.get_paginated_response(CommentSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def threads(self, request, pk=None):
+        """
+        Paginated threads of one post, oldest first: each top-level comment
+        with all of its replies, depth-first (see posts.threads).
+        """
+        post = self.get_object()
+        paginator = threads.ThreadPagination()
+        page = paginator.paginate_queryset(
+            Comment.objects.filter(post=post).select_related('author'), request, view=self
+        )
+        serializer = CommentThreadSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get', 'post'], url_path='like-status',
+            permission_classes=[permissions.IsAuthenticated])
+    def like_status(self, request):
+        """
+        Whether the current user liked each of up to LIKE_STATUS_MAX_IDS posts.
+
+        Ids come from ``?ids=1,2,3`` or a ``{"ids": [...]}`` body.
+        """
+        ids = requested_ids(request, getattr(settings, 'LIKE_STATUS_MAX_IDS', 500), 'post')
+        liked = set(Like.objects.filter(user=request.user, post_id__in=ids).values_list('post_id', flat=True))
+        return Response({'liked_by_me': {str(post_id): post_id in liked for post_id in ids}})
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            post = serializer.save(author=self.request.user)
+            tasks.enqueue_fan_out([post])
 
+    def perform_bulk_create(self, serializer):
+        with transaction.atomic():
+            posts = super().perform_bulk_create(serializer)
+            # bulk_create sends no post_save, which keeps the search index in sync
+            search.get_backend().index_posts(posts)
+            tasks.enqueue_fan_out(posts)
+        return posts
 
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all().order_by('-created_at')
+    def perform_destroy(self, instance):
+        timeline.remove_post(instance)
+        instance.delete()
+
+
+class CommentViewSet(ConditionalGetMixin, SparseFieldsetMixin, BulkCreateMixin, viewsets.ModelViewSet):
+    queryset = Comment.objects.select_related('author').order_by('-created_at', '-id')
     serializer_class = CommentSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
+    def get_detail_validators(self):
+        try:
+            row = Comment.objects.filter(pk=self.kwargs['pk']).values('pk', 'updated_at').first()
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            return None, None
+        return make_etag(*sorted(row.items())), row['updated_at']
+
+    @property
+    def keyset_ordering(self):
+        # Replies are paginated depth-first, in path order
+        if self.action == 'thread':
+            return ('path',)
+        return None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = self.filter_by_post(queryset)
+        if self.action in ('list', 'retrieve', 'thread'):
+            return restrict_to_rendered(
+                queryset.select_related(None), self.get_rendered_fields(), self.get_always_loaded()
+            )
+        return queryset
+
+    def filter_by_post(self, queryset):
+        """``?post=<id>``: comments of one post only."""
+        post_id = self.request.query_params.get('post')
+        if post_id is None:
+            return queryset
+        if not post_id.isdigit():
+            raise ValidationError({'post': 'Expected a post id.'})
+        return queryset.filter(post_id=post_id)
+
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """Paginated replies under a comment, at any depth, depth-first (see posts.threads)."""
+        parent = generics.get_object_or_404(Comment.objects.only('post', 'path'), pk=pk)
+        self.check_object_permissions(request, parent)
+        page = self.paginate_queryset(threads.descendants(parent, self.get_queryset()))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            tasks.enqueue_counter(comment.post_id, counters.COMMENT_COUNT, 1)
 
-class FeedView(generics.ListAPIView):
-    serializer_class = PostSerializer
+    def perform_bulk_create(self, serializer):
+        with transaction.atomic():
+            comments = super().perform_bulk_create(serializer)
+            threads.assign_paths(comments)
+            for post_id, count in Counter(comment.post_id for comment in comments).items():
+                tasks.enqueue_counter(post_id, counters.COMMENT_COUNT, count)
+        return comments
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            removed = threads.subtree_size(instance)  # replies are deleted with the comment
+            instance.delete()
+            tasks.enqueue_counter(instance.post_id, counters.COMMENT_COUNT, -removed)
+
+class FeedView(PostListValidatorsMixin, ConditionalGetMixin, LikedByMeMixin, SparseFieldsetMixin, generics.ListAPIView):
+    serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def is_ranked(self):
+        return self.request.query_params.get('ordering') == FEED_ORDERING_RANKED
+
+    @property
+    def keyset_ordering(self):
+        # Ranked feeds are ordered, and therefore paginated, by their precomputed score
+        if self.is_ranked():
+            return ('-rank_score', '-id')
+        if timeline.get_feed_mode(self.request) in (timeline.FEED_MODE_PUSH, timeline.FEED_MODE_HYBRID):
+            return timeline.TIMELINE_ORDERING
+        return None
+
+    @property
+    def cursor_generation_field(self):
+        # Each rank_feeds run replaces the scores that ranked cursors seek on
+        return 'rank_computed_at' if self.is_ranked() else None
+
+    def get_cursor_generation(self):
+        return ranking.generation(self.request.user)
 
     def get_queryset(self):
-        # Get all the users the current user is following
-        following_users = self.request.user.following.all()
-        # Return posts only from those users, ordered by newest first
-        return Post.objects.filter(author__in=following_users).order_by("-created_at")
-    
+        if self.is_ranked():
+            feed = ranking.ranked_feed(self.request.user)
+        else:
+            # Read the materialized timeline, query followed authors' posts, or merge both
+            mode = timeline.get_feed_mode(self.request)
+            if mode == timeline.FEED_MODE_PUSH:
+                feed = timeline.push_feed(self.request.user)
+            elif mode == timeline.FEED_MODE_HYBRID:
+                feed = timeline.hybrid_feed(self.request.user)
+            else:
+                feed = timeline.pull_feed(self.request.user)
+        return load_rendered_posts(feed, self.get_rendered_fields(), self.get_always_loaded())
+
+
+class AsyncFeedView(AsyncListAPIView):
+    """FeedView for ASGI deployments; same modes, pagination and representation."""
+    serializer_class = PostListSerializer
+    pagination_class = KeysetPagination
+
+    is_ranked = FeedView.is_ranked
+    keyset_ordering = FeedView.keyset_ordering
+    cursor_generation_field = FeedView.cursor_generation_field
+    get_cursor_generation = FeedView.get_cursor_generation
+    get_queryset = FeedView.get_queryset
+
+    async def aget_queryset(self):
+        if not self.is_ranked() and timeline.get_feed_mode(self.request) == timeline.FEED_MODE_HYBRID:
+            # Picking the authors to pull runs a query
+            return await sync_to_async(self.get_queryset)()
+        return self.get_queryset()
+
+    async def aget_serializer_context(self, posts):
+        context = self.get_serializer_context()
+        if renders_liked_by_me(self.request):
+            context['liked_post_ids'] = await aliked_post_ids(self.request.user, posts)
+        else:
+            context['liked_post_ids'] = set()
+        return context
+
+
+class ExportView(generics.GenericAPIView):
+    """Stream the user's posts, comments and likes as NDJSON (see posts.export)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        cursor = request.query_params.get('cursor')
+        export.parse_cursor(cursor)  # reject a bad cursor before streaming starts
+        response = StreamingHttpResponse(
+            export.export_lines(request.user, cursor), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="export-{request.user.pk}.ndjson"'
+        return response
+
+
 class LikePostView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        post = generics.get_object_or_404(Post, pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        
+        post = generics.get_object_or_404(Post.objects.only('pk', 'author'), pk=pk)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
+            if created:
+                # Run by `manage.py run_jobs`, committed with the like
+                tasks.enqueue_counter(post.pk, counters.LIKE_COUNT, 1)
+                notification_tasks.enqueue_notify(post.author_id, request.user.pk, "liked", post)
+
         if not created:
             return Response({"detail": "Already liked"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create notification
-        Notification.objects.create(
-            recipient=post.author,
-            actor=request.user,
-            verb="liked",
-            content_type=ContentType.objects.get_for_model(post),
-            object_id=post.id,
-        )
-
         return Response({"detail": "Post liked"}, status=status.HTTP_201_CREATED)
 
 
@@ -72,11 +437,14 @@ class UnlikePostView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        post = generics.get_object_or_404(Post, pk=pk)
-        like = Like.objects.filter(user=request.user, post=post).first()
-        
-        if like:
-            like.delete()
+        post = generics.get_object_or_404(Post.objects.only('pk'), pk=pk)
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
+            if deleted:
+                # Queued as well, so it cannot overtake the like's queued increment
+                tasks.enqueue_counter(post.pk, counters.LIKE_COUNT, -1)
+
+        if deleted:
             return Response({"detail": "Post unliked"}, status=status.HTTP_200_OK)
         
         return Response({"detail": "You haven't liked this post"}, status=status.HTTP_400_BAD_REQUEST)
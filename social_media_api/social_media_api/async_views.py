@@ -0,0 +1,118 @@
+"""
+Async counterparts of DRF's APIView and ListAPIView.
+
+DRF views are synchronous, so every request holds a worker thread for as long
+as it waits on the database. These views run on the event loop under ASGI
+and read through Django's async ORM, so a slow query only suspends the
+request that issued it. They cover what the list endpoints and the async
+login/register views need: token authentication (required unless a view
+opts out), JSON and form parsing, keyset pagination and JSON rendering. The
+synchronous views stay in place for WSGI deployments.
+
+Serializers run on the event loop, so querysets must load everything the
+serializer reads (select_related / prefetch_related) up front.
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.parsers import FormParser
+from rest_framework.request import Request
+
+from .authentication import CachedTokenAuthentication
+from .renderers import FastJSONParser, dumps
+from .sparse import SparseFieldsetMixin
+
+
+class AsyncAPIView(View):
+    http_method_names = ['get', 'head', 'options']
+    keyword = 'Token'
+    # False for views anyone may call, such as login; request.user is then anonymous
+    authentication_required = True
+    parser_classes = (FastJSONParser, FormParser)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated like DRF's views, so exempt from CSRF as they are
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args, self.kwargs = args, kwargs
+        try:
+            self.request = Request(
+                request, parsers=[parser() for parser in self.parser_classes], authenticators=()
+            )
+            if self.authentication_required:
+                self.request.user = await self.authenticate(request)
+            else:
+                self.request.user = AnonymousUser()
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            # Shaped as DRF's exception handler would
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = self.render(data, status=exc.status_code)
+            if isinstance(exc, exceptions.NotAuthenticated):
+                response.status_code = status.HTTP_401_UNAUTHORIZED
+                response['WWW-Authenticate'] = self.keyword
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+
+    async def authenticate(self, request):
+        """The token's user, as CachedTokenAuthentication would resolve it; no token is rejected."""
+        header = request.headers.get('Authorization', '').split()
+        if not header or header[0].lower() != self.keyword.lower():
+            raise exceptions.NotAuthenticated()
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        user, _ = await CachedTokenAuthentication().aauthenticate_credentials(header[1])
+        return user
+
+    def render(self, data, status=status.HTTP_200_OK):
+        return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+class AsyncListAPIView(SparseFieldsetMixin, AsyncAPIView):
+    queryset = None
+    serializer_class = None
+    pagination_class = None
+
+    def get_serializer_class(self):
+        return self.serializer_class
+
+    def get_queryset(self):
+        assert self.queryset is not None, (
+            f"'{self.__class__.__name__}' should either include a `queryset` attribute, "
+            "or override the `get_queryset()` method."
+        )
+        queryset = self.queryset
+        if isinstance(queryset, QuerySet):
+            # A fresh clone per request, so results are never cached across requests
+            queryset = queryset.all()
+        return queryset
+
+    async def aget_queryset(self):
+        """Override when building the queryset itself has to query."""
+        return self.get_queryset()
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
+
+    async def aget_serializer_context(self, objects):
+        return self.get_serializer_context()
+
+    async def get(self, request, *args, **kwargs):
+        queryset = await self.aget_queryset()
+        paginator = self.pagination_class() if self.pagination_class else None
+        if paginator is not None:
+            objects = await paginator.apaginate_queryset(queryset, self.request, view=self)
+        else:
+            objects = [obj async for obj in queryset]
+
+        context = await self.aget_serializer_context(objects)
+        data = self.get_serializer_class()(objects, many=True, context=context).data
+        if paginator is not None:
+            return self.render(paginator.get_paginated_response(data).data)
+        return self.render(data)
@@ -0,0 +1,118 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary (``default``). Reads go to a random alias in
+DATABASE_REPLICAS, but only inside a request that ReplicaRoutingMiddleware
+has marked replica-safe: a GET, HEAD or OPTIONS request from a client that
+has not written anything in the last DATABASE_REPLICA_STICKY_SECONDS.
+Everything else (writes, management commands, shells) reads from the primary.
+
+Stickiness is what lets users see their own posts despite replication lag:
+once a client writes, it reads from the primary until the window expires.
+Clients are told apart by their Authorization header or session cookie, so
+the decision is made before authentication runs and costs no query. The
+marks live in the Django cache, which must be shared (CACHES) when several
+processes serve the API.
+"""
+import contextvars
+import hashlib
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY_PREFIX = 'db-router:sticky:'
+
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5)
+
+
+def get_primary_only_apps():
+    # Tokens and sessions are read right after being created (register, login)
+    return set(getattr(settings, 'DATABASE_PRIMARY_ONLY_APPS', ('authtoken', 'sessions')))
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or not _read_from_replica.get():
+            return PRIMARY
+        if model._meta.app_label in get_primary_only_apps():
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes for the rest of this request as well
+        _read_from_replica.set(False)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {PRIMARY, *get_replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in get_replicas():
+            return False
+        return None
+
+
+def sticky_key(request):
+    credential = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return STICKY_KEY_PREFIX + hashlib.sha256(credential.encode()).hexdigest()
+
+
+def wrote(request, response):
+    return request.method not in SAFE_METHODS and response.status_code < 400
+
+
+class ReplicaRoutingMiddleware:
+    """Marks safe requests from clients that have not written recently as replica-safe."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = sticky_key(request)
+        replica_safe = request.method in SAFE_METHODS and not (key and cache.get(key))
+        token = _read_from_replica.set(replica_safe)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        if key and wrote(request, response) and get_sticky_seconds() > 0:
+            cache.set(key, True, get_sticky_seconds())
+        return response
+
+    async def __acall__(self, request):
+        key = sticky_key(request)
+        replica_safe = request.method in SAFE_METHODS and not (key and await cache.aget(key))
+        token = _read_from_replica.set(replica_safe)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        if key and wrote(request, response) and get_sticky_seconds() > 0:
+            await cache.aset(key, True, get_sticky_seconds())
+        return response
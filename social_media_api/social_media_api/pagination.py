@@ -0,0 +1,208 @@
+"""
+Keyset ("seek") pagination.
+
+Pages are addressed by an opaque cursor holding the ordering values of the
+last row served, so fetching the next page is an indexed range read of
+``page_size + 1`` rows: no COUNT(*) and no OFFSET, whatever the page depth.
+Clients that still need numbered pages can opt in with ``?page=N``.
+
+Lists whose ordering values are recomputed in bulk (ranked feeds) name a
+``cursor_generation_field`` on the view: its value is stored in the cursor,
+and a cursor from an older generation is rejected instead of seeking on
+values that no longer exist.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _to_json(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class NumberedPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    # Every field must be indexed together, and the last one must be unique.
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    stale_cursor_message = 'This list has been recomputed since the cursor was issued; start again without a cursor.'
+
+    # Opt-in page-number mode
+    page_query_param = 'page'
+    page_number_class = NumberedPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.page_number_paginator = None
+        if self.page_query_param in request.query_params:
+            self.page_number_paginator = self.page_number_class()
+            return self.page_number_paginator.paginate_queryset(
+                queryset.order_by(*self.get_ordering(view)), request, view
+            )
+
+        page_size = self.get_page_size(request)
+        rows = list(self.get_page_queryset(queryset, request, view)[:page_size + 1])
+        return self.set_page(rows, page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, reading the page with the async ORM."""
+        if self.page_query_param in request.query_params:
+            return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+        self.request = request
+        self.view = view
+        self.page_number_paginator = None
+
+        page_size = self.get_page_size(request)
+        if self.get_generation_field(view) and request.query_params.get(self.cursor_query_param):
+            # Looked up ahead so that checking the cursor does not query
+            await sync_to_async(self.get_current_generation)(view)
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if isinstance(page_queryset, QuerySet):
+            rows = [row async for row in page_queryset[:page_size + 1]]
+        else:
+            # Merged hybrid feeds run their queries when sliced
+            rows = await sync_to_async(lambda: list(page_queryset[:page_size + 1]))()
+        return self.set_page(rows, page_size)
+
+    def set_page(self, rows, page_size):
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Order the queryset and seek past the request's cursor, without evaluating it."""
+        ordering = self.get_ordering(view)
+        queryset = queryset.order_by(*ordering)
+        position = self.decode_cursor(request, queryset.model, ordering, view)
+        if position is not None:
+            queryset = queryset.filter(self.seek_condition(ordering, position))
+        return queryset
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', None) or self.ordering
+
+    @staticmethod
+    def get_generation_field(view):
+        return getattr(view, 'cursor_generation_field', None)
+
+    def get_current_generation(self, view):
+        """The view's ``get_cursor_generation()``, read once per request."""
+        if not hasattr(self, '_current_generation'):
+            self._current_generation = _to_json(view.get_cursor_generation())
+        return self._current_generation
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    @staticmethod
+    def seek_condition(ordering, position):
+        """
+        Rows strictly after ``position`` in ``ordering``.
+
+        For ('-created_at', '-id') this is
+        ``created_at < c OR (created_at = c AND id < i)``.
+        """
+        condition, equal = Q(), Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, row, ordering):
+        names = [field.lstrip('-') for field in ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    def encode_cursor(self, position):
+        payload = json.dumps([_to_json(value) for value in position])
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model, ordering, view=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        generation_field = self.get_generation_field(view)
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(ordering) + bool(generation_field):
+                raise ValueError
+            position = [
+                self.to_python(model, field.lstrip('-'), value) for field, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if generation_field and values[-1] != self.get_current_generation(view):
+            raise NotFound(self.stale_cursor_message)
+        return position
+
+    @staticmethod
+    def to_python(model, name, value):
+        try:
+            return model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a score) are stored in the cursor as plain JSON values
+            return value
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        row = self.page[-1]
+        position = self.get_position(row, self.get_ordering(self.view))
+        generation_field = self.get_generation_field(self.view)
+        if generation_field:
+            position.append(row[generation_field] if isinstance(row, dict) else getattr(row, generation_field))
+        url = self.encode_cursor(position)
+        return remove_query_param(url, self.page_query_param)
+
+    def get_paginated_response(self, data):
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class TimestampKeysetPagination(KeysetPagination):
+    """Keyset pagination for models ordered by ``timestamp`` (notifications)."""
+    ordering = ('-timestamp', '-id')
@@ -0,0 +1,39 @@
+"""
+Id lists sent to the bulk endpoints.
+
+``requested_ids`` reads ``?ids=1,2,3`` on GET and ``{"ids": [...]}`` (or a
+form field holding ``1,2,3``) on POST, and answers 400 for anything else:
+a body that is not an object, ids that are not integers, or too many ids.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+def _to_id(value):
+    # JSON numbers or digit strings; not floats, booleans or nested values
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return int(value)
+    raise ValueError(value)
+
+
+def requested_ids(request, max_ids, noun='object'):
+    """The requested ids, deduplicated in order; ``noun`` names them in errors ("post ids")."""
+    if request.method == 'POST':
+        if not isinstance(request.data, dict):
+            raise ValidationError({'ids': 'Expected an object with an "ids" list.'})
+        raw_ids = request.data.get('ids')
+    else:
+        raw_ids = request.query_params.get('ids', '')
+    if isinstance(raw_ids, str):
+        raw_ids = [value for value in raw_ids.split(',') if value.strip()]
+    invalid = ValidationError({'ids': f'Expected a list of {noun} ids.'})
+    if not isinstance(raw_ids, (list, type(None))):
+        raise invalid
+    try:
+        ids = list(dict.fromkeys(_to_id(value) for value in raw_ids or []))
+    except ValueError:
+        raise invalid
+    if len(ids) > max_ids:
+        raise ValidationError({'ids': f'At most {max_ids} ids per request.'})
+    return ids
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'accounts',
     'posts',
     'notifications',
+    'jobs',
 ]
 
 
@@ -55,12 +56,93 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'social_media_api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'social_media_api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Resolved tokens are kept TOKEN_AUTH_CACHE_TTL seconds in the Django cache and
+# TOKEN_AUTH_LOCAL_CACHE_TTL seconds in a per-process LRU of
+# TOKEN_AUTH_LOCAL_CACHE_SIZE entries (social_media_api.authentication); 0 disables a level.
+# The LRU TTL bounds how long a revoked token keeps working in other processes.
+TOKEN_AUTH_CACHE_TTL = 300
+TOKEN_AUTH_LOCAL_CACHE_SIZE = 10000
+TOKEN_AUTH_LOCAL_CACHE_TTL = 10
+# /api/auth/async/login/ and /api/auth/async/register/ hash passwords in a pool
+# of PASSWORD_HASHING_WORKERS threads and answer 503 once
+# PASSWORD_HASHING_MAX_PENDING hashes are running or queued (accounts.hashing).
+PASSWORD_HASHING_WORKERS = os.cpu_count() or 1
+PASSWORD_HASHING_MAX_PENDING = 4 * PASSWORD_HASHING_WORKERS
+# Profile pictures get a thumbnail and a medium variant (social_media_api.images),
+# written by IMAGE_PROCESSING_WORKERS background threads after the upload.
+# Variants have content-hashed names under MEDIA_ROOT/profiles/thumbnail/ and
+# profiles/medium/: serve them with "Cache-Control: public, max-age=31536000, immutable".
+IMAGE_PROCESSING_WORKERS = 2
+IMAGE_VARIANT_QUALITY = 85
+
+# Home feed read path: 'pull' queries followed authors' posts on every request,
+# 'push' reads the per-user timeline filled when posts are written, and
+# 'hybrid' pushes posts from everyone except authors with more than
+# FEED_FANOUT_FOLLOWER_THRESHOLD followers, whose posts are pulled and merged.
+# Timelines are filled by the job worker, and only in 'push' and 'hybrid' mode.
+FEED_MODE = os.getenv('FEED_MODE', 'pull')
+FEED_TIMELINE_MAX_ENTRIES = 800
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_FANOUT_FOLLOWER_THRESHOLD = 10000
+
+# Ranked ("top") feed, precomputed by `manage.py rank_feeds`: posts of the last
+# FEED_RANKING_WINDOW_DAYS scored by likes and comments (log-scaled, weighted)
+# times a recency decay halving every FEED_RANKING_HALF_LIFE_HOURS.
+FEED_RANKING_HALF_LIFE_HOURS = 24
+FEED_RANKING_LIKE_WEIGHT = 1.0
+FEED_RANKING_COMMENT_WEIGHT = 2.0
+FEED_RANKING_WINDOW_DAYS = 7
+FEED_RANKING_MAX_ENTRIES = 500
+
+# Newest comments embedded in each post of a list page
+POST_COMMENT_PREVIEW_COUNT = 3
+# Most comments read for one page of /api/posts/<id>/threads/
+COMMENT_THREAD_MAX_ROWS = 200
+
+# Most post ids accepted by /api/posts/like-status/
+LIKE_STATUS_MAX_IDS = 500
+# Most user ids accepted by /api/auth/follow/bulk/ (and unfollow/bulk/) and by
+# /api/auth/relationships/
+FOLLOW_BULK_MAX_IDS = 100
+RELATIONSHIP_STATUS_MAX_IDS = 500
+# "People you may know" kept per user (manage.py refresh_follow_suggestions)
+FOLLOW_SUGGESTIONS_MAX_PER_USER = 30
+# POST /api/posts/bulk/ and /api/comments/bulk/: items accepted per request and
+# rows per INSERT
+BULK_CREATE_MAX_ITEMS = 1000
+BULK_CREATE_BATCH_SIZE = 500
+# Rows read per query by the NDJSON export (GET /api/export/)
+EXPORT_CHUNK_SIZE = 2000
+
+# Notifications with the same recipient, verb and target within one window of
+# NOTIFICATION_COALESCE_WINDOW seconds share a row ("alice and 41 others liked");
+# 0 writes a row per event. NOTIFICATION_SAMPLE_ACTORS names are kept per row.
+NOTIFICATION_COALESCE_WINDOW = 3600
+NOTIFICATION_SAMPLE_ACTORS = 3
+
+# Queued side effects (jobs.queue), run by `manage.py run_jobs`: jobs claimed
+# per batch, attempts before a job is given up, the first retry delay in
+# seconds (doubling per attempt) and how long a worker may hold a batch.
+JOBS_BATCH_SIZE = 100
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_LEASE = 300
+
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -70,6 +152,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'social_media_api.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'social_media_api.urls'
@@ -112,6 +195,21 @@ DATABASES = {
     }
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=10.0.0.2,10.0.0.3:3307 (same credentials as
+# the primary). Reads are routed to them by social_media_api.db_router.
+for number, address in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['social_media_api.db_router.PrimaryReplicaRouter']
+# How long a client reads from the primary after writing
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
 
 
 
@@ -0,0 +1,132 @@
+"""
+Sparse fieldsets (``?fields=``) and relation expansion (``?expand=``).
+
+``?fields=id,title`` limits each object in a response to the listed fields.
+``?expand=author`` renders a relation listed in the serializer's
+``Meta.expandable_fields`` as a nested object instead of its compact form
+(an id, a list of ids or a string). Both take comma-separated names and
+apply to the top-level objects of a response; nested serializers keep their
+own fields.
+
+Views use ``SparseFieldsetMixin.get_rendered_fields`` to build a queryset
+that loads only the rendered columns and joins or prefetches only the
+rendered relations (see ``restrict_to_rendered``).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request):
+    """Names in ``?fields=``, or None when every field is wanted."""
+    if request is None or FIELDS_PARAM not in request.query_params:
+        return None
+    return parse_names(request.query_params[FIELDS_PARAM])
+
+
+def requested_expansions(request):
+    if request is None:
+        return set()
+    return parse_names(request.query_params.get(EXPAND_PARAM))
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer side of ``?fields=`` / ``?expand=``.
+
+    ``Meta.expandable_fields`` maps a field name to a callable returning the
+    expanded field, e.g. ``{'author': lambda: UserSummarySerializer(read_only=True)}``.
+    """
+
+    def is_top_level(self):
+        return self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_top_level():
+            return fields
+        request = self.context.get('request')
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in requested_expansions(request) & set(expandable):
+            fields[name] = expandable[name]()
+
+        wanted = requested_fields(request)
+        if wanted is not None:
+            for name in set(fields) - wanted:
+                del fields[name]
+        return fields
+
+
+class SparseFieldsetMixin:
+    """View side: the fields the response will render, before the queryset is built."""
+
+    def get_rendered_fields(self):
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        return serializer.fields
+
+    def get_always_loaded(self):
+        """Columns the keyset pagination reads from every row."""
+        pagination_class = getattr(self, 'pagination_class', None)
+        if not hasattr(pagination_class, 'get_ordering'):
+            return []
+        return [field.lstrip('-') for field in pagination_class().get_ordering(self)]
+
+
+def restrict_to_rendered(queryset, fields, always=()):
+    """
+    Load only what the serializer ``fields`` read: ``only()`` their columns
+    (plus ``always``) and ``select_related()`` the foreign keys they traverse.
+
+    Dotted sources (``author.username``) and nested serializers load just the
+    related columns they read. Reverse and many-to-many relations are left to
+    the caller to prefetch, and non-model fields (annotations, method fields)
+    are ignored.
+    """
+    opts = queryset.model._meta
+    names, related = {opts.pk.name}, set()
+    for name in always:
+        try:
+            opts.get_field(name)
+        except FieldDoesNotExist:
+            continue  # an annotation such as a rank score
+        names.add(name)
+
+    for field in fields.values():
+        if field.source == '*':
+            continue
+        path = field.source.split('.')
+        try:
+            model_field = opts.get_field(path[0])
+        except FieldDoesNotExist:
+            continue
+        if hasattr(model_field, 'fk_field'):
+            # A generic foreign key renders from its two columns
+            names.update((model_field.ct_field, model_field.fk_field))
+            continue
+        if not model_field.concrete or model_field.many_to_many:
+            continue
+        names.add(path[0])
+        if not model_field.is_relation:
+            continue
+        if len(path) > 1:
+            names.add('__'.join(path))
+            related.add(path[0])
+        elif isinstance(field, serializers.Serializer):
+            names.update(
+                f'{path[0]}__{child.source}' for child in field.fields.values()
+                if child.source != '*' and '.' not in child.source
+            )
+            related.add(path[0])
+        elif not isinstance(field, serializers.PrimaryKeyRelatedField):
+            # e.g. StringRelatedField, which renders the related object itself
+            related.add(path[0])
+
+    queryset = queryset.only(*names)
+    return queryset.select_related(*related) if related else queryset
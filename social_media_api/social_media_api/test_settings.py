@@ -0,0 +1,26 @@
+"""
+Settings for running the tests without a MySQL server.
+
+The project settings on two SQLite databases: 'default' and 'replica', a
+separate database standing in for a read replica (ReplicaReadTests reads and
+writes through both)::
+
+    python manage.py test --settings=social_media_api.test_settings
+"""
+from social_media_api.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_primary.sqlite3',  # noqa: F405
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_replica.sqlite3',  # noqa: F405
+    },
+}
+# Routed to only by tests that override this; everything else reads 'default'.
+DATABASE_REPLICAS = []
+
+SECURE_SSL_REDIRECT = False
+STATICFILES_DIRS = []
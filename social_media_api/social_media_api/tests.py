@@ -0,0 +1,214 @@
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from posts.models import Post
+
+from .authentication import CachedTokenAuthentication, forget_tokens, local_cache
+from .db_router import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_STICKY_SECONDS=5)
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, method, status_code=200, write=False, **headers):
+        """Send a request through the middleware; returns the alias its view read from."""
+        seen = {}
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            seen['read'] = self.router.db_for_read(Post)
+            return HttpResponse(status=status_code)
+
+        request = getattr(self.factory, method)('/api/posts/', headers=headers)
+        ReplicaRoutingMiddleware(view)(request)
+        return seen['read']
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.route('get', authorization='Token a'), 'replica')
+        self.assertEqual(self.route('get'), 'replica')
+
+    def test_writes_and_requests_outside_middleware_use_primary(self):
+        self.assertEqual(self.route('post', authorization='Token a'), 'default')
+        self.assertEqual(self.route('get', write=True), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_client_reads_from_primary_after_writing(self):
+        self.route('post', authorization='Token a')
+        self.assertEqual(self.route('get', authorization='Token a'), 'default')
+        # Other clients are unaffected
+        self.assertEqual(self.route('get', authorization='Token b'), 'replica')
+
+        with override_settings(DATABASE_REPLICA_STICKY_SECONDS=0):
+            cache.clear()
+            self.route('post', authorization='Token a')
+        self.assertEqual(self.route('get', authorization='Token a'), 'replica')
+
+    def test_failed_write_is_not_sticky(self):
+        self.route('post', status_code=400, authorization='Token a')
+        self.assertEqual(self.route('get', authorization='Token a'), 'replica')
+
+    def test_tokens_are_read_from_primary(self):
+        seen = {}
+
+        def view(request):
+            seen['token'] = self.router.db_for_read(Token)
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(seen['token'], 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertEqual(self.route('get'), 'default')
+
+
+@skipUnless('replica' in settings.DATABASES, "needs a 'replica' database (social_media_api.test_settings)")
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_STICKY_SECONDS=5)
+class ReplicaReadTests(TestCase):
+    """Requests through the whole stack, with a replica that lags behind the primary."""
+    # Without the alias the class is skipped, but the runner still sets up every alias listed here
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='reader', password='pass')
+        # Replicated before the posts below were written
+        User.objects.using('replica').create(pk=self.user.pk, username='reader')
+        Post.objects.create(author=self.user, title='on primary', content='c')
+        Post.objects.using('replica').create(author_id=self.user.pk, title='on replica', content='c')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def titles(self):
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.status_code, 200)
+        return [post['title'] for post in response.json()['results']]
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.titles(), ['on replica'])
+
+    def test_reads_after_a_write_go_to_primary(self):
+        response = self.client.post('/api/posts/', {'title': 'new', 'content': 'c'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(self.titles()), ['new', 'on primary'])
+        self.assertFalse(Post.objects.using('replica').filter(title='new').exists())
+
+        # Other clients still read the replica
+        other = get_user_model().objects.create_user(username='other', password='pass')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+        self.assertEqual(self.titles(), ['on replica'])
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = get_user_model().objects.create_user(username='reader', password='pass12345')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self, key=None):
+        return self.auth.authenticate_credentials(key or self.token.key)
+
+    def test_warm_lookups_skip_the_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate()[0], self.user)
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+        # Another process: the Django cache still answers
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = async_to_sync(self.auth.aauthenticate_credentials)(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_each_request_gets_its_own_copy(self):
+        self.authenticate()
+        user, _ = self.authenticate()
+        user.username = 'changed'
+        self.assertEqual(self.authenticate()[0].username, 'reader')
+
+    def test_deleted_and_rotated_tokens_are_rejected(self):
+        key = self.token.key
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(key)
+        with self.assertRaises(AuthenticationFailed):
+            async_to_sync(self.auth.aauthenticate_credentials)(key)
+        rotated = Token.objects.create(user=self.user)
+        self.assertEqual(self.authenticate(rotated.key)[1].key, rotated.key)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_token_read_before_revocation_is_not_cached(self):
+        forget_tokens([self.token.key])
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.authenticate()
+
+    @override_settings(TOKEN_AUTH_LOCAL_CACHE_SIZE=2)
+    def test_local_cache_is_bounded(self):
+        User = get_user_model()
+        for i in range(3):
+            self.authenticate(Token.objects.create(user=User.objects.create_user(username=f'u{i}')).key)
+        self.assertEqual(len(local_cache), 2)
+
+    @override_settings(TOKEN_AUTH_CACHE_TTL=0, TOKEN_AUTH_LOCAL_CACHE_SIZE=0)
+    def test_caching_can_be_turned_off(self):
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.authenticate()
+
+    def test_profile_is_read_fresh(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get('/api/auth/profile/')
+        fan = get_user_model().objects.create_user(username='fan')
+        fan.following.add(self.user)
+        self.assertEqual(client.get('/api/auth/profile/').data['followers_count'], 1)
+
+
+class AsyncListAPIViewTests(TestCase):
+    def test_get_queryset_clones_the_queryset_attribute(self):
+        from .async_views import AsyncListAPIView
+
+        class PostList(AsyncListAPIView):
+            queryset = Post.objects.order_by('-id')
+
+        view = PostList()
+        first, second = view.get_queryset(), view.get_queryset()
+        self.assertIsNot(first, PostList.queryset)
+        self.assertIsNot(first, second)
+        self.assertEqual(str(first.query), str(PostList.queryset.query))
+
+        with self.assertRaisesMessage(AssertionError, "'AsyncListAPIView' should either include a `queryset`"):
+            AsyncListAPIView().get_queryset()
@@ -20,6 +20,7 @@ from django.urls import path,  include
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
+    path('api/notifications/', include('notifications.urls')),
     path('api/', include('posts.urls')),
 ]
 